@@ -1,17 +1,52 @@
 # app/api/main.py
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
 
-from app.db import Base, engine
-from app import models             
+from fastapi import FastAPI, Response
+
+from app.config import API_READ_ONLY, DB_CREATE_SCHEMA_ON_STARTUP, IG_PASSWORD, IG_USERNAME
+from app.db import cerrar_async_engine, engine
 from app.api.routes import router as api_router
+from app.core.coordinacion import cerrar_engine_leases
+from app.core.jobs import cerrar_job_manager, get_job_manager
+from app.core.metricas import exportar
+from app.core.session_pool import cerrar_session_pool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # El esquema se crea con `python -m app.schema`; al arrancar solo si se pide
+    if DB_CREATE_SCHEMA_ON_STARTUP:
+        from app.schema import crear_esquema
+
+        crear_esquema(engine)
+
+    if not API_READ_ONLY:
+        if not IG_USERNAME or not IG_PASSWORD:
+            print("[API] IG_USERNAME/IG_PASSWORD no definidos: los envíos van a fallar en el login.")
+        # Disputa el liderazgo de la cola de envíos (con varios workers de
+        # uvicorn solo el líder envía); el líder retoma los jobs en cola
+        get_job_manager().iniciar()
+    yield
+    # Detener workers y cerrar los Chrome del pool de sesiones al apagar la API
+    cerrar_job_manager()
+    cerrar_session_pool()
+    cerrar_engine_leases()
+    await cerrar_async_engine()
 
-# Crear tablas en BD al arrancar
-Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title="Instagram Automation API",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
-app.include_router(api_router)      
+app.include_router(api_router)
+
+
+# ------------------- GET /metrics -------------------
+@app.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    """Métricas en formato Prometheus (fases del bot, esperas, sesiones, queries)."""
+    cuerpo, content_type = exportar()
+    return Response(content=cuerpo, media_type=content_type)
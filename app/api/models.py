@@ -8,20 +8,33 @@ from pydantic import BaseModel, ConfigDict, field_serializer
 
 # ---------- Requests / Responses existentes ----------
 class SendRequest(BaseModel):
-    recipients: List[str]
+    recipients: List[str] = []
     messages: List[str]
     attachments: Optional[List[str]] = None
+    # Lista importada con POST /api/recipient-sets (en lugar de `recipients`)
+    recipient_set_id: Optional[int] = None
 
 
 class SendResponse(BaseModel):
     success: bool
     detail: str
+    job_id: Optional[int] = None
+    status: Optional[str] = None
 
 
 # ---------- Modelo de salida con fechas formateadas ----------
 _TZ = ZoneInfo("America/Argentina/Cordoba")
 _FMT = "%d/%m/%Y %H:%M"  # dd/mm/yyyy HH:MM (24h)
 
+
+def _formatear_fecha(dt: Optional[datetime]) -> Optional[str]:
+    if dt is None:
+        return None
+    # Si viene naive, se asume horario local; si viene con tz, se normaliza a Córdoba
+    dt = dt.replace(tzinfo=_TZ) if dt.tzinfo is None else dt.astimezone(_TZ)
+    return dt.strftime(_FMT)
+
+
 class ThreadOut(BaseModel):
     id: int
     username: str
@@ -34,17 +47,151 @@ class ThreadOut(BaseModel):
 
     @field_serializer("created_at", "updated_at")
     def _serialize_dt(self, dt: datetime, _info):
-        if dt is None:
-            return None
-        # Si viene naive, se asume horario local; si viene con tz, se normaliza a Córdoba
-        dt = dt.replace(tzinfo=_TZ) if dt.tzinfo is None else dt.astimezone(_TZ)
-        return dt.strftime(_FMT)
+        return _formatear_fecha(dt)
 
 
 class ThreadsResponse(BaseModel):
     items: List[ThreadOut]
+    # Pasar como ?cursor= para la página siguiente; None si no hay más
+    next_cursor: Optional[str] = None
 
 
 class StatsResponse(BaseModel):
     total_threads: int
     total_messages_sent: int
+
+
+class SessionPoolResponse(BaseModel):
+    profile: str
+    size: int
+    idle: int
+    in_use: int
+
+
+# ---------- Jobs de envío ----------
+class JobOut(BaseModel):
+    id: int
+    status: str
+    detail: Optional[str] = None
+    cancel_requested: bool
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    # Resultados por destinatario guardados hasta ahora
+    recipients_done: int = 0
+    recipients_failed: int = 0
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @field_serializer("created_at", "started_at", "finished_at")
+    def _serialize_dt(self, dt: Optional[datetime], _info):
+        return _formatear_fecha(dt)
+
+
+class JobDetailOut(JobOut):
+    recipients_total: int = 0
+    # Solo para jobs en cola o en curso (ver JobManager.estimar)
+    queue_position: Optional[int] = None
+    pending_recipients: int = 0
+    eta_seconds: Optional[float] = None
+    eta: Optional[datetime] = None
+
+    @field_serializer("eta")
+    def _serialize_eta(self, dt: Optional[datetime], _info):
+        return _formatear_fecha(dt)
+
+
+class JobsResponse(BaseModel):
+    items: List[JobOut]
+
+
+class JobRecipientOut(BaseModel):
+    position: int
+    recipient: str
+    status: str
+    thread_id: Optional[str] = None
+    messages_sent: int
+    attachments_sent: int
+    detail: Optional[str] = None
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @field_serializer("finished_at")
+    def _serialize_dt(self, dt: Optional[datetime], _info):
+        return _formatear_fecha(dt)
+
+
+class JobRecipientsResponse(BaseModel):
+    items: List[JobRecipientOut]
+    # Pasar como ?after= para la página siguiente; None si no hay más
+    next_after: Optional[int] = None
+
+
+# ---------- Listas de destinatarios importadas ----------
+class RecipientSetOut(BaseModel):
+    id: int
+    name: Optional[str] = None
+    total_lines: int
+    recipients: int
+    usernames: int
+    thread_ids: int
+    known_threads: int
+    duplicates: int
+    invalid: int
+    completed: bool
+    created_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @field_serializer("created_at")
+    def _serialize_dt(self, dt: Optional[datetime], _info):
+        return _formatear_fecha(dt)
+
+
+# ---------- Pacing ----------
+class PacingBucketOut(BaseModel):
+    account: str
+    action: str
+    per_hour: float
+    burst: float
+    # None = acción sin límite
+    tokens: Optional[float] = None
+    quiet_until: Optional[datetime] = None
+
+    @field_serializer("quiet_until")
+    def _serialize_dt(self, dt: Optional[datetime], _info):
+        return _formatear_fecha(dt)
+
+
+class PacingResponse(BaseModel):
+    enabled: bool
+    quiet_hours: Optional[str] = None
+    items: List[PacingBucketOut]
+
+
+# ---------- Esperas del bot ----------
+class WaitStepOut(BaseModel):
+    step: str
+    count: int
+    timeouts: int
+    avg_seconds: float
+    min_seconds: float
+    max_seconds: float
+    last_seconds: float
+    budget_min: float
+    budget_max: float
+
+
+class WaitStatsResponse(BaseModel):
+    items: List[WaitStepOut]
+
+
+# ---------- Cache username -> thread_id ----------
+class ThreadCacheResponse(BaseModel):
+    size: int
+    max_items: int
+    ttl_seconds: float
+    hits: int
+    misses: int
+    evictions: int
@@ -0,0 +1,70 @@
+# app/api/paginacion.py
+import base64
+import json
+from typing import Optional, Tuple
+
+from sqlalchemy import tuple_
+
+from app.models import Thread
+
+
+class CursorInvalido(ValueError):
+    """El cursor recibido no fue generado por esta API."""
+
+
+# ------------------- Cursor opaco (keyset) -------------------
+def codificar_cursor(messages_sent: int, id_: int) -> str:
+    raw = json.dumps([messages_sent, id_], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> Tuple[int, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        messages_sent, id_ = json.loads(raw)
+        return int(messages_sent), int(id_)
+    except Exception as e:
+        raise CursorInvalido(f"Cursor inválido: {cursor}") from e
+
+
+# ------------------- Filtros / orden de threads -------------------
+def _escapar_like(texto: str) -> str:
+    return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def filtrar_threads(query, q: Optional[str]):
+    """
+    Filtro por substring de username. Los usernames se guardan normalizados
+    (minúsculas), así que alcanza con LIKE; en Postgres con pg_trgm lo
+    resuelve el índice GIN ix_threads_username_trgm, y sin la extensión
+    cae a un recorrido filtrado (ver app/schema.py).
+    """
+    if q:
+        q_norm = _escapar_like(q.strip().lstrip("@").lower())
+        if q_norm:
+            query = query.where(Thread.username.like(f"%{q_norm}%", escape="\\"))
+    return query
+
+
+def ordenar_threads(query, order: str):
+    """Orden por (messages_sent, id) en la misma dirección: usa ix_threads_messages_sent_id."""
+    if order == "desc":
+        return query.order_by(Thread.messages_sent.desc(), Thread.id.desc())
+    return query.order_by(Thread.messages_sent.asc(), Thread.id.asc())
+
+
+def aplicar_cursor(query, order: str, cursor: Optional[str]):
+    """Keyset: continúa estrictamente después de la última fila de la página anterior."""
+    if not cursor:
+        return query
+    clave = tuple_(Thread.messages_sent, Thread.id)
+    valor = tuple_(*decodificar_cursor(cursor))
+    return query.where(clave < valor if order == "desc" else clave > valor)
+
+
+def siguiente_cursor(items, limit: int) -> Optional[str]:
+    """Hay página siguiente solo si la actual vino completa."""
+    if len(items) < limit:
+        return None
+    ultimo = items[-1]
+    return codificar_cursor(ultimo.messages_sent, ultimo.id)
@@ -1,100 +1,555 @@
 # app/api/routes.py
-from typing import Generator
+import asyncio
+import codecs
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.api.models import (
     SendRequest,
     SendResponse,
-    ThreadOut,
     ThreadsResponse,
     StatsResponse,
+    SessionPoolResponse,
+    JobOut,
+    JobDetailOut,
+    JobRecipientsResponse,
+    JobsResponse,
+    PacingResponse,
+    RecipientSetOut,
+    WaitStatsResponse,
+    ThreadCacheResponse,
 )
-from app.core.instagram_bot import (
-    crear_driver,
-    login_ig,
-    enviar_mensajes,
-    InstagramBotError,
+from app.config import API_READ_ONLY, COORDINATION_POLL_SECONDS, EXPORT_CHUNK_ROWS, PACING_QUIET_HOURS
+from app.api.paginacion import (
+    CursorInvalido,
+    aplicar_cursor,
+    filtrar_threads,
+    ordenar_threads,
+    siguiente_cursor,
 )
-from app.db import SessionLocal
-from app.models import Thread
+from app.api.serializacion import (
+    RespuestaJSONRapida,
+    filas_a_dicts,
+    ndjson,
+    select_threads_proyectado,
+)
+from app.core.adjuntos import validar_adjuntos
+from app.core.destinatarios import ImportadorDestinatarios
+from app.core.estadisticas import leer_estadisticas_async
+from app.core.eventos import (
+    EVENTO_FALLO,
+    EVENTO_FIN,
+    EVENTO_LISTO,
+    Cursor,
+    avanzar_cursor,
+    bus_eventos,
+    cursor_sse,
+    leer_cursor,
+)
+from app.core.jobs import JOB_FINISHED, RECIPIENT_DONE, ClaveReutilizada, get_job_manager
+from app.core.metricas import ruta_actual
+from app.core.pacing import get_pacer
+from app.core.session_pool import get_session_pool
+from app.core.thread_cache import cache_threads
+from app.core.waits import registro_esperas
+from app.db import SessionLocal, get_async_db, get_async_engine, get_db
+from app.models import RecipientSet, SendJob, SendJobRecipient
+
+
+async def etiquetar_ruta(request: Request) -> None:
+    """Etiqueta las queries del request con la ruta (igbot_db_query_seconds)."""
+    ruta = request.scope.get("route")
+    ruta_actual.set(getattr(ruta, "path", request.url.path))
+
+
+router = APIRouter(
+    prefix="/api",
+    tags=["instagram-bot"],
+    dependencies=[Depends(etiquetar_ruta)],
+)
+
+
+# ------------------- Modo solo lectura -------------------
+def requiere_envios() -> None:
+    """Las réplicas con API_READ_ONLY=1 no aceptan envíos."""
+    if API_READ_ONLY:
+        raise HTTPException(
+            status_code=503,
+            detail="API en modo solo lectura (API_READ_ONLY): envíos deshabilitados.",
+        )
+
 
+# ------------------- POST /api/send -------------------
+@router.post(
+    "/send",
+    response_model=SendResponse,
+    status_code=202,
+    dependencies=[Depends(requiere_envios)],
+)
+def send_messages(
+    payload: SendRequest,
+    response: Response,
+    db: Session = Depends(get_db),
+    idempotency_key: str | None = Header(
+        None,
+        alias="Idempotency-Key",
+        min_length=1,
+        max_length=255,
+        description="Reintentos con la misma clave devuelven el job original en lugar de encolar otro",
+    ),
+) -> SendResponse:
+    """
+    Encola el envío y responde al instante; el progreso se consulta en /api/jobs/{id}.
+
+    Con Idempotency-Key, repetir el request (p. ej. tras un timeout del
+    cliente) no lanza otro envío: responde 200 con el job ya existente y
+    el header Idempotent-Replayed: true.
+    """
+    if payload.recipient_set_id is not None:
+        recipient_set = db.get(RecipientSet, payload.recipient_set_id)
+        if recipient_set is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Lista de destinatarios {payload.recipient_set_id} no encontrada",
+            )
+        if not recipient_set.completed:
+            raise HTTPException(
+                status_code=409,
+                detail=f"La lista de destinatarios {payload.recipient_set_id} no terminó de importarse",
+            )
+    elif not payload.recipients:
+        raise HTTPException(status_code=422, detail="Indicar recipients o recipient_set_id")
+    if not any((m or "").strip() for m in payload.messages):
+        raise HTTPException(status_code=422, detail="messages no tiene ningún mensaje con texto")
+    errores_adjuntos = validar_adjuntos(payload.attachments or [])
+    if errores_adjuntos:
+        raise HTTPException(status_code=422, detail="Adjuntos inválidos: " + "; ".join(errores_adjuntos))
+    if idempotency_key:
+        try:
+            job, creado = get_job_manager().encolar_idempotente(
+                db, payload.model_dump(), idempotency_key
+            )
+        except ClaveReutilizada as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        if not creado:
+            response.status_code = 200
+            response.headers["Idempotent-Replayed"] = "true"
+            return SendResponse(
+                success=True,
+                detail=job.detail or "Envío ya encolado con esta Idempotency-Key.",
+                job_id=job.id,
+                status=job.status,
+            )
+    else:
+        job = get_job_manager().encolar(db, payload.model_dump())
+    return SendResponse(
+        success=True,
+        detail="Envío encolado.",
+        job_id=job.id,
+        status=job.status,
+    )
 
-router = APIRouter(prefix="/api", tags=["instagram-bot"])
 
+# ------------------- POST /api/recipient-sets -------------------
+def _agregar_lineas(importador: ImportadorDestinatarios, lineas: list) -> None:
+    for linea in lineas:
+        importador.agregar_linea(linea)
 
-# ------------------- Dependencia DB -------------------
-def get_db() -> Generator[Session, None, None]:
+
+@router.post(
+    "/recipient-sets",
+    response_model=RecipientSetOut,
+    status_code=201,
+    dependencies=[Depends(requiere_envios)],
+)
+async def import_recipient_set(
+    request: Request,
+    name: str | None = Query(None, max_length=255, description="Nombre de la lista"),
+) -> RecipientSetOut:
+    """
+    Importa una lista de destinatarios enviada como cuerpo del request
+    (CSV o TXT, un destinatario por línea; en CSV se toma la primera
+    columna). Se lee en streaming y se procesa por lotes: la memoria no
+    depende del tamaño del archivo. Devuelve el id para usar como
+    recipient_set_id en POST /api/send. Si la subida se corta, la lista
+    se descarta (mientras tanto queda con completed=false y /api/send la
+    rechaza).
+    """
     db = SessionLocal()
+    importador = None
     try:
-        yield db
+        importador = await run_in_threadpool(ImportadorDestinatarios, db, name)
+        decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+        resto = ""
+        lineas: list = []
+        async for bloque in request.stream():
+            partes = (resto + decoder.decode(bloque)).splitlines(keepends=True)
+            # La última parte puede ser una línea cortada entre bloques (o un
+            # \r cuyo \n llega en el bloque siguiente)
+            resto = partes.pop() if partes and not partes[-1].endswith("\n") else ""
+            lineas.extend(partes)
+            if len(lineas) >= importador.lote:
+                await run_in_threadpool(_agregar_lineas, importador, lineas)
+                lineas = []
+        resto += decoder.decode(b"", final=True)
+        if resto:
+            lineas.append(resto)
+        await run_in_threadpool(_agregar_lineas, importador, lineas)
+        return await run_in_threadpool(importador.terminar)
+    except BaseException:
+        if importador is not None:
+            await run_in_threadpool(importador.descartar)
+        raise
     finally:
-        db.close()
+        await run_in_threadpool(db.close)
 
 
-# ------------------- POST /api/send -------------------
-@router.post("/send", response_model=SendResponse)
-def send_messages(payload: SendRequest, db: Session = Depends(get_db)) -> SendResponse:
+# ------------------- GET /api/recipient-sets/{id} -------------------
+@router.get("/recipient-sets/{set_id}", response_model=RecipientSetOut)
+def get_recipient_set(set_id: int, db: Session = Depends(get_db)) -> RecipientSetOut:
+    recipient_set = db.get(RecipientSet, set_id)
+    if recipient_set is None:
+        raise HTTPException(status_code=404, detail=f"Lista de destinatarios {set_id} no encontrada")
+    return recipient_set
+
+
+# ------------------- GET /api/jobs -------------------
+@router.get("/jobs", response_model=JobsResponse)
+def list_jobs(
+    db: Session = Depends(get_db),
+    status: str | None = Query(
+        None,
+        pattern="^(queued|running|done|failed|cancelled)$",
+        description="Filtro por estado del job",
+    ),
+    limit: int = Query(50, ge=1, le=500),
+) -> JobsResponse:
+    manager = get_job_manager()
+    jobs = manager.listar(db, status=status, limit=limit)
+    resumen = manager.resumen_destinatarios(db, [j.id for j in jobs])
+    return JobsResponse(items=[_job_out(j, resumen) for j in jobs])
+
+
+def _job_out(job: SendJob, resumen: dict, modelo=JobOut):
+    ok, fallidos = resumen.get(job.id, (0, 0))
+    return modelo.model_validate(job).model_copy(
+        update={"recipients_done": ok, "recipients_failed": fallidos}
+    )
+
+
+def _job_detalle(db: Session, job: SendJob) -> JobDetailOut:
+    manager = get_job_manager()
+    detalle = _job_out(job, manager.resumen_destinatarios(db, [job.id]), JobDetailOut)
+    estimacion = manager.estimar(db, job)
+    eta = estimacion["eta_seconds"]
+    return detalle.model_copy(update={
+        "recipients_total": manager.total_destinatarios(db, job),
+        **estimacion,
+        "eta": datetime.now(timezone.utc) + timedelta(seconds=eta) if eta is not None else None,
+    })
+
+
+# ------------------- GET /api/jobs/{id} -------------------
+@router.get("/jobs/{job_id}", response_model=JobDetailOut)
+def get_job(job_id: int, db: Session = Depends(get_db)) -> JobDetailOut:
+    job = get_job_manager().obtener(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} no encontrado")
+    return _job_detalle(db, job)
+
+
+# ------------------- GET /api/jobs/{id}/recipients -------------------
+@router.get("/jobs/{job_id}/recipients", response_model=JobRecipientsResponse)
+def get_job_recipients(
+    job_id: int,
+    db: Session = Depends(get_db),
+    status: str | None = Query(None, pattern="^(done|failed)$", description="Filtro por resultado"),
+    after: int | None = Query(None, ge=0, description="next_after de la página anterior"),
+    limit: int = Query(100, ge=1, le=1000),
+) -> JobRecipientsResponse:
+    """Resultado de cada destinatario ya procesado, en el orden de la lista."""
+    manager = get_job_manager()
+    if manager.obtener(db, job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} no encontrado")
+    items = manager.resultados(db, job_id, status=status, despues=after, limit=limit)
+    return JobRecipientsResponse(
+        items=items,
+        next_after=items[-1].position if len(items) == limit else None,
+    )
+
+
+# ------------------- POST /api/jobs/{id}/resume -------------------
+@router.post(
+    "/jobs/{job_id}/resume",
+    response_model=JobDetailOut,
+    status_code=202,
+    dependencies=[Depends(requiere_envios)],
+)
+def resume_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    retry_failed: bool = Query(False, description="Volver a intentar los destinatarios fallidos"),
+) -> JobDetailOut:
+    """Continúa un job detenido desde el primer destinatario sin resultado."""
     try:
-        driver = crear_driver()
-        try:
-            login_ig(driver)
-            enviar_mensajes(
-                db=db,
-                driver=driver,
-                cuentas_destinatarias=payload.recipients,
-                mensajes=payload.messages,
-                archivos=payload.attachments or [],
+        job = get_job_manager().reanudar(db, job_id, reintentar_fallidos=retry_failed)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} no encontrado")
+    return _job_detalle(db, job)
+
+
+# ------------------- POST /api/jobs/{id}/cancel -------------------
+@router.post(
+    "/jobs/{job_id}/cancel",
+    response_model=JobDetailOut,
+    dependencies=[Depends(requiere_envios)],
+)
+def cancel_job(job_id: int, db: Session = Depends(get_db)) -> JobDetailOut:
+    job = get_job_manager().cancelar(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} no encontrado")
+    return _job_detalle(db, job)
+
+
+# ------------------- GET /api/jobs/{id}/events -------------------
+# Cada cuánto se manda un comentario keep-alive si el job no emite eventos
+_LATIDO_SSE = 15.0
+
+
+def _formato_sse(evento: dict) -> str:
+    datos = json.dumps(evento, ensure_ascii=False)
+    return f"id: {evento['id']}\nevent: {evento['type']}\ndata: {datos}\n\n"
+
+
+async def _eventos_desde_bd(db: AsyncSession, job_id: int, desde: Cursor):
+    """
+    Progreso de un job que corre en otro proceso (el líder de la cola), sin
+    acceso a su bus en memoria: se sondean send_job_recipients y el estado
+    del job cada COORDINATION_POLL_SECONDS. Solo hay eventos done / failed
+    (id = id de la fila, como en el bus del líder) y finished.
+    """
+    ultimo, silencio = desde, 0.0
+    while True:
+        # Primero el estado: los resultados se guardan antes de cerrar el job
+        job = await db.get(SendJob, job_id, populate_existing=True)
+        filas = (
+            await db.scalars(
+                select(SendJobRecipient)
+                .where(SendJobRecipient.job_id == job_id, SendJobRecipient.id > ultimo[0])
+                .order_by(SendJobRecipient.id)
             )
-        finally:
-            try:
-                driver.quit()
-            except Exception:
-                pass
+        ).all()
+        await db.close()
+        for fila in filas:
+            ultimo, silencio = (fila.id, 0), 0.0
+            yield {
+                "id": cursor_sse(ultimo),
+                "job_id": job_id,
+                "type": EVENTO_LISTO if fila.status == RECIPIENT_DONE else EVENTO_FALLO,
+                "recipient": fila.recipient,
+                "position": fila.position,
+                "thread_id": fila.thread_id,
+                "messages": fila.messages_sent,
+                "attachments": fila.attachments_sent,
+                "detail": fila.detail,
+            }
+        if job is None or job.status in JOB_FINISHED:
+            yield {
+                "id": cursor_sse(avanzar_cursor(ultimo)),
+                "job_id": job_id,
+                "type": EVENTO_FIN,
+                "status": job.status if job else None,
+                "detail": job.detail if job else None,
+            }
+            return
+        if silencio >= _LATIDO_SSE:
+            silencio = 0.0
+            yield None
+        await asyncio.sleep(COORDINATION_POLL_SECONDS)
+        silencio += COORDINATION_POLL_SECONDS
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    last_event_id: str = Header("", alias="Last-Event-ID"),
+) -> StreamingResponse:
+    """
+    Progreso del job en vivo (Server-Sent Events): started, resolved,
+    opened, message, attachments, done, failed y finished. Al reconectar con
+    Last-Event-ID solo se reenvía lo que faltó, aunque el id lo haya dado
+    otro proceso. Si el job lo corre otro proceso (varios workers), solo
+    done, failed y finished, leídos de la BD.
+    """
+    desde = leer_cursor(last_event_id)
+    job = await db.get(SendJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} no encontrado")
+    status, detail = job.status, job.detail
+    await db.close()
 
-        return SendResponse(success=True, detail="Mensajes enviados correctamente.")
-    except InstagramBotError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error interno: {e}")
+    async def eventos():
+        if status in JOB_FINISHED and not bus_eventos.conocido(job_id):
+            # Job de antes de un reinicio: solo queda el estado final en BD
+            yield _formato_sse({
+                "id": cursor_sse(avanzar_cursor(desde)),
+                "job_id": job_id,
+                "type": EVENTO_FIN,
+                "status": status,
+                "detail": detail,
+            })
+            return
+        if get_job_manager().es_lider():
+            origen = bus_eventos.escuchar(job_id, desde=desde, latido=_LATIDO_SSE)
+        else:
+            # Con varios workers de uvicorn el envío corre en el proceso líder
+            origen = _eventos_desde_bd(db, job_id, desde)
+        async for evento in origen:
+            yield ": keep-alive\n\n" if evento is None else _formato_sse(evento)
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # ------------------- GET /api/threads -------------------
-@router.get("/threads", response_model=ThreadsResponse)
-def list_threads(
-    db: Session = Depends(get_db),
+@router.get(
+    "/threads",
+    response_model=ThreadsResponse,
+    response_class=RespuestaJSONRapida,
+)
+async def list_threads(
+    db: AsyncSession = Depends(get_async_db),
     q: str | None = Query(None, description="Filtro por username (substring, sin @)"),
-    order: str = Query("desc", regex="^(asc|desc)$", description="Orden por messages_sent"),
+    order: str = Query("desc", pattern="^(asc|desc)$", description="Orden por messages_sent"),
     limit: int = Query(50, ge=1, le=500),
-    offset: int = Query(0, ge=0),
-) -> ThreadsResponse:
-    query = db.query(Thread)
+    offset: int = Query(0, ge=0, description="Paginación clásica; ignorado si se envía cursor"),
+    cursor: str | None = Query(None, description="next_cursor de la página anterior (keyset)"),
+) -> RespuestaJSONRapida:
+    # Solo las columnas necesarias, como tuplas (sin objetos ORM ni validación
+    # Pydantic por fila); en Postgres las fechas ya vienen formateadas
+    dialecto = db.bind.dialect.name
+    query = ordenar_threads(filtrar_threads(select_threads_proyectado(dialecto), q), order)
 
-    if q:
-        q_norm = q.strip().lstrip("@").lower()
-        query = query.filter(Thread.username.ilike(f"%{q_norm}%"))
+    if cursor:
+        # Keyset: costo constante sin importar qué tan profunda sea la página
+        try:
+            query = aplicar_cursor(query, order, cursor)
+        except CursorInvalido as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    elif offset:
+        query = query.offset(offset)
 
-    order_by = Thread.messages_sent.desc() if order == "desc" else Thread.messages_sent.asc()
+    filas = (await db.execute(query.limit(limit))).all()
 
-    items = (
-        query.order_by(order_by, Thread.id.desc())
-        .offset(offset)
-        .limit(limit)
-        .all()
-    )
+    # La respuesta NO incluye total/limit/offset; solo items con fechas ya formateadas
+    # (mismo JSON que ThreadsResponse, serializado con orjson)
+    return RespuestaJSONRapida({
+        "items": filas_a_dicts(filas),
+        "next_cursor": siguiente_cursor(filas, limit),
+    })
+
+
+# ------------------- GET /api/threads/export -------------------
+_COLUMNAS_EXPORT = ["id", "username", "thread_id", "messages_sent", "created_at", "updated_at"]
+
+
+def _csv(items: list, encabezado: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if encabezado:
+        writer.writerow(_COLUMNAS_EXPORT)
+    writer.writerows([it[c] for c in _COLUMNAS_EXPORT] for it in items)
+    return buffer.getvalue().encode()
 
-    # La respuesta ahora NO incluye total/limit/offset; solo items con fechas ya formateadas
-    return ThreadsResponse(items=items)
+
+@router.get("/threads/export")
+async def export_threads(
+    q: str | None = Query(None, description="Filtro por username (substring, sin @)"),
+    order: str = Query("desc", pattern="^(asc|desc)$", description="Orden por messages_sent"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+) -> StreamingResponse:
+    """
+    Historial completo en streaming (NDJSON o CSV), con los mismos filtros
+    que /api/threads. Las filas se leen por lotes de un cursor del servidor,
+    así la memoria no crece con el tamaño de la tabla.
+    """
+    dialecto = get_async_engine().dialect.name
+    query = ordenar_threads(filtrar_threads(select_threads_proyectado(dialecto), q), order)
+    query = query.execution_options(yield_per=EXPORT_CHUNK_ROWS)
+
+    async def contenido():
+        # Conexión propia: vive lo que dura el streaming, no lo que dura el request
+        async with get_async_engine().connect() as conn:
+            resultado = await conn.stream(query)
+            if format == "csv":
+                yield _csv([], encabezado=True)
+            async for lote in resultado.partitions():
+                items = filas_a_dicts(lote)
+                yield _csv(items, encabezado=False) if format == "csv" else ndjson(items)
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        contenido(),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="threads.{format}"',
+            "Cache-Control": "no-store",
+        },
+    )
 
 
 # ------------------- GET /api/stats -------------------
 @router.get("/stats", response_model=StatsResponse)
-def stats(db: Session = Depends(get_db)) -> StatsResponse:
-    total_threads = db.query(func.count(Thread.id)).scalar() or 0
-    total_messages = db.query(func.coalesce(func.sum(Thread.messages_sent), 0)).scalar() or 0
+async def stats(db: AsyncSession = Depends(get_async_db)) -> StatsResponse:
+    # Lectura por PK de la fila precalculada (no COUNT/SUM sobre threads)
+    st = await leer_estadisticas_async(db)
     return StatsResponse(
-        total_threads=int(total_threads),
-        total_messages_sent=int(total_messages),
+        total_threads=int(st.total_threads),
+        total_messages_sent=int(st.total_messages_sent),
     )
+
+
+# ------------------- GET /api/sessions -------------------
+@router.get("/sessions", response_model=SessionPoolResponse)
+def session_pool_status() -> SessionPoolResponse:
+    return SessionPoolResponse(**get_session_pool().estado())
+
+
+# ------------------- GET /api/pacing -------------------
+@router.get("/pacing", response_model=PacingResponse)
+def pacing_status() -> PacingResponse:
+    """Límites por acción de la cuenta y tokens disponibles ahora."""
+    pacer = get_pacer()
+    return PacingResponse(
+        enabled=pacer.habilitado,
+        quiet_hours=PACING_QUIET_HOURS or None,
+        items=pacer.estado(),
+    )
+
+
+# ------------------- GET /api/waits -------------------
+@router.get("/waits", response_model=WaitStatsResponse)
+def wait_stats() -> WaitStatsResponse:
+    """Tiempo real esperado por cada paso del bot vs. su presupuesto (min/max)."""
+    return WaitStatsResponse(items=registro_esperas.resumen())
+
+
+# ------------------- GET /api/thread-cache -------------------
+@router.get("/thread-cache", response_model=ThreadCacheResponse)
+def thread_cache_status() -> ThreadCacheResponse:
+    return ThreadCacheResponse(**cache_threads.estado())
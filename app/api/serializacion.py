@@ -0,0 +1,82 @@
+# app/api/serializacion.py
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import orjson
+from fastapi.responses import JSONResponse
+from sqlalchemy import func, select
+
+from app.api.models import _TZ, _formatear_fecha
+from app.models import Thread
+
+# Mismo formato que _FMT de app/api/models.py ("%d/%m/%Y %H:%M"), en
+# sintaxis de to_char: mantener ambos sincronizados
+_FMT_SQL = "DD/MM/YYYY HH24:MI"
+
+
+class RespuestaJSONRapida(JSONResponse):
+    """JSONResponse serializada con orjson (sin pasar por jsonable_encoder)."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+def _fecha_sql(columna, nombre: str):
+    """En Postgres la fecha ya sale formateada en la zona de la API (AT TIME ZONE)."""
+    return func.to_char(func.timezone(_TZ.key, columna), _FMT_SQL).label(nombre)
+
+
+def select_threads_proyectado(dialecto: str):
+    """
+    SELECT solo de las columnas que devuelve /api/threads, como tuplas
+    (sin instanciar objetos Thread). En Postgres formatea las fechas en SQL.
+    """
+    if dialecto == "postgresql":
+        fechas = (
+            _fecha_sql(Thread.created_at, "created_at"),
+            _fecha_sql(Thread.updated_at, "updated_at"),
+        )
+    else:
+        fechas = (Thread.created_at, Thread.updated_at)
+    return select(Thread.id, Thread.username, Thread.thread_id, Thread.messages_sent, *fechas)
+
+
+def formatear_fechas(valores: Sequence[Optional[datetime]], cache: Dict) -> List[Optional[str]]:
+    """
+    Formatea en bloque con el mismo criterio que _formatear_fecha,
+    memoizando por minuto (es la resolución de _FMT).
+    """
+    salida = []
+    for dt in valores:
+        if dt is None or isinstance(dt, str):
+            salida.append(dt)
+            continue
+        clave = dt.replace(second=0, microsecond=0)
+        texto = cache.get(clave)
+        if texto is None:
+            texto = cache[clave] = _formatear_fecha(clave)
+        salida.append(texto)
+    return salida
+
+
+def filas_a_dicts(filas: Sequence[Sequence[Any]]) -> List[dict]:
+    """Tuplas de select_threads_proyectado -> dicts listos para serializar."""
+    cache: Dict = {}
+    creados = formatear_fechas([f[4] for f in filas], cache)
+    actualizados = formatear_fechas([f[5] for f in filas], cache)
+    return [
+        {
+            "id": f[0],
+            "username": f[1],
+            "thread_id": f[2],
+            "messages_sent": f[3],
+            "created_at": c,
+            "updated_at": u,
+        }
+        for f, c, u in zip(filas, creados, actualizados)
+    ]
+
+
+def ndjson(items: Sequence[dict]) -> bytes:
+    """Una línea JSON por item (application/x-ndjson)."""
+    return b"".join(orjson.dumps(it) + b"\n" for it in items)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -9,12 +10,34 @@ ENV_PATH = BASE_DIR / ".env"
 # Cargar variables desde .env
 load_dotenv(ENV_PATH)
 
+
+
+def _env_bool(nombre: str, default: str = "0") -> bool:
+    return os.getenv(nombre, default).strip().lower() in ("1", "true", "yes")
+
+
+# === MODO DE LA API ===
+# Réplica de solo lectura: sirve historial/estadísticas, sin envíos ni Selenium
+API_READ_ONLY = _env_bool("API_READ_ONLY")
+# Crear tablas/índices al arrancar la API (por defecto es un paso explícito:
+# python -m app.schema)
+DB_CREATE_SCHEMA_ON_STARTUP = _env_bool("DB_CREATE_SCHEMA_ON_STARTUP")
+# Procesos de uvicorn al correr `python main.py` (1 = uno solo, con reload)
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+# Con varios procesos (Postgres), cada cuánto un proceso que no es líder
+# intenta tomar la cola de envíos y el líder revisa jobs nuevos en la BD
+COORDINATION_POLL_SECONDS = float(os.getenv("COORDINATION_POLL_SECONDS", "1"))
+# Imprimir la configuración efectiva al importar este módulo
+DEBUG_CONFIG = _env_bool("DEBUG_CONFIG")
+
 # === VARIABLES DE ENTORNO ===
+# Solo hacen falta para enviar: login_ig() falla con un error claro si faltan
 IG_USERNAME = os.getenv("IG_USERNAME")
 IG_PASSWORD = os.getenv("IG_PASSWORD")
 
-if not IG_USERNAME or not IG_PASSWORD:
-    raise ValueError("IG_USERNAME e IG_PASSWORD deben estar definidos en .env")
+# URLs de Instagram (se pueden apuntar a un servidor local, p. ej. bench/)
+IG_BASE_URL = os.getenv("IG_BASE_URL", "https://www.instagram.com").rstrip("/")
+IG_ME_BASE_URL = os.getenv("IG_ME_BASE_URL", "https://ig.me").rstrip("/")
 
 # Navegador: por defecto Chrome estable
 DEFAULT_CHROME_BINARY = "/usr/bin/google-chrome-stable"
@@ -25,7 +48,189 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL debe estar definido en .env (Postgres recomendado)")
 
-print("DEBUG CONFIG:")
-print(f"  IG_USERNAME={IG_USERNAME}")
-print(f"  CHROME_BINARY={CHROME_BINARY}")
-print(f"  DATABASE_URL={DATABASE_URL}")
+# URL para el engine async de los endpoints de lectura. Si no se define se
+# deriva de DATABASE_URL cambiando el driver (psycopg2 -> asyncpg).
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+
+# Pool de conexiones (se aplica al engine sync y al async por separado)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", "1")
+
+# === PERFILES DE LANZAMIENTO DE CHROME ===
+# Perfil que usa crear_driver(): "full" es el Chrome de siempre (con ventana,
+# incógnito, descarga todo); "light" y "minimal" son headless, bloquean
+# recursos que el bot no usa y guardan la cache en disco entre corridas.
+BROWSER_PROFILE = os.getenv("BROWSER_PROFILE", "full")
+# Carpeta base de los user-data-dir persistentes (uno por perfil y slot del pool)
+BROWSER_DATA_DIR = os.getenv("BROWSER_DATA_DIR", str(BASE_DIR / ".chrome-data"))
+# block: categorías de requests a bloquear (image, media, font)
+# js_heap_mb / disk_cache_mb: 0 = sin límite; single_renderer: un solo proceso renderer
+BROWSER_PROFILES = {
+    "full": {
+        "headless": False, "incognito": True, "block": (), "persistent": False,
+        "js_heap_mb": 0, "disk_cache_mb": 0, "single_renderer": False,
+    },
+    "light": {
+        "headless": True, "incognito": False, "block": ("media", "font"), "persistent": True,
+        "js_heap_mb": 0, "disk_cache_mb": 256, "single_renderer": False,
+    },
+    "minimal": {
+        "headless": True, "incognito": False, "block": ("image", "media", "font"), "persistent": True,
+        "js_heap_mb": 512, "disk_cache_mb": 128, "single_renderer": True,
+    },
+}
+if BROWSER_PROFILE not in BROWSER_PROFILES:
+    raise ValueError(
+        f"BROWSER_PROFILE inválido: {BROWSER_PROFILE} (opciones: {', '.join(BROWSER_PROFILES)})"
+    )
+
+# === POOL DE SESIONES DE NAVEGADOR ===
+# Cantidad de Chrome ya logueados que se mantienen vivos entre requests
+SESSION_POOL_SIZE = int(os.getenv("SESSION_POOL_SIZE", "1"))
+# Segundos que un request espera por una sesión libre antes de fallar
+SESSION_POOL_TIMEOUT = float(os.getenv("SESSION_POOL_TIMEOUT", "300"))
+
+# === JOBS DE ENVÍO ===
+# Workers que ejecutan envíos en segundo plano (cada uno usa una sesión del pool)
+SEND_JOB_WORKERS = int(os.getenv("SEND_JOB_WORKERS", str(SESSION_POOL_SIZE)))
+# Al apagar la API, cuánto se espera a que los envíos en curso se detengan
+# (entre un destinatario y el siguiente) antes de soltar la cola
+SEND_SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("SEND_SHUTDOWN_TIMEOUT_SECONDS", "30"))
+
+# Vigencia de una Idempotency-Key de POST /api/send (pasado ese tiempo la
+# misma clave encola un envío nuevo)
+IDEMPOTENCY_KEY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+
+# Un destinatario que falla se registra y se saltea; tras esta cantidad de
+# fallos seguidos (navegador caído, sesión bloqueada...) el job se detiene
+# y queda para reanudar (0 = no detenerse nunca)
+SEND_MAX_CONSECUTIVE_FAILURES = int(os.getenv("SEND_MAX_CONSECUTIVE_FAILURES", "5"))
+
+# === ESPERAS DEL BOT (min:max en segundos por paso) ===
+# Cada paso del bot espera una condición concreta del DOM/URL. "max" es el
+# timeout; "min" es un piso opcional de pacing (0 = seguir apenas se cumple).
+# Se pueden pisar con WAIT_BUDGETS="chat_textbox=0:30,message_sent=0.5:5"
+DEFAULT_WAIT_BUDGETS = {
+    "login_form": (0.0, 25.0),
+    "login_done": (0.0, 25.0),
+    "login_ready": (0.0, 10.0),
+    "thread_redirect": (0.0, 15.0),
+    "chat_textbox": (0.0, 20.0),
+    "composer_ready": (0.0, 5.0),
+    "message_sent": (0.0, 5.0),
+    "popup": (0.0, 15.0),
+    "popup_closed": (0.0, 5.0),
+    "attachment_input": (0.0, 20.0),
+    "attachment_ready": (0.0, 20.0),
+    "attachment_sent": (0.0, 20.0),
+}
+WAIT_POLL_SECONDS = float(os.getenv("WAIT_POLL_SECONDS", "0.25"))
+# Tras el primer chequeo completo del popup de notificaciones en una sesión,
+# los siguientes destinatarios solo lo buscan durante este tiempo (0 = un sondeo)
+POPUP_RECHECK_SECONDS = float(os.getenv("POPUP_RECHECK_SECONDS", "0"))
+
+
+def _parse_wait_budgets(raw: str) -> dict:
+    budgets = dict(DEFAULT_WAIT_BUDGETS)
+    for item in filter(None, (p.strip() for p in raw.split(","))):
+        paso, _, valores = item.partition("=")
+        minimo, _, maximo = valores.partition(":")
+        try:
+            budgets[paso.strip()] = (float(minimo), float(maximo))
+        except ValueError:
+            raise ValueError(f"WAIT_BUDGETS inválido en '{item}' (formato paso=min:max)")
+    return budgets
+
+
+WAIT_BUDGETS = _parse_wait_budgets(os.getenv("WAIT_BUDGETS", ""))
+
+# === PACING (límites por cuenta de Instagram) ===
+# Token bucket por acción: "por_hora:ráfaga". Se pueden pisar con
+# PACING_LIMITS="open_chat=60:5,send_text=300:20" (por_hora 0 = sin límite)
+PACING_ENABLED = _env_bool("PACING_ENABLED", "1")
+DEFAULT_PACING_LIMITS = {
+    "open_chat": (120.0, 10.0),
+    "send_text": (400.0, 20.0),
+    "upload": (60.0, 5.0),
+}
+# Franja sin envíos en PACING_TIMEZONE, p. ej. "23:00-08:00" (vacío = sin franja)
+PACING_QUIET_HOURS = os.getenv("PACING_QUIET_HOURS", "")
+PACING_TIMEZONE = os.getenv("PACING_TIMEZONE", "America/Argentina/Cordoba")
+
+
+def _parse_pacing_limits(raw: str) -> dict:
+    limites = dict(DEFAULT_PACING_LIMITS)
+    for item in filter(None, (p.strip() for p in raw.split(","))):
+        accion, _, valores = item.partition("=")
+        por_hora, _, rafaga = valores.partition(":")
+        try:
+            limites[accion.strip()] = (float(por_hora), float(rafaga or 1))
+        except ValueError:
+            raise ValueError(f"PACING_LIMITS inválido en '{item}' (formato accion=por_hora:rafaga)")
+    return limites
+
+
+PACING_LIMITS = _parse_pacing_limits(os.getenv("PACING_LIMITS", ""))
+
+# === WEBDRIVER: traza de comandos y navegación por eventos ===
+# Cuenta y cronometra cada comando enviado a chromedriver, por destinatario
+WEBDRIVER_TRACE = _env_bool("WEBDRIVER_TRACE")
+# Pide WebDriver BiDi al crear el driver: las esperas de navegación (login,
+# redirección de ig.me) escuchan eventos en lugar de sondear current_url
+WEBDRIVER_BIDI = _env_bool("WEBDRIVER_BIDI", "1")
+# Con BiDi activo, red de seguridad: cada cuánto se mira current_url igual
+# (navegaciones de SPA que no emiten evento)
+NAV_FALLBACK_POLL_SECONDS = float(os.getenv("NAV_FALLBACK_POLL_SECONDS", "2"))
+
+# === EXPORT de threads ===
+# Filas por lote leídas del cursor del servidor en GET /api/threads/export
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "2000"))
+
+# === IMPORT de listas de destinatarios ===
+# Destinatarios por lote (insert + resolución contra threads) al importar
+RECIPIENT_IMPORT_CHUNK = int(os.getenv("RECIPIENT_IMPORT_CHUNK", "1000"))
+
+# === ADJUNTOS ===
+# Los adjuntos de un job se validan, hashean y copian acá una sola vez antes
+# de recorrer destinatarios (copias direccionadas por sha256, reutilizables)
+ATTACHMENT_STAGING_DIR = os.getenv(
+    "ATTACHMENT_STAGING_DIR", str(Path(tempfile.gettempdir()) / "igbot-adjuntos")
+)
+ATTACHMENT_MAX_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", str(25 * 1024 * 1024)))
+# Lado mayor máximo de las imágenes (jpg/png/webp); 0 = no reescalar. Requiere Pillow
+ATTACHMENT_MAX_IMAGE_PX = int(os.getenv("ATTACHMENT_MAX_IMAGE_PX", "0"))
+ATTACHMENT_JPEG_QUALITY = int(os.getenv("ATTACHMENT_JPEG_QUALITY", "85"))
+
+# === CACHE username -> thread_id ===
+THREAD_CACHE_SIZE = int(os.getenv("THREAD_CACHE_SIZE", "10000"))
+THREAD_CACHE_TTL = float(os.getenv("THREAD_CACHE_TTL", "3600"))
+
+# === CONTADORES messages_sent ===
+# Cada cuánto (segundos) se vuelcan a la BD los mensajes enviados acumulados
+# de un job (0 = después de cada destinatario)
+COUNTER_FLUSH_SECONDS = float(os.getenv("COUNTER_FLUSH_SECONDS", "5"))
+
+# === COMPOSER ===
+# Cómo se escribe cada mensaje en el textbox del chat:
+# "insert" = todo el texto en una sola operación (execCommand insertText,
+# saltos de línea como insertLineBreak), con vuelta a "keys" si el composer
+# no quedó con el texto esperado; "keys" = send_keys tecla por tecla
+COMPOSER_MODE = os.getenv("COMPOSER_MODE", "insert")
+if COMPOSER_MODE not in ("insert", "keys"):
+    raise ValueError(f"COMPOSER_MODE inválido: {COMPOSER_MODE} (opciones: insert, keys)")
+
+if DEBUG_CONFIG:
+    print("DEBUG CONFIG:")
+    print(f"  API_READ_ONLY={API_READ_ONLY} API_WORKERS={API_WORKERS}")
+    print(f"  IG_USERNAME={IG_USERNAME}")
+    print(f"  CHROME_BINARY={CHROME_BINARY}")
+    print(f"  DATABASE_URL={DATABASE_URL}")
+    print(f"  BROWSER_PROFILE={BROWSER_PROFILE}")
+    print(f"  SESSION_POOL_SIZE={SESSION_POOL_SIZE}")
+    print(f"  COMPOSER_MODE={COMPOSER_MODE}")
+    print(f"  SEND_JOB_WORKERS={SEND_JOB_WORKERS} SEND_SHUTDOWN_TIMEOUT_SECONDS={SEND_SHUTDOWN_TIMEOUT_SECONDS}")
+    print(f"  PACING_ENABLED={PACING_ENABLED} PACING_LIMITS={PACING_LIMITS}")
+    print(f"  WEBDRIVER_TRACE={WEBDRIVER_TRACE} WEBDRIVER_BIDI={WEBDRIVER_BIDI}")
@@ -0,0 +1,161 @@
+# app/core/adjuntos.py
+import hashlib
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from app.config import (
+    ATTACHMENT_JPEG_QUALITY,
+    ATTACHMENT_MAX_BYTES,
+    ATTACHMENT_MAX_IMAGE_PX,
+    ATTACHMENT_STAGING_DIR,
+)
+from app.core.excepciones import InstagramBotError
+from app.core.metricas import medir_fase
+
+# Formatos que se reescalan con Pillow (el resto se copia tal cual)
+_IMAGENES = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG", ".webp": "WEBP"}
+_BLOQUE = 1024 * 1024
+
+_pillow_avisado = False
+
+
+@dataclass(frozen=True)
+class AdjuntoPreparado:
+    origen: str      # ruta recibida en el payload
+    ruta: str        # copia en ATTACHMENT_STAGING_DIR (la que se sube)
+    sha256: str
+    bytes: int
+    reescalado: bool
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloque in iter(lambda: f.read(_BLOQUE), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _cargar_pillow():
+    """Pillow es opcional: sin él las imágenes se copian sin reescalar."""
+    global _pillow_avisado
+    try:
+        from PIL import Image
+    except ImportError:
+        if not _pillow_avisado:
+            print("[ADJ] ATTACHMENT_MAX_IMAGE_PX definido pero Pillow no está instalado; no se reescala.")
+            _pillow_avisado = True
+        return None
+    return Image
+
+
+def _reescalar(origen: str, destino: str, formato: str) -> bool:
+    """Guarda en `destino` la imagen achicada a ATTACHMENT_MAX_IMAGE_PX. False si no hizo falta."""
+    Image = _cargar_pillow()
+    if Image is None:
+        return False
+    with Image.open(origen) as img:
+        if max(img.size) <= ATTACHMENT_MAX_IMAGE_PX:
+            return False
+        img.thumbnail((ATTACHMENT_MAX_IMAGE_PX, ATTACHMENT_MAX_IMAGE_PX))
+        if formato == "JPEG" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        opciones = {"quality": ATTACHMENT_JPEG_QUALITY} if formato in ("JPEG", "WEBP") else {}
+        img.save(destino, format=formato, **opciones)
+    return True
+
+
+def _copiar_a_staging(origen: str, sha: str, extension: str) -> Tuple[str, bool]:
+    """
+    Copia direccionada por contenido (<sha256>/<nombre original>): el mismo
+    archivo se prepara una sola vez aunque lo usen varios jobs. Se escribe a
+    un temporal y se renombra, así dos workers no ven nunca una copia a medias.
+    """
+    formato = _IMAGENES.get(extension) if ATTACHMENT_MAX_IMAGE_PX > 0 else None
+    sufijo = f"-{ATTACHMENT_MAX_IMAGE_PX}px" if formato else ""
+    carpeta = os.path.join(ATTACHMENT_STAGING_DIR, f"{sha}{sufijo}")
+    destino = os.path.join(carpeta, os.path.basename(origen))
+    if os.path.exists(destino):
+        return destino, bool(sufijo) and os.path.getsize(destino) != os.path.getsize(origen)
+
+    os.makedirs(carpeta, exist_ok=True)
+    fd, temporal = tempfile.mkstemp(dir=carpeta, suffix=extension)
+    os.close(fd)
+    try:
+        reescalado = bool(formato) and _reescalar(origen, temporal, formato)
+        if not reescalado:
+            shutil.copyfile(origen, temporal)
+        os.replace(temporal, destino)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    return destino, reescalado
+
+
+def validar_adjuntos(archivos: List[str]) -> List[str]:
+    """
+    Errores de las rutas de adjuntos ("<ruta>: <motivo>"): que no exista,
+    no se pueda leer, esté vacío o supere ATTACHMENT_MAX_BYTES. Lista
+    vacía si están todos bien. POST /api/send la usa antes de encolar.
+    """
+    errores = []
+    for path in (p.strip() for p in archivos if p and p.strip()):
+        if not os.path.isfile(path):
+            errores.append(f"{path}: no existe")
+        elif not os.access(path, os.R_OK):
+            errores.append(f"{path}: sin permiso de lectura")
+        elif os.path.getsize(path) == 0:
+            errores.append(f"{path}: está vacío")
+        elif os.path.getsize(path) > ATTACHMENT_MAX_BYTES:
+            errores.append(f"{path}: supera {ATTACHMENT_MAX_BYTES} bytes")
+    return errores
+
+
+@medir_fase("prepare_attachments")
+def preparar_adjuntos(archivos: List[str]) -> List[AdjuntoPreparado]:
+    """
+    Etapa única por job, antes de recorrer destinatarios:
+
+    - vuelve a validar los archivos (validar_adjuntos: pueden haber
+      cambiado desde que se encoló el job); si alguno falla, el job falla
+      antes de enviar nada;
+    - calcula el sha256 y descarta archivos repetidos;
+    - reescala imágenes a ATTACHMENT_MAX_IMAGE_PX (opcional, con Pillow);
+    - deja la copia en ATTACHMENT_STAGING_DIR, que es la que se sube.
+    """
+    rutas = [p.strip() for p in archivos if p and p.strip()]
+    if not rutas:
+        return []
+
+    errores = validar_adjuntos(rutas)
+    if errores:
+        raise InstagramBotError("Adjuntos inválidos: " + "; ".join(errores))
+
+    preparados: List[AdjuntoPreparado] = []
+    vistos = set()
+    for path in rutas:
+        sha = _sha256(path)
+        if sha in vistos:
+            print(f"[ADJ] {path} repetido (mismo contenido); se envía una vez.")
+            continue
+        vistos.add(sha)
+        extension = os.path.splitext(path)[1].lower()
+        try:
+            destino, reescalado = _copiar_a_staging(path, sha, extension)
+        except OSError as e:
+            raise InstagramBotError(f"No se pudo preparar el adjunto {path}: {e}")
+        preparados.append(
+            AdjuntoPreparado(
+                origen=path,
+                ruta=destino,
+                sha256=sha,
+                bytes=os.path.getsize(destino),
+                reescalado=reescalado,
+            )
+        )
+        print(f"[ADJ] {path} -> {destino}{' (reescalado)' if reescalado else ''}")
+    return preparados
@@ -0,0 +1,97 @@
+# app/core/composer.py
+from typing import TYPE_CHECKING, List
+
+from selenium.common.exceptions import JavascriptException
+from selenium.webdriver.common.keys import Keys
+
+from app.config import COMPOSER_MODE
+from app.core.metricas import ESCRITURAS_COMPOSER
+
+if TYPE_CHECKING:
+    from selenium import webdriver
+    from selenium.webdriver.remote.webelement import WebElement
+
+MODO_INSERCION = "insert"
+MODO_TECLAS = "keys"
+
+# Inserta todas las líneas en un solo executeScript, como lo haría un pegado:
+# el editor de Instagram (contenteditable) recibe los mismos beforeinput/input
+# que con el teclado. Entre líneas va insertLineBreak (= Shift+Enter): un
+# salto de línea dentro del mensaje, no un envío. Devuelve el texto que quedó.
+_JS_INSERTAR = """
+const box = arguments[0], lineas = arguments[1];
+box.focus();
+const sel = window.getSelection();
+sel.selectAllChildren(box);
+sel.collapseToEnd();
+for (let i = 0; i < lineas.length; i++) {
+  if (i > 0 && !document.execCommand("insertLineBreak")) return null;
+  if (lineas[i] && !document.execCommand("insertText", false, lineas[i])) return null;
+}
+return box.innerText;
+"""
+
+# Deja el composer vacío antes de reintentar tecla por tecla
+_JS_VACIAR = """
+const box = arguments[0];
+box.focus();
+document.execCommand("selectAll");
+document.execCommand("delete");
+"""
+
+
+def _lineas(texto: str) -> List[str]:
+    return texto.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+
+
+def _normalizar(texto: str) -> str:
+    """innerText de un contenteditable: nbsp por espacios y sin espacios sobrantes por línea."""
+    return "\n".join(l.rstrip() for l in _lineas(texto.replace("\xa0", " "))).strip()
+
+
+def _insertar(driver: "webdriver.Remote", entrada: "WebElement", texto: str) -> bool:
+    """True si el composer quedó exactamente con `texto`."""
+    try:
+        resultado = driver.execute_script(_JS_INSERTAR, entrada, _lineas(texto))
+    except JavascriptException as e:
+        print(f"[BOT] Inserción en bloque falló: {e.msg}")
+        return False
+    return resultado is not None and _normalizar(resultado) == _normalizar(texto)
+
+
+def _teclear(entrada: "WebElement", texto: str) -> None:
+    """
+    Tecla por tecla (un evento por carácter en chromedriver). Los saltos de
+    línea van como Shift+Enter (Keys.NULL suelta Shift): un ENTER solo
+    enviaría el mensaje partido.
+    """
+    entrada.send_keys((Keys.SHIFT + Keys.ENTER + Keys.NULL).join(_lineas(texto)))
+
+
+def escribir(
+    driver: "webdriver.Remote",
+    entrada: "WebElement",
+    texto: str,
+    modo: str = COMPOSER_MODE,
+) -> str:
+    """
+    Escribe `texto` en el composer del chat, sin enviarlo (el ENTER lo manda
+    quien llama). Devuelve la estrategia que se usó: "insert", "keys" o
+    "fallback" (inserción en bloque rechazada o incompleta -> tecla por tecla).
+    """
+    if modo == MODO_INSERCION:
+        if _insertar(driver, entrada, texto):
+            usado = MODO_INSERCION
+        else:
+            print("[BOT] El composer no aceptó la inserción en bloque; se escribe tecla por tecla.")
+            try:
+                driver.execute_script(_JS_VACIAR, entrada)
+            except JavascriptException:
+                pass
+            _teclear(entrada, texto)
+            usado = "fallback"
+    else:
+        _teclear(entrada, texto)
+        usado = MODO_TECLAS
+    ESCRITURAS_COMPOSER.labels(usado).inc()
+    return usado
@@ -0,0 +1,68 @@
+# app/core/contadores.py
+import time
+from collections import Counter
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import Session
+
+from app.config import COUNTER_FLUSH_SECONDS
+from app.core.estadisticas import sumar_estadisticas
+from app.models import Thread
+
+_threads = Thread.__table__
+
+# UPDATE atómico: el incremento lo hace la BD (messages_sent = messages_sent + n),
+# así dos envíos simultáneos al mismo usuario no se pisan
+_SQL_INCREMENTAR = (
+    update(_threads)
+    .where(_threads.c.thread_id == bindparam("b_thread_id"))
+    .values(messages_sent=_threads.c.messages_sent + bindparam("b_n"))
+)
+
+
+class ContadorMensajes:
+    """
+    Acumula los mensajes realmente enviados por thread_id durante un job y
+    los vuelca en un único UPDATE por lote (executemany en una transacción),
+    como mucho cada `intervalo` segundos.
+    """
+
+    def __init__(self, db: Session, intervalo: float = COUNTER_FLUSH_SECONDS) -> None:
+        self.db = db
+        self.intervalo = intervalo
+        self._pendientes: Counter = Counter()
+        self._ultimo_flush = time.monotonic()
+
+    def sumar(self, thread_id: str, n: int) -> None:
+        if n > 0:
+            self._pendientes[thread_id] += n
+
+    def flush_si_corresponde(self) -> None:
+        if time.monotonic() - self._ultimo_flush >= self.intervalo:
+            self.flush()
+
+    def flush(self) -> None:
+        self._ultimo_flush = time.monotonic()
+        if not self._pendientes:
+            return
+        # Solo cuentan los threads guardados en BD (un thread_id numérico
+        # recibido directo puede no tener fila)
+        existentes = set(
+            self.db.execute(
+                select(_threads.c.thread_id).where(
+                    _threads.c.thread_id.in_(list(self._pendientes))
+                )
+            ).scalars()
+        )
+        params = [
+            {"b_thread_id": thread_id, "b_n": n}
+            for thread_id, n in self._pendientes.items()
+            if thread_id in existentes
+        ]
+        if params:
+            self.db.execute(_SQL_INCREMENTAR, params)
+            # Totales de /api/stats en la misma transacción
+            sumar_estadisticas(self.db, mensajes=sum(p["b_n"] for p in params))
+            self.db.commit()
+        print(f"[BOT] Contadores actualizados para {len(params)} thread(s).")
+        self._pendientes.clear()
@@ -0,0 +1,136 @@
+# app/core/coordinacion.py
+"""
+Coordinación entre procesos de la API (uvicorn con varios workers) con
+advisory locks de Postgres:
+
+- un lease es un pg_advisory_lock de sesión tomado sobre una conexión
+  propia (fuera del pool); se libera al soltarlo o, si el proceso muere,
+  cuando Postgres cierra la conexión: no quedan locks huérfanos;
+- "send-queue": el proceso que lo tiene es el líder y el único que corre
+  envíos (ver JobManager);
+- "browser:<cuenta>:<slot>": una sesión de Chrome por cuenta y slot del
+  pool entre todos los procesos.
+
+Con otra BD (SQLite en desarrollo) no hay locks entre procesos: los
+leases se conceden siempre y la API debe correr en un solo proceso.
+"""
+import hashlib
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.pool import NullPool
+
+from app.config import DATABASE_URL
+from app.db import engine
+
+LEASE_COLA_ENVIOS = "send-queue"
+LEASE_NAVEGADOR = "browser"
+
+# Cada cuánto se reintenta un lease ocupado mientras se espera
+_REINTENTO_LEASE = 0.5
+
+_engine_leases: Optional[Engine] = None
+_engine_lock = threading.Lock()
+_aviso_sin_locks = False
+
+
+def _clave(nombre: str) -> int:
+    """Nombre del lease -> bigint de pg_advisory_lock (estable entre procesos)."""
+    digest = hashlib.sha256(f"igbot:{nombre}".encode()).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+def _conexion_propia() -> Connection:
+    """
+    Conexión dedicada y en autocommit: el lock vive lo que vive la conexión,
+    así que no puede volver al pool ni quedar "idle in transaction".
+    """
+    global _engine_leases
+    with _engine_lock:
+        if _engine_leases is None:
+            _engine_leases = create_engine(DATABASE_URL, poolclass=NullPool, future=True)
+    return _engine_leases.connect().execution_options(isolation_level="AUTOCOMMIT")
+
+
+def hay_locks_entre_procesos() -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+class Lease:
+    """Advisory lock de sesión tomado; liberar() lo suelta y cierra la conexión."""
+
+    def __init__(self, nombre: str, conexion: Optional[Connection] = None) -> None:
+        self.nombre = nombre
+        self._conexion = conexion
+
+    def vigente(self) -> bool:
+        """False si se perdió la conexión (y con ella el lock)."""
+        if self._conexion is None:
+            return True
+        try:
+            self._conexion.execute(text("SELECT 1"))
+            return True
+        except DBAPIError:
+            return False
+
+    def liberar(self) -> None:
+        conexion, self._conexion = self._conexion, None
+        if conexion is None:
+            return
+        try:
+            conexion.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _clave(self.nombre)})
+        except DBAPIError:
+            pass  # conexión caída: Postgres ya soltó el lock
+        finally:
+            conexion.close()
+
+
+def intentar_lease(nombre: str) -> Optional[Lease]:
+    """Toma el lease si está libre (sin esperar); None si lo tiene otro proceso."""
+    global _aviso_sin_locks
+    if not hay_locks_entre_procesos():
+        if not _aviso_sin_locks:
+            print(f"[COORD] {engine.dialect.name} no tiene advisory locks: leases locales (un solo proceso).")
+            _aviso_sin_locks = True
+        return Lease(nombre)
+
+    conexion = _conexion_propia()
+    try:
+        tomado = conexion.execute(
+            text("SELECT pg_try_advisory_lock(:k)"), {"k": _clave(nombre)}
+        ).scalar()
+    except BaseException:
+        conexion.close()
+        raise
+    if not tomado:
+        conexion.close()
+        return None
+    return Lease(nombre, conexion)
+
+
+def esperar_lease(nombre: str, timeout: Optional[float] = None) -> Optional[Lease]:
+    """Como intentar_lease() pero reintenta hasta `timeout` segundos (None = sin límite)."""
+    limite = None if timeout is None else time.monotonic() + timeout
+    while True:
+        lease = intentar_lease(nombre)
+        if lease is not None:
+            return lease
+        if limite is not None and time.monotonic() >= limite:
+            return None
+        time.sleep(_REINTENTO_LEASE)
+
+
+def nombre_lease_navegador(cuenta: str, slot: int) -> str:
+    return f"{LEASE_NAVEGADOR}:{cuenta}:{slot}"
+
+
+def cerrar_engine_leases() -> None:
+    global _engine_leases
+    with _engine_lock:
+        if _engine_leases is not None:
+            _engine_leases.dispose()
+            _engine_leases = None
@@ -0,0 +1,176 @@
+# app/core/destinatarios.py
+import csv
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.orm import Session
+
+from app.config import RECIPIENT_IMPORT_CHUNK
+from app.core.thread_cache import resolver_thread_ids
+from app.db import insert_sin_duplicados
+from app.models import RecipientSet, RecipientSetItem
+
+TIPO_USERNAME = "username"
+TIPO_THREAD_ID = "thread_id"
+
+# Usernames de Instagram: letras, números, punto y guion bajo (máx. 30)
+_USERNAME_VALIDO = re.compile(r"^[a-z0-9._]{1,30}$")
+# Primera línea de un CSV con encabezado
+_ENCABEZADOS = {"username", "usuario", "recipient", "recipients", "destinatario", "destinatarios", "thread_id"}
+
+
+def limpiar_username(username: str) -> str:
+    """Normaliza el username (sin @, lower-case)."""
+    return username.strip().lstrip("@").lower()
+
+
+def normalizar_destinatario(crudo: str) -> Optional[Tuple[str, str]]:
+    """
+    (tipo, valor) con las mismas reglas que enviar_mensajes: solo dígitos
+    => thread_id; si no, username normalizado. None si no es válido.
+    """
+    crudo = crudo.strip()
+    if crudo.isdigit():
+        return TIPO_THREAD_ID, crudo
+    username = limpiar_username(crudo)
+    if _USERNAME_VALIDO.match(username):
+        return TIPO_USERNAME, username
+    return None
+
+
+def _primera_celda(linea: str) -> str:
+    """Primera columna de una línea CSV (o la línea entera si es TXT)."""
+    if "," not in linea and '"' not in linea:
+        return linea.strip()
+    try:
+        celdas = next(csv.reader([linea]))
+    except (csv.Error, StopIteration):
+        return ""
+    return celdas[0].strip() if celdas else ""
+
+
+class ImportadorDestinatarios:
+    """
+    Importa un archivo de destinatarios en una sola pasada y por lotes:
+
+    - normaliza cada línea (normalizar_destinatario);
+    - deduplica con la restricción única (set_id, value) e
+      INSERT ... ON CONFLICT DO NOTHING, así la memoria no depende del
+      tamaño de la lista (solo del lote);
+    - resuelve en bloque contra threads (cache + IN (...)) los usernames ya
+      conocidos, para saber de antemano cuántos pasarán por ig.me.
+
+    El set queda con completed=False hasta terminar(); si la importación se
+    corta, descartar() lo borra junto con los lotes ya guardados.
+    """
+
+    def __init__(self, db: Session, nombre: Optional[str] = None, lote: int = RECIPIENT_IMPORT_CHUNK) -> None:
+        self.db = db
+        self.lote = max(1, lote)
+        self.set = RecipientSet(name=nombre)
+        db.add(self.set)
+        db.commit()
+        db.refresh(self.set)
+
+        self._dialecto = db.get_bind().dialect.name
+        self._pendientes: List[Tuple[str, str]] = []
+        self._vistos_lote: set = set()
+        self._lineas = 0
+        self._validas = 0
+        self._invalidas = 0
+
+    def agregar_linea(self, linea: str) -> None:
+        self._lineas += 1
+        if not linea.strip():
+            return
+        # Primera columna vacía (",alice") = destinatario inválido, no otra columna
+        celda = _primera_celda(linea)
+        if self._lineas == 1 and celda.lower() in _ENCABEZADOS:
+            return
+        normalizado = normalizar_destinatario(celda)
+        if normalizado is None:
+            self._invalidas += 1
+            return
+        self._validas += 1
+        # Duplicados dentro del lote se descartan acá; entre lotes, en la BD
+        if normalizado[1] in self._vistos_lote:
+            return
+        self._vistos_lote.add(normalizado[1])
+        self._pendientes.append(normalizado)
+        if len(self._pendientes) >= self.lote:
+            self._volcar()
+
+    def _volcar(self) -> None:
+        if not self._pendientes:
+            return
+        conocidos = resolver_thread_ids(
+            self.db, [v for t, v in self._pendientes if t == TIPO_USERNAME]
+        )
+        # position = número de destinatario válido leído (mantiene el orden del archivo)
+        base = self._validas - len(self._pendientes)
+        filas = [
+            {
+                "set_id": self.set.id,
+                "position": base + i,
+                "value": valor,
+                "kind": tipo,
+                "thread_id": valor if tipo == TIPO_THREAD_ID else conocidos.get(valor),
+            }
+            for i, (tipo, valor) in enumerate(self._pendientes)
+        ]
+        self.db.execute(
+            insert_sin_duplicados(RecipientSetItem, self._dialecto, ["set_id", "value"]), filas
+        )
+        self.db.commit()
+        self._pendientes = []
+        self._vistos_lote = set()
+
+    def terminar(self) -> RecipientSet:
+        """Vuelca el último lote y guarda el resumen en recipient_sets."""
+        self._volcar()
+        item = RecipientSetItem
+        total, usernames, thread_ids, con_thread = self.db.execute(
+            select(
+                func.count(),
+                func.coalesce(func.sum(case((item.kind == TIPO_USERNAME, 1), else_=0)), 0),
+                func.coalesce(func.sum(case((item.kind == TIPO_THREAD_ID, 1), else_=0)), 0),
+                func.count(item.thread_id),
+            ).where(item.set_id == self.set.id)
+        ).one()
+        self.db.execute(
+            update(RecipientSet)
+            .where(RecipientSet.id == self.set.id)
+            .values(
+                total_lines=self._lineas,
+                recipients=total,
+                usernames=usernames,
+                thread_ids=thread_ids,
+                known_threads=con_thread,
+                duplicates=self._validas - total,
+                invalid=self._invalidas,
+                completed=True,
+            )
+        )
+        self.db.commit()
+        self.db.refresh(self.set)
+        return self.set
+
+    def descartar(self) -> None:
+        """Borra el set y los destinatarios ya volcados (importación interrumpida)."""
+        self.db.rollback()
+        self.db.execute(delete(RecipientSetItem).where(RecipientSetItem.set_id == self.set.id))
+        self.db.execute(delete(RecipientSet).where(RecipientSet.id == self.set.id))
+        self.db.commit()
+
+
+def destinatarios_de_set(db: Session, set_id: int) -> List[str]:
+    """Destinatarios del set en el orden del archivo original."""
+    return [
+        valor
+        for (valor,) in db.execute(
+            select(RecipientSetItem.value)
+            .where(RecipientSetItem.set_id == set_id)
+            .order_by(RecipientSetItem.position)
+        )
+    ]
@@ -0,0 +1,82 @@
+# app/core/estadisticas.py
+"""
+Totales de /api/stats mantenidos de forma incremental en thread_stats.
+
+Reconstruir / conciliar contra la tabla threads:
+    python -m app.core.estadisticas
+"""
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models import Thread, ThreadStats
+
+STATS_ID = 1
+
+_stats = ThreadStats.__table__
+
+
+def sumar_estadisticas(db: Session, threads: int = 0, mensajes: int = 0) -> None:
+    """
+    Suma a los totales con un UPDATE atómico sobre la fila única.
+    NO hace commit: se llama dentro de la transacción del insert/incremento.
+    """
+    if not threads and not mensajes:
+        return
+    resultado = db.execute(
+        update(_stats)
+        .where(_stats.c.id == STATS_ID)
+        .values(
+            total_threads=_stats.c.total_threads + threads,
+            total_messages_sent=_stats.c.total_messages_sent + mensajes,
+        )
+    )
+    if resultado.rowcount == 0:
+        # La fila todavía no existe: se crea con los totales reales
+        # (que ya incluyen lo de esta transacción tras el flush)
+        db.flush()
+        db.add(ThreadStats(id=STATS_ID, **_calcular_totales(db)))
+
+
+async def leer_estadisticas_async(db: AsyncSession) -> ThreadStats:
+    """Lectura por PK; si la fila no existe se reconstruye una vez."""
+    stats = await db.get(ThreadStats, STATS_ID)
+    if stats is None:
+        stats = await db.run_sync(reconstruir_estadisticas)
+    return stats
+
+
+def reconstruir_estadisticas(db: Session) -> ThreadStats:
+    """Recalcula los totales desde threads (COUNT + SUM) y los guarda."""
+    stats = db.merge(ThreadStats(id=STATS_ID, **_calcular_totales(db)))
+    db.commit()
+    db.refresh(stats)
+    return stats
+
+
+def _calcular_totales(db: Session) -> dict:
+    total_threads, total_messages = db.query(
+        func.count(Thread.id),
+        func.coalesce(func.sum(Thread.messages_sent), 0),
+    ).one()
+    return {
+        "total_threads": int(total_threads or 0),
+        "total_messages_sent": int(total_messages or 0),
+    }
+
+
+if __name__ == "__main__":
+    from app.db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        antes = db.get(ThreadStats, STATS_ID)
+        antes = (antes.total_threads, antes.total_messages_sent) if antes else None
+        stats = reconstruir_estadisticas(db)
+        despues = (stats.total_threads, stats.total_messages_sent)
+        print(f"[STATS] Antes:   {antes}")
+        print(f"[STATS] Después: {despues}")
+        if antes is not None and antes != despues:
+            print("[STATS] Había diferencias; thread_stats quedó conciliada.")
+    finally:
+        db.close()
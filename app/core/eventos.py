@@ -0,0 +1,159 @@
+# app/core/eventos.py
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+# Tipos de evento de un job de envío
+EVENTO_INICIO = "started"          # el worker tomó (o retomó) el job
+EVENTO_RESUELTO = "resolved"       # destinatario -> thread_id
+EVENTO_CHAT_ABIERTO = "opened"     # chat cargado, composer listo
+EVENTO_MENSAJE = "message"         # un mensaje escrito y enviado
+EVENTO_ADJUNTOS = "attachments"    # adjuntos del destinatario terminados
+EVENTO_LISTO = "done"              # destinatario terminado (data.position)
+EVENTO_FALLO = "failed"            # falló un destinatario, se saltea (data.position)
+EVENTO_FIN = "finished"            # el job terminó (data.status = done|failed|cancelled)
+
+# Posición de un evento en el stream de un job: (id de la última fila de
+# send_job_recipients, eventos desde esa fila). Es el `id` SSE ("57" o
+# "57.3") tanto en el proceso líder como en los demás, que solo leen filas.
+Cursor = Tuple[int, int]
+
+
+def cursor_sse(cursor: Cursor) -> str:
+    fila, sub = cursor
+    return str(fila) if sub == 0 else f"{fila}.{sub}"
+
+
+def leer_cursor(crudo: Optional[str]) -> Cursor:
+    """Last-Event-ID -> cursor; (0, 0) si falta o no es válido."""
+    fila, _, sub = (crudo or "").strip().partition(".")
+    try:
+        return max(0, int(fila)), max(0, int(sub or 0))
+    except ValueError:
+        return 0, 0
+
+
+def avanzar_cursor(cursor: Cursor) -> Cursor:
+    return cursor[0], cursor[1] + 1
+
+
+class BusEventos:
+    """
+    Eventos de progreso de los jobs de envío, en memoria del proceso.
+
+    - El worker (hilo) publica; los endpoints SSE (event loop) escuchan.
+    - Cada evento lleva un `id` (Cursor) creciente por job: los done /
+      failed con el id de su fila en send_job_recipients y los demás con
+      el de la última fila más un contador. Un cliente que se reconecta con
+      Last-Event-ID recibe solo lo que le faltó, aunque el id venga de
+      otro proceso (que arma los mismos ids desde la BD).
+    - Se guarda el historial de los últimos `max_jobs` jobs.
+    - Un job reanudado vuelve a emitir `started` (con la última fila ya
+      guardada): se descarta el historial de la corrida anterior pero los
+      ids siguen creciendo.
+    """
+
+    def __init__(self, max_jobs: int = 200, max_eventos: int = 10000) -> None:
+        self.max_jobs = max_jobs
+        self.max_eventos = max_eventos
+        self._lock = threading.Lock()
+        self._historial: "OrderedDict[int, List[Tuple[Cursor, dict]]]" = OrderedDict()
+        self._cursor: Dict[int, Cursor] = {}
+        self._terminados: set = set()
+        self._suscriptores: Dict[int, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+
+    def publicar(self, job_id: int, tipo: str, fila: Optional[int] = None, **datos) -> dict:
+        """
+        `fila`: id en send_job_recipients del resultado (done / failed) o,
+        en `started`, el de la última fila que ya tenía el job.
+        """
+        with self._lock:
+            historial = self._historial.setdefault(job_id, [])
+            self._historial.move_to_end(job_id)
+            if tipo == EVENTO_INICIO:
+                historial.clear()
+                self._terminados.discard(job_id)
+            anterior = self._cursor.get(job_id, (0, 0))
+            if fila is not None and fila > anterior[0]:
+                cursor = (fila, 0 if tipo in (EVENTO_LISTO, EVENTO_FALLO) else 1)
+            else:
+                cursor = avanzar_cursor(anterior)
+            self._cursor[job_id] = cursor
+            evento = {
+                "id": cursor_sse(cursor),
+                "job_id": job_id,
+                "type": tipo,
+                "ts": time.time(),
+                **datos,
+            }
+            historial.append((cursor, evento))
+            if len(historial) > self.max_eventos:
+                del historial[0]
+            if tipo == EVENTO_FIN:
+                self._terminados.add(job_id)
+            while len(self._historial) > self.max_jobs:
+                viejo, _ = self._historial.popitem(last=False)
+                self._terminados.discard(viejo)
+                self._cursor.pop(viejo, None)
+            suscriptores = list(self._suscriptores.get(job_id, ()))
+        for loop, cola in suscriptores:
+            loop.call_soon_threadsafe(cola.put_nowait, (cursor, evento))
+        return evento
+
+    def conocido(self, job_id: int) -> bool:
+        with self._lock:
+            return job_id in self._historial
+
+    async def escuchar(
+        self,
+        job_id: int,
+        desde: Cursor = (0, 0),
+        latido: Optional[float] = None,
+    ) -> AsyncIterator[Optional[dict]]:
+        """
+        Devuelve los eventos posteriores a `desde` y luego los nuevos, hasta
+        el evento de fin (que se entrega siempre, sea cual sea su id). Si
+        pasan `latido` segundos sin eventos entrega None (para que el
+        endpoint mande un keep-alive).
+        """
+        cola: asyncio.Queue = asyncio.Queue()
+        suscripcion = (asyncio.get_running_loop(), cola)
+        with self._lock:
+            pendientes = [
+                (c, e) for c, e in self._historial.get(job_id, ())
+                if c > desde or e["type"] == EVENTO_FIN
+            ]
+            terminado = job_id in self._terminados
+            if not terminado:
+                self._suscriptores.setdefault(job_id, []).append(suscripcion)
+        try:
+            ultimo = desde
+            for cursor, evento in pendientes:
+                ultimo = max(ultimo, cursor)
+                yield evento
+            if terminado:
+                return
+            while True:
+                try:
+                    cursor, evento = await asyncio.wait_for(cola.get(), latido)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if cursor <= ultimo and evento["type"] != EVENTO_FIN:
+                    continue
+                ultimo = max(ultimo, cursor)
+                yield evento
+                if evento["type"] == EVENTO_FIN:
+                    return
+        finally:
+            with self._lock:
+                lista = self._suscriptores.get(job_id, [])
+                if suscripcion in lista:
+                    lista.remove(suscripcion)
+                if not lista:
+                    self._suscriptores.pop(job_id, None)
+
+
+bus_eventos = BusEventos()
@@ -0,0 +1,11 @@
+# app/core/excepciones.py
+# Sin dependencias de Selenium: se pueden importar desde la API sin cargar
+# el stack del navegador.
+
+
+class InstagramBotError(Exception):
+    """Error específico para el bot de Instagram."""
+
+
+class EnvioCancelado(InstagramBotError):
+    """El envío se detuvo porque se pidió cancelar el job."""
@@ -1,10 +1,12 @@
-import os
-import time
-from typing import List, Optional
+import weakref
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set, Tuple
 from urllib.parse import urlparse
 
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chromium.remote_connection import ChromiumRemoteConnection
 from selenium.common.exceptions import (
     WebDriverException,
     TimeoutException,
@@ -13,16 +15,54 @@ from selenium.common.exceptions import (
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
 
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
-from app.config import IG_USERNAME, IG_PASSWORD, CHROME_BINARY
+from app.config import (
+    CHROME_BINARY,
+    IG_BASE_URL,
+    IG_ME_BASE_URL,
+    IG_PASSWORD,
+    IG_USERNAME,
+    POPUP_RECHECK_SECONDS,
+    SEND_MAX_CONSECUTIVE_FAILURES,
+    WEBDRIVER_BIDI,
+    WEBDRIVER_TRACE,
+)
+from app.core.adjuntos import preparar_adjuntos
+from app.core.composer import escribir
+from app.core.contadores import ContadorMensajes
+from app.core.destinatarios import limpiar_username
+from app.core.estadisticas import sumar_estadisticas
+from app.core.eventos import (
+    EVENTO_ADJUNTOS,
+    EVENTO_CHAT_ABIERTO,
+    EVENTO_FALLO,
+    EVENTO_LISTO,
+    EVENTO_MENSAJE,
+    EVENTO_RESUELTO,
+)
+from app.core.excepciones import EnvioCancelado, InstagramBotError
+from app.core.metricas import DESTINATARIOS, medir_fase
+from app.core.pacing import ACCION_ABRIR_CHAT, ACCION_ADJUNTO, ACCION_TEXTO, get_pacer
+from app.core.perfiles import bloquear_recursos, perfil_navegador
+from app.core.thread_cache import cache_threads, resolver_thread_ids
+from app.core.waits import (
+    documento_listo,
+    esperar,
+    esperar_navegacion,
+    marca_navegacion,
+    presupuesto,
+)
+from app.core.webdriver_trace import traza_de, trazar
+from app.db import insert_sin_duplicados
 from app.models import Thread
 
 
-class InstagramBotError(Exception):
-    """Error específico para el bot de Instagram."""
+XPATH_TEXTBOX = "//div[@role='textbox']"
+XPATH_INPUT_ARCHIVO = "//input[@type='file']"
+XPATH_BOTON_ENVIAR_ARCHIVO = "//div[@role='button' and text()='Enviar']"
 
 
 # ===============================
@@ -43,37 +83,48 @@ def extraer_thread_id_desde_url(url: str) -> str:
     raise ValueError(f"URL de thread no reconocida: {url}")
 
 
-def limpiar_username(username: str) -> str:
-    """Normaliza el username (sin @, lower-case)."""
-    return username.strip().lstrip("@").lower()
-
-
 # ===============================
 # Selenium: creación de driver
 # ===============================
 
-def crear_driver() -> webdriver.Remote:
+@medir_fase("launch_browser")
+def crear_driver(perfil: Optional[str] = None, slot: int = 0) -> webdriver.Remote:
     """
     Crea y devuelve una instancia de Chrome conectándose a un ChromeDriver
     que ya está corriendo en http://127.0.0.1:9515
 
     ANTES de usar el bot, hay que ejecutar:
     /usr/local/bin/chromedriver --port=9515
+
+    - perfil: nombre en BROWSER_PROFILES (default BROWSER_PROFILE)
+    - slot: slot del pool de sesiones; con perfiles persistentes cada slot
+      tiene su propio user-data-dir
     """
+    perfil_elegido = perfil_navegador(perfil)
     try:
         options = Options()
-        options.add_argument("--incognito")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
+        for argumento in perfil_elegido.argumentos(slot):
+            options.add_argument(argumento)
 
         if CHROME_BINARY:
             options.binary_location = CHROME_BINARY
+        # BiDi: las esperas de navegación escuchan eventos en vez de sondear
+        if WEBDRIVER_BIDI:
+            options.enable_bidi = True
 
+        # ChromiumRemoteConnection agrega executeCdpCommand (bloqueo de recursos)
         driver = webdriver.Remote(
-            command_executor="http://127.0.0.1:9515",
+            command_executor=ChromiumRemoteConnection(
+                "http://127.0.0.1:9515", vendor_prefix="goog", browser_name="chrome"
+            ),
             options=options,
         )
-        driver.maximize_window()
+        if not perfil_elegido.headless:
+            driver.maximize_window()
+        bloquear_recursos(driver, perfil_elegido)
+        print(f"[BOT] Chrome creado con perfil '{perfil_elegido.nombre}' (slot {slot}).")
+        if WEBDRIVER_TRACE:
+            trazar(driver)
         return driver
 
     except WebDriverException as e:
@@ -86,6 +137,7 @@ def crear_driver() -> webdriver.Remote:
 # Login IG 
 # ===============================
 
+@medir_fase("login")
 def login_ig(
     driver: webdriver.Remote,
     username: Optional[str] = None,
@@ -107,88 +159,187 @@ def login_ig(
         raise InstagramBotError("Faltan credenciales IG_USERNAME o IG_PASSWORD")
 
     print("[BOT] Abriendo página de login de Instagram...")
-    driver.get("https://www.instagram.com/accounts/login/")
-    wait = WebDriverWait(driver, 25)
+    driver.get(f"{IG_BASE_URL}/accounts/login/")
+
+    # Con un user-data-dir persistente la sesión de la corrida anterior
+    # puede seguir viva: no hace falta volver a loguearse
+    if driver.get_cookie("sessionid") is not None:
+        print("[BOT] Sesión de Instagram ya iniciada (perfil persistente).")
+        return
 
     # Campos de login
-    entrada_usuario = wait.until(EC.presence_of_element_located((By.NAME, "username")))
-    entrada_contra = wait.until(EC.presence_of_element_located((By.NAME, "password")))
+    try:
+        entrada_usuario = esperar(
+            driver, "login_form", EC.presence_of_element_located((By.NAME, "username"))
+        )
+        entrada_contra = esperar(
+            driver, "login_form", EC.presence_of_element_located((By.NAME, "password"))
+        )
+    except TimeoutException:
+        raise InstagramBotError("Timeout esperando el formulario de login de Instagram")
 
     print("[BOT] Escribiendo credenciales...")
     entrada_usuario.clear()
     entrada_usuario.send_keys(username)
     entrada_contra.clear()
     entrada_contra.send_keys(password)
+    marca = marca_navegacion(driver)
     entrada_contra.send_keys(Keys.ENTER)
 
-    time.sleep(2) 
     # Esperar a que la URL ya no sea /accounts/login
     print("[BOT] Esperando a que termine el login...")
     try:
-        WebDriverWait(driver, 25).until(
-            lambda d: "accounts/login" not in d.current_url
+        url = esperar_navegacion(
+            driver, "login_done", lambda u: "accounts/login" not in u, desde=marca
         )
     except TimeoutException:
         raise InstagramBotError("Timeout esperando que termine el login de Instagram")
 
-    # Pequeña pausa para que se estabilice la página
-    time.sleep(2)
-    print(f"[BOT] Login completado. URL actual: {driver.current_url}")
+    # En lugar de una pausa fija, esperar a que la página termine de cargar
+    try:
+        esperar(driver, "login_ready", documento_listo)
+    except TimeoutException:
+        print("[BOT] La página post-login no terminó de cargar; se continúa igual.")
+    print(f"[BOT] Login completado. URL actual: {url}")
+
+
+def sesion_activa(driver: webdriver.Remote) -> bool:
+    """
+    Indica si el driver sigue vivo y con la sesión de Instagram iniciada.
+
+    - Si Chrome/ChromeDriver ya no responden, lanza WebDriverException.
+    - Si responden pero no está la cookie "sessionid" (sesión expirada o
+      nunca logueada), devuelve False.
+    """
+    if urlparse(IG_BASE_URL).netloc not in (driver.current_url or ""):
+        driver.get(f"{IG_BASE_URL}/")
+    return driver.get_cookie("sessionid") is not None
 
 
 # ===============================
 # Popup "Turn on Notifications"
 # ===============================
 
-def cerrar_popup_notificaciones(driver, timeout: int = 15) -> None:
+# XPaths candidatos del botón "Not Now"
+XPATHS_POPUP_NOTIFICACIONES = [
+    # Por texto, forma más robusta
+    "//button[normalize-space()='Not Now']",
+    "//div[@role='button' and normalize-space()='Not Now']",
+    # XPath absoluto que viste en DevTools
+    "/html/body/div[4]/div[1]/div/div[2]/div/div/div/div/div[2]/div/div/div[3]/button[2]",
+]
+
+# Evalúa todos los XPaths en el navegador en un solo round-trip y devuelve
+# [índice, elemento] del primero visible y habilitado, o null.
+_JS_BUSCAR_POPUP = """
+const xpaths = arguments[0];
+for (let i = 0; i < xpaths.length; i++) {
+  const el = document.evaluate(
+    xpaths[i], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+  ).singleNodeValue;
+  if (el && el.offsetParent !== null && !el.disabled) return [i, el];
+}
+return null;
+"""
+
+
+@dataclass
+class MemoriaPopup:
+    """Lo que ya sabemos del popup en una sesión de navegador concreta."""
+    revisado: bool = False          # ya se hizo una espera completa
+    cerrado: bool = False           # ya se cerró al menos una vez
+    xpath: Optional[str] = None     # XPath que funcionó la última vez
+
+
+_memoria_popup: "weakref.WeakKeyDictionary[webdriver.Remote, MemoriaPopup]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def memoria_popup(driver: webdriver.Remote) -> MemoriaPopup:
+    """Memoria del popup asociada al driver (se descarta junto con él)."""
+    memoria = _memoria_popup.get(driver)
+    if memoria is None:
+        memoria = _memoria_popup[driver] = MemoriaPopup()
+    return memoria
+
+
+@medir_fase("close_popup")
+def cerrar_popup_notificaciones(driver, timeout: Optional[float] = None) -> None:
     """
     Cierra el popup "Turn on Notifications" haciendo clic en el botón "Not Now".
     Si no aparece, simplemente no hace nada.
-    """
-    wait = WebDriverWait(driver, timeout)
-
-    xpaths = [
-        # Por texto, forma más robusta
-        "//button[normalize-space()='Not Now']",
-        "//div[@role='button' and normalize-space()='Not Now']",
-        # XPath absoluto que viste en DevTools
-        "/html/body/div[4]/div[1]/div/div[2]/div/div/div/div/div[2]/div/div/div[3]/button[2]",
-    ]
 
-    for xp in xpaths:
+    Todos los XPaths candidatos se vigilan a la vez en una única espera.
+    La primera vez por sesión se espera hasta el presupuesto del paso
+    "popup"; después (popup ya cerrado o ya confirmado ausente) solo se hace
+    un chequeo rápido de POPUP_RECHECK_SECONDS, probando primero el XPath
+    que funcionó. Un `timeout` explícito fuerza esa duración.
+    """
+    memoria = memoria_popup(driver)
+    if timeout is None:
+        timeout = POPUP_RECHECK_SECONDS if memoria.revisado else presupuesto("popup")[1]
+
+    xpaths = list(XPATHS_POPUP_NOTIFICACIONES)
+    if memoria.xpath in xpaths:
+        xpaths.remove(memoria.xpath)
+        xpaths.insert(0, memoria.xpath)
+
+    if timeout <= 0:
+        # Sin ventana de espera: un solo chequeo directo, sin WebDriverWait
+        encontrado = driver.execute_script(_JS_BUSCAR_POPUP, xpaths)
+    else:
         try:
-            boton = wait.until(EC.element_to_be_clickable((By.XPATH, xp)))
-            boton.click()
-            time.sleep(1)
-            print(f"[BOT] Popup 'Turn on Notifications' cerrado con XPath: {xp}")
-            return
+            encontrado = esperar(
+                driver,
+                "popup",
+                lambda d: d.execute_script(_JS_BUSCAR_POPUP, xpaths),
+                maximo=timeout,
+            )
         except TimeoutException:
-            # No apareció con este xpath, probamos el siguiente
-            continue
-        except Exception as e:
-            print(f"[BOT] Error al cerrar popup con xpath {xp}: {e}")
-            return
+            encontrado = None
+    if not encontrado:
+        memoria.revisado = True
+        print("[BOT] Popup 'Turn on Notifications' no apareció o ya estaba cerrado.")
+        return
+
+    indice, boton = encontrado
+    xp = xpaths[indice]
+    try:
+        boton.click()
+    except Exception as e:
+        print(f"[BOT] Error al cerrar popup con xpath {xp}: {e}")
+        return
+    try:
+        esperar(driver, "popup_closed", EC.invisibility_of_element(boton))
+    except TimeoutException:
+        pass
 
-    print("[BOT] Popup 'Turn on Notifications' no apareció o ya estaba cerrado.")
+    memoria.revisado = memoria.cerrado = True
+    memoria.xpath = xp
+    print(f"[BOT] Popup 'Turn on Notifications' cerrado con XPath: {xp}")
 
 
 # ===============================
 # Resolución de thread_id (ig.me)
 # ===============================
 
+@medir_fase("resolve_thread")
 def obtener_o_crear_thread_id(
     db: Session,
     driver: webdriver.Remote,
     destinatario: str,
-    timeout: int = 15,
+    timeout: Optional[float] = None,
+    conocidos: Optional[Dict[str, str]] = None,
 ) -> str:
     """
     Dado un destinatario:
     - si es solo dígitos => se asume que ya es un thread_id y se devuelve directo.
-    - si es username => se busca en BD; si no existe:
+    - si es username => se busca en `conocidos` (resueltos en bloque por
+      enviar_mensajes) o, si no se pasa, en la cache y en BD; si no existe:
         * se abre https://ig.me/m/<username> para que IG cree/abra el hilo
         * se extrae el thread_id desde driver.current_url
-        * se guarda en BD para usos futuros
+        * se guarda en BD, en la cache y en `conocidos` para usos futuros
     """
     destinatario = destinatario.strip()
     if not destinatario:
@@ -197,32 +348,38 @@ def obtener_o_crear_thread_id(
     # Caso 1: ya es un thread_id numérico
     if destinatario.isdigit():
         print(f"[BOT] Destinatario '{destinatario}' tratado como thread_id directo.")
+        DESTINATARIOS.labels("direct").inc()
         return destinatario
 
     username_norm = limpiar_username(destinatario)
     print(f"[BOT] Resolviendo username '{username_norm}' -> thread_id")
 
-    # Caso 2: username -> thread_id en BD
-    thread = (
-        db.query(Thread)
-        .filter(Thread.username == username_norm)
-        .first()
-    )
-    if thread:
-        print(f"[BOT] Encontrado en BD: {username_norm} -> {thread.thread_id}")
-        return thread.thread_id
+    # Caso 2: username -> thread_id ya conocido. `conocidos` (resuelto en
+    # bloque contra cache + BD) manda: si no está ahí tampoco está en BD y no
+    # se vuelve a consultar; sin él se busca en cache/BD
+    if conocidos is not None:
+        thread_id = conocidos.get(username_norm)
+    else:
+        thread_id = resolver_thread_ids(db, [username_norm]).get(username_norm)
+    if thread_id is not None:
+        print(f"[BOT] Encontrado en cache/BD: {username_norm} -> {thread_id}")
+        DESTINATARIOS.labels("cached").inc()
+        return thread_id
 
     # Caso 3: primera vez -> usamos ig.me para crear/abrir el hilo
-    ig_me_url = f"https://ig.me/m/{username_norm}"
+    ig_me_url = f"{IG_ME_BASE_URL}/m/{username_norm}"
     print(f"[BOT] No hay thread en BD, abriendo ig.me: {ig_me_url}")
+    marca = marca_navegacion(driver)
     driver.get(ig_me_url)
 
-    time.sleep(2)
-
     # Esperar a que IG redirija a /direct/t/<thread_id>/
     try:
-        WebDriverWait(driver, timeout).until(
-            lambda d: "/direct/t/" in d.current_url
+        current_url = esperar_navegacion(
+            driver,
+            "thread_redirect",
+            lambda u: "/direct/t/" in u,
+            desde=marca,
+            maximo=timeout,
         )
     except TimeoutException as e:
         raise InstagramBotError(
@@ -230,21 +387,31 @@ def obtener_o_crear_thread_id(
             f"(timeout). URL actual: {driver.current_url}"
         ) from e
 
-    current_url = driver.current_url
     print(f"[BOT] URL final tras ig.me: {current_url}")
     thread_id = extraer_thread_id_desde_url(current_url)
     print(f"[BOT] thread_id obtenido: {thread_id}")
 
-    # Guardar en BD
-    if thread:
-        thread.thread_id = thread_id
-    else:
-        thread = Thread(username=username_norm, thread_id=thread_id)
-        db.add(thread)
+    # Guardar en BD y en la cache. Con varios procesos de la API otro puede
+    # haber guardado el mismo hilo mientras tanto: INSERT ... ON CONFLICT DO
+    # NOTHING en lugar de un IntegrityError, y thread_stats suma solo si entró
+    insertados = db.execute(
+        insert_sin_duplicados(Thread, db.get_bind().dialect.name).values(
+            username=username_norm, thread_id=thread_id
+        )
+    ).rowcount
+    if insertados:
+        sumar_estadisticas(db, threads=1)
     db.commit()
-    db.refresh(thread)
+    cache_threads.put(username_norm, thread_id)
+    if conocidos is not None:
+        # Un username repetido más adelante en el mismo envío ya no es nuevo
+        conocidos[username_norm] = thread_id
 
-    print(f"[BOT] Guardado en BD: {username_norm} -> {thread.thread_id}")
+    if insertados:
+        print(f"[BOT] Guardado en BD: {username_norm} -> {thread_id}")
+    else:
+        print(f"[BOT] {username_norm} -> {thread_id} ya estaba en BD (guardado por otro worker).")
+    DESTINATARIOS.labels("resolved").inc()
     return thread_id
 
 
@@ -252,119 +419,283 @@ def obtener_o_crear_thread_id(
 # Envío de mensajes
 # ===============================
 
+def _sin_eventos(tipo: str, **datos) -> None:
+    pass
+
+
+def _tiene_foco(elemento):
+    return lambda d: d.execute_script(
+        "return arguments[0].contains(document.activeElement);", elemento
+    )
+
+
+def _composer_vacio(driver) -> bool:
+    elementos = driver.find_elements(By.XPATH, XPATH_TEXTBOX)
+    return bool(elementos) and not (elementos[0].text or "").strip()
+
+
 def enviar_mensajes(
     db: Session,
     driver: webdriver.Remote,
     cuentas_destinatarias: List[str],
     mensajes: List[str],
     archivos: Optional[List[str]] = None,
-) -> None:
+    cancelado: Optional[Callable[[], bool]] = None,
+    on_evento: Optional[Callable[..., None]] = None,
+    omitir: Optional[Set[int]] = None,
+) -> Dict[str, int]:
     """
     Envía mensajes (y opcionalmente archivos) a una lista de cuentas de Instagram.
 
     - cuentas_destinatarias: lista de @usuarios o IDs numéricos de chat (thread_id)
     - mensajes: lista de textos a enviar
     - archivos: lista de rutas absolutas a archivos a adjuntar (opcional)
+    - cancelado: callback consultado antes de cada destinatario; si devuelve
+      True se lanza EnvioCancelado (opcional)
+    - on_evento: callback `on_evento(tipo, **datos)` con el progreso por
+      destinatario (resolved, opened, message, attachments, done, failed;
+      ver app.core.eventos) (opcional)
+    - omitir: posiciones de cuentas_destinatarias ya procesadas (al
+      reanudar un job) (opcional)
+
+    Un destinatario que falla se informa con `failed` y se saltea; tras
+    SEND_MAX_CONSECUTIVE_FAILURES fallos seguidos se lanza InstagramBotError.
+    Devuelve {"done": n, "failed": m}.
     """
     if not cuentas_destinatarias:
         raise InstagramBotError("No se recibieron destinatarios")
-    if not mensajes:
+    if not any((m or "").strip() for m in mensajes):
         raise InstagramBotError("No se recibieron mensajes")
 
-    archivos = archivos or []
-    wait = WebDriverWait(driver, 20)
+    on_evento = on_evento or _sin_eventos
+    # Validar, hashear y copiar los adjuntos una vez por job; al loop le
+    # llegan rutas ya verificadas (falla acá si falta alguno)
+    archivos = [a.ruta for a in preparar_adjuntos(archivos or [])]
+
+    # Resolver de una vez (cache + un IN (...) a la BD) todos los usernames
+    # ya conocidos; solo los que falten pasan por ig.me dentro del loop
+    conocidos = resolver_thread_ids(
+        db,
+        [
+            limpiar_username(c)
+            for c in cuentas_destinatarias
+            if c.strip() and not c.strip().isdigit()
+        ],
+    )
+
+    contador = ContadorMensajes(db)
+    try:
+        resumen = _enviar_a_destinatarios(
+            db, driver, cuentas_destinatarias, mensajes, archivos,
+            conocidos, contador, cancelado, on_evento, omitir or set(),
+        )
+    except BaseException:
+        # Lo ya enviado se cuenta aunque el job falle o se cancele a mitad.
+        # Si el error fue de BD la transacción quedó abortada: rollback antes
+        # del flush, y un fallo del flush no reemplaza al error original
+        try:
+            db.rollback()
+            contador.flush()
+        except SQLAlchemyError as e:
+            print(f"[BOT] No se pudieron guardar los contadores tras el error: {e}")
+        raise
+    contador.flush()
+    return resumen
+
 
-    for cuenta in cuentas_destinatarias:
+def _enviar_a_destinatarios(
+    db: Session,
+    driver: webdriver.Remote,
+    cuentas_destinatarias: List[str],
+    mensajes: List[str],
+    archivos: List[str],
+    conocidos: Dict[str, str],
+    contador: ContadorMensajes,
+    cancelado: Optional[Callable[[], bool]],
+    on_evento: Callable[..., None],
+    omitir: Set[int],
+) -> Dict[str, int]:
+    traza = traza_de(driver)
+    resumen = {"done": 0, "failed": 0}
+    seguidos = 0
+    for posicion, cuenta in enumerate(cuentas_destinatarias):
         cuenta = cuenta.strip()
-        if not cuenta:
+        if not cuenta or posicion in omitir:
             continue
 
+        if cancelado and cancelado():
+            raise EnvioCancelado(f"Envío cancelado antes de procesar {cuenta}")
+
         print(f"[BOT] ---- Procesando destinatario: {cuenta} ----")
+        try:
+            with medir_fase("recipient"), (traza.segmento(cuenta) if traza else nullcontext()):
+                thread_id, enviados, adjuntos = _enviar_a_destinatario(
+                    db, driver, cuenta, mensajes, archivos, conocidos, contador, on_evento,
+                    cancelado,
+                )
+        except EnvioCancelado:
+            raise
+        except (InstagramBotError, WebDriverException) as e:
+            # Error propio de este destinatario: se registra y se sigue
+            DESTINATARIOS.labels("failed").inc()
+            on_evento(EVENTO_FALLO, recipient=cuenta, position=posicion, detail=str(e))
+            print(f"[BOT] Falló {cuenta}, se saltea: {e}")
+            resumen["failed"] += 1
+            seguidos += 1
+            if SEND_MAX_CONSECUTIVE_FAILURES and seguidos >= SEND_MAX_CONSECUTIVE_FAILURES:
+                raise InstagramBotError(
+                    f"{seguidos} destinatarios seguidos fallaron (último: {cuenta}: {e}); "
+                    "envío detenido, se puede reanudar"
+                ) from e
+            continue
+        except Exception as e:
+            # Error inesperado: se corta el job. Sin `position` el destinatario
+            # no queda registrado y se vuelve a intentar al reanudar
+            DESTINATARIOS.labels("failed").inc()
+            on_evento(EVENTO_FALLO, recipient=cuenta, detail=str(e))
+            raise
+
+        seguidos = 0
+        resumen["done"] += 1
+        on_evento(
+            EVENTO_LISTO,
+            recipient=cuenta,
+            position=posicion,
+            thread_id=thread_id,
+            messages=enviados,
+            attachments=adjuntos,
+        )
 
-        # 1) Resolver thread_id (BD + ig.me)
-        thread_id = obtener_o_crear_thread_id(db, driver, cuenta)
+        # Volcar a la BD los contadores acumulados si pasó el intervalo
+        # (un único UPDATE atómico por lote, ver ContadorMensajes)
+        with medir_fase("flush_counters"):
+            contador.flush_si_corresponde()
 
-        # 2) Ir directo al hilo por URL
-        chat_url = f"https://www.instagram.com/direct/t/{thread_id}/"
-        print(f"[BOT] Navegando al chat: {chat_url}")
+        print(f"[BOT] ---- Fin destinatario: {cuenta} ----")
+    return resumen
+
+
+def _enviar_a_destinatario(
+    db: Session,
+    driver: webdriver.Remote,
+    cuenta: str,
+    mensajes: List[str],
+    archivos: List[str],
+    conocidos: Dict[str, str],
+    contador: ContadorMensajes,
+    on_evento: Callable[..., None],
+    cancelado: Optional[Callable[[], bool]] = None,
+) -> Tuple[str, int, int]:
+    """
+    Abre el chat de un destinatario y le envía textos y adjuntos.
+    Devuelve (thread_id, mensajes enviados, adjuntos enviados).
+
+    Cada acción (abrir chat, enviar texto, subir adjunto) pide antes un
+    permiso al pacing de la cuenta (app.core.pacing).
+    """
+    pacer = get_pacer()
+
+    # 1) Resolver thread_id (BD + ig.me); el permiso de abrir chat cubre
+    # también la visita a ig.me
+    pacer.adquirir(ACCION_ABRIR_CHAT, cancelado)
+    thread_id = obtener_o_crear_thread_id(db, driver, cuenta, conocidos=conocidos)
+    on_evento(EVENTO_RESUELTO, recipient=cuenta, thread_id=thread_id)
+
+    # 2) Ir directo al hilo por URL
+    chat_url = f"{IG_BASE_URL}/direct/t/{thread_id}/"
+    print(f"[BOT] Navegando al chat: {chat_url}")
+    with medir_fase("open_chat"):
         driver.get(chat_url)
 
-        # 2.1) Cerrar popup "Turn on Notifications" si aparece
-        cerrar_popup_notificaciones(driver, timeout=15)
-        time.sleep(2)  # pequeña pausa para que se estabilice la vista
+    # 2.1) Cerrar popup "Turn on Notifications" si aparece
+    cerrar_popup_notificaciones(driver)
 
-        # 3) Esperar a que aparezca el área de texto del mensaje
-        try:
-            entrada = wait.until(
-                EC.presence_of_element_located(
-                    (By.XPATH, "//div[@role='textbox']")
-                )
-            )
-        except TimeoutException:
-            raise InstagramBotError(
-                f"No se encontró el área de texto del chat para thread_id {thread_id}"
-            )
+    # 3) Esperar a que aparezca el área de texto del mensaje
+    try:
+        entrada = esperar(
+            driver,
+            "chat_textbox",
+            EC.presence_of_element_located((By.XPATH, XPATH_TEXTBOX)),
+        )
+    except TimeoutException:
+        raise InstagramBotError(
+            f"No se encontró el área de texto del chat para thread_id {thread_id}"
+        )
+    on_evento(EVENTO_CHAT_ABIERTO, recipient=cuenta, thread_id=thread_id)
 
-        # 4) Enviar textos
-        for texto in mensajes:
-            texto = (texto or "").strip()
-            if not texto:
-                continue
+    # 4) Enviar textos
+    enviados = 0
+    for indice, texto in enumerate(mensajes, start=1):
+        texto = (texto or "").strip()
+        if not texto:
+            continue
 
+        pacer.adquirir(ACCION_TEXTO, cancelado)
+        with medir_fase("type_message"):
             try:
                 entrada.click()
             except ElementClickInterceptedException:
                 # Algo tapó el textbox: intentamos cerrar el popup y reintentar
                 print("[BOT] Click interceptado, reintentando tras cerrar popup...")
                 cerrar_popup_notificaciones(driver, timeout=10)
-                entrada = wait.until(
-                    EC.presence_of_element_located(
-                        (By.XPATH, "//div[@role='textbox']")
-                    )
+                entrada = esperar(
+                    driver,
+                    "chat_textbox",
+                    EC.presence_of_element_located((By.XPATH, XPATH_TEXTBOX)),
                 )
                 driver.execute_script("arguments[0].click();", entrada)
-                
-            time.sleep(1)
-            entrada.send_keys(texto)
+
+            # Esperar a que el textbox tenga el foco antes de escribir
+            try:
+                esperar(driver, "composer_ready", _tiene_foco(entrada))
+            except TimeoutException:
+                print("[BOT] El textbox no tomó el foco; se escribe igual.")
+            # Texto completo en el composer (saltos de línea incluidos) y ENTER
+            escribir(driver, entrada, texto)
             entrada.send_keys(Keys.ENTER)
-            time.sleep(0.5)  # pequeña pausa entre mensajes
 
-        # 5) Enviar archivos adjuntos (si hay)
-        for path in archivos:
-            path = path.strip()
-            if not path or not os.path.exists(path):
-                continue
+            # El mensaje salió cuando el composer vuelve a quedar vacío
             try:
-                input_archivo = wait.until(
-                    EC.presence_of_element_located(
-                        (By.XPATH, "//input[@type='file']")
-                    )
+                esperar(driver, "message_sent", _composer_vacio)
+            except TimeoutException:
+                print("[BOT] El composer no se vació tras ENTER; se continúa.")
+            # Solo cuentan los mensajes realmente enviados (no los vacíos)
+            contador.sumar(thread_id, 1)
+            enviados += 1
+        on_evento(EVENTO_MENSAJE, recipient=cuenta, index=indice, total=len(mensajes))
+
+    # 5) Enviar archivos adjuntos (si hay)
+    adjuntos, fallidos = 0, []
+    for path in archivos:
+        pacer.adquirir(ACCION_ADJUNTO, cancelado)
+        with medir_fase("upload_attachment"):
+            try:
+                input_archivo = esperar(
+                    driver,
+                    "attachment_input",
+                    EC.presence_of_element_located((By.XPATH, XPATH_INPUT_ARCHIVO)),
                 )
                 input_archivo.send_keys(path)
-                time.sleep(3)
 
-                boton_enviar_archivo = wait.until(
-                    EC.element_to_be_clickable(
-                        (By.XPATH, "//div[@role='button' and text()='Enviar']")
-                    )
+                # El botón "Enviar" se habilita cuando la vista previa está lista
+                boton_enviar_archivo = esperar(
+                    driver,
+                    "attachment_ready",
+                    EC.element_to_be_clickable((By.XPATH, XPATH_BOTON_ENVIAR_ARCHIVO)),
                 )
                 driver.execute_script(
                     "arguments[0].click();", boton_enviar_archivo
                 )
-                time.sleep(2)
+                esperar(
+                    driver,
+                    "attachment_sent",
+                    EC.invisibility_of_element_located((By.XPATH, XPATH_BOTON_ENVIAR_ARCHIVO)),
+                )
+                adjuntos += 1
             except Exception as e:
                 print(f"[BOT] No se pudo enviar archivo {path}: {e}")
+                fallidos.append(path)
+    if archivos:
+        on_evento(EVENTO_ADJUNTOS, recipient=cuenta, sent=adjuntos, failed=fallidos)
+    return thread_id, enviados, adjuntos
 
-        # 6) Actualizar contador de mensajes enviados en BD (solo si era username)
-        username_norm = limpiar_username(cuenta) if not cuenta.isdigit() else None
-        if username_norm:
-            thread = (
-                db.query(Thread)
-                .filter(Thread.username == username_norm)
-                .first()
-            )
-            if thread:
-                thread.messages_sent = (thread.messages_sent or 0) + len(mensajes)
-                db.commit()
-
-        print(f"[BOT] ---- Fin destinatario: {cuenta} ----")
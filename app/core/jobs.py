@@ -0,0 +1,601 @@
+# app/core/jobs.py
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import (
+    COORDINATION_POLL_SECONDS,
+    IDEMPOTENCY_KEY_TTL_HOURS,
+    SEND_JOB_WORKERS,
+    SEND_SHUTDOWN_TIMEOUT_SECONDS,
+)
+from app.core.coordinacion import LEASE_COLA_ENVIOS, Lease, intentar_lease
+from app.core.destinatarios import destinatarios_de_set
+from app.core.eventos import EVENTO_FALLO, EVENTO_FIN, EVENTO_INICIO, EVENTO_LISTO, bus_eventos
+from app.core.excepciones import EnvioCancelado, InstagramBotError
+from app.core.metricas import promedio_fase
+from app.core.pacing import ACCION_ABRIR_CHAT, ACCION_ADJUNTO, ACCION_TEXTO, get_pacer
+from app.core.session_pool import get_session_pool
+from app.db import SessionLocal
+from app.models import RecipientSetItem, SendIdempotencyKey, SendJob, SendJobRecipient
+
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+JOB_FINISHED = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+# Resultado por destinatario (send_job_recipients.status)
+RECIPIENT_DONE = "done"
+RECIPIENT_FAILED = "failed"
+
+
+def _ahora() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class ClaveReutilizada(ValueError):
+    """La Idempotency-Key ya se usó con un cuerpo distinto."""
+
+
+def hash_payload(payload: dict) -> str:
+    """sha256 del payload normalizado (claves ordenadas, sin espacios)."""
+    crudo = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(crudo.encode()).hexdigest()
+
+
+class JobManager:
+    """
+    Ejecuta los envíos en segundo plano con un pool acotado de workers.
+
+    POST /api/send solo persiste el job en la tabla send_jobs; el worker
+    toma una sesión del pool de navegadores, corre enviar_mensajes y deja
+    el resultado en la misma fila.
+
+    La cola es de un solo proceso: con varios workers de uvicorn, el que
+    tiene el lease "send-queue" (app.core.coordinacion) es el líder y es el
+    único que toma jobs (SELECT ... FOR UPDATE SKIP LOCKED) y abre
+    navegadores. Los demás solo encolan y leen; si el líder cae, otro toma
+    el lease en COORDINATION_POLL_SECONDS.
+
+    Cada vez que se toma el lease se genera un token nuevo que queda en
+    send_jobs.owner de los jobs que se pasan a running: el resultado final
+    solo se escribe si el job sigue siendo de ese token, y al tomar el
+    liderazgo no se dan por caídos los jobs que este proceso todavía corre.
+    Si se pierde el lease, los jobs locales se detienen antes del próximo
+    destinatario.
+    """
+
+    def __init__(
+        self,
+        workers: int = SEND_JOB_WORKERS,
+        intervalo: float = COORDINATION_POLL_SECONDS,
+    ) -> None:
+        self.workers = max(1, workers)
+        self.intervalo = intervalo
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, workers),
+            thread_name_prefix="send-job",
+        )
+        self._lock = threading.Lock()
+        self._en_curso = 0
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._lease: Optional[Lease] = None
+        self._token: Optional[str] = None
+        # Jobs que corre este proceso y los que debe detener (lease perdido)
+        self._locales: set = set()
+        self._detenidos: set = set()
+        self._despachador: Optional[threading.Thread] = None
+
+    # ---------- API pública ----------
+    def encolar(self, db: Session, payload: dict) -> SendJob:
+        job = SendJob(status=JOB_QUEUED, payload=payload)
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        self._despertar.set()
+        return job
+
+    def encolar_idempotente(self, db: Session, payload: dict, clave: str) -> Tuple[SendJob, bool]:
+        """
+        Como encolar(), pero una sola vez por Idempotency-Key: si la clave ya
+        existe (y no venció) devuelve su job, en curso o terminado, sin
+        encolar otro. Devuelve (job, creado). Lanza ClaveReutilizada si la
+        clave se usó con otro cuerpo.
+
+        El job y la clave se insertan en la misma transacción; si dos
+        requests con la misma clave llegan a la vez, la PK de la clave deja
+        pasar a uno y el otro devuelve el job del primero.
+        """
+        request_hash = hash_payload(payload)
+        vencimiento = _ahora() - timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)
+
+        existente = self._job_de_clave(db, clave, request_hash, vencimiento)
+        if existente is not None:
+            return existente, False
+
+        db.execute(delete(SendIdempotencyKey).where(SendIdempotencyKey.created_at < vencimiento))
+        job = SendJob(status=JOB_QUEUED, payload=payload)
+        db.add(job)
+        db.flush()
+        db.add(SendIdempotencyKey(key=clave, request_hash=request_hash, job_id=job.id))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Otro request con la misma clave ganó la carrera
+            db.rollback()
+            existente = self._job_de_clave(db, clave, request_hash, None)
+            if existente is None:
+                raise
+            return existente, False
+        db.refresh(job)
+        self._despertar.set()
+        return job, True
+
+    @staticmethod
+    def _job_de_clave(
+        db: Session,
+        clave: str,
+        request_hash: str,
+        vencimiento: Optional[datetime],
+    ) -> Optional[SendJob]:
+        fila = db.get(SendIdempotencyKey, clave)
+        if fila is None:
+            return None
+        creada = fila.created_at
+        if creada is not None and creada.tzinfo is None:
+            creada = creada.replace(tzinfo=timezone.utc)  # SQLite no guarda la zona
+        if vencimiento is not None and creada is not None and creada < vencimiento:
+            db.delete(fila)
+            db.commit()
+            return None
+        if fila.request_hash != request_hash:
+            raise ClaveReutilizada(
+                f"La Idempotency-Key '{clave}' ya se usó con otro cuerpo (job {fila.job_id})"
+            )
+        return db.get(SendJob, fila.job_id)
+
+    def obtener(self, db: Session, job_id: int) -> Optional[SendJob]:
+        return db.get(SendJob, job_id)
+
+    def listar(
+        self,
+        db: Session,
+        status: Optional[str] = None,
+        limit: int = 50,
+    ) -> List[SendJob]:
+        query = db.query(SendJob)
+        if status:
+            query = query.filter(SendJob.status == status)
+        return query.order_by(SendJob.id.desc()).limit(limit).all()
+
+    def resumen_destinatarios(self, db: Session, job_ids: List[int]) -> Dict[int, Tuple[int, int]]:
+        """{job_id: (destinatarios ok, destinatarios fallidos)} en una sola query."""
+        if not job_ids:
+            return {}
+        r = SendJobRecipient
+        filas = db.execute(
+            select(
+                r.job_id,
+                func.coalesce(func.sum(case((r.status == RECIPIENT_DONE, 1), else_=0)), 0),
+                func.coalesce(func.sum(case((r.status == RECIPIENT_FAILED, 1), else_=0)), 0),
+            )
+            .where(r.job_id.in_(job_ids))
+            .group_by(r.job_id)
+        )
+        return {job_id: (ok, fallidos) for job_id, ok, fallidos in filas}
+
+    def total_destinatarios(self, db: Session, job: SendJob) -> int:
+        if job.payload.get("recipient_set_id") is not None:
+            return db.scalar(
+                select(func.count()).where(RecipientSetItem.set_id == job.payload["recipient_set_id"])
+            )
+        return len(job.payload.get("recipients") or [])
+
+    def estimar(self, db: Session, job: SendJob) -> dict:
+        """
+        Cola y fin estimado de un job en cola o en curso:
+
+        - queue_position: jobs pendientes creados antes (comparten los
+          límites de la cuenta);
+        - pending_recipients: destinatarios de este job sin resultado;
+        - eta_seconds: lo que tardan en agotarse, con los permisos que
+          piden todos ellos contra los límites del pacing (y la franja de
+          silencio), o al ritmo medido por destinatario si es más lento.
+        """
+        if job.status in JOB_FINISHED:
+            return {"queue_position": None, "pending_recipients": 0, "eta_seconds": None}
+        activos = list(
+            db.scalars(
+                select(SendJob)
+                .where(SendJob.status.in_((JOB_QUEUED, JOB_RUNNING)), SendJob.id <= job.id)
+                .order_by(SendJob.id)
+            )
+        )
+        resumen = self.resumen_destinatarios(db, [j.id for j in activos])
+        trabajo = {ACCION_ABRIR_CHAT: 0, ACCION_TEXTO: 0, ACCION_ADJUNTO: 0}
+        destinatarios = pendientes = 0
+        for j in activos:
+            ok, fallidos = resumen.get(j.id, (0, 0))
+            pendientes = max(0, self.total_destinatarios(db, j) - ok - fallidos)
+            destinatarios += pendientes
+            trabajo[ACCION_ABRIR_CHAT] += pendientes
+            trabajo[ACCION_TEXTO] += pendientes * sum(1 for m in j.payload["messages"] if (m or "").strip())
+            trabajo[ACCION_ADJUNTO] += pendientes * len(j.payload.get("attachments") or [])
+        # Al final del loop `pendientes` es el del propio job (el de id más alto)
+        por_destinatario = promedio_fase("recipient") or 0.0
+        return {
+            "queue_position": sum(1 for j in activos if j.id != job.id),
+            "pending_recipients": pendientes,
+            "eta_seconds": get_pacer().estimar_segundos(
+                trabajo, minimo=destinatarios * por_destinatario / self.workers
+            ),
+        }
+
+    def resultados(
+        self,
+        db: Session,
+        job_id: int,
+        status: Optional[str] = None,
+        despues: Optional[int] = None,
+        limit: int = 100,
+    ) -> List[SendJobRecipient]:
+        """Resultados por destinatario en orden de lista (paginado por posición)."""
+        query = select(SendJobRecipient).where(SendJobRecipient.job_id == job_id)
+        if status:
+            query = query.where(SendJobRecipient.status == status)
+        if despues is not None:
+            query = query.where(SendJobRecipient.position > despues)
+        return list(db.scalars(query.order_by(SendJobRecipient.position).limit(limit)))
+
+    def reanudar(self, db: Session, job_id: int, reintentar_fallidos: bool = False) -> Optional[SendJob]:
+        """
+        Vuelve a encolar un job detenido (failed/cancelled, o done con
+        reintentar_fallidos). El worker saltea los destinatarios que ya tienen
+        resultado; con reintentar_fallidos se borran los fallidos para
+        volver a intentarlos. Lanza ValueError si el job no se puede reanudar.
+        """
+        job = db.get(SendJob, job_id)
+        if job is None:
+            return None
+        reanudables = (JOB_FAILED, JOB_CANCELLED) + ((JOB_DONE,) if reintentar_fallidos else ())
+        if job.status not in reanudables:
+            raise ValueError(f"El job {job_id} está {job.status}; no se puede reanudar")
+        if reintentar_fallidos:
+            db.execute(
+                delete(SendJobRecipient).where(
+                    SendJobRecipient.job_id == job_id,
+                    SendJobRecipient.status == RECIPIENT_FAILED,
+                )
+            )
+        job.status = JOB_QUEUED
+        job.cancel_requested = False
+        job.detail = "Reanudado."
+        job.started_at = None
+        job.finished_at = None
+        db.commit()
+        db.refresh(job)
+        self._despertar.set()
+        return job
+
+    def cancelar(self, db: Session, job_id: int) -> Optional[SendJob]:
+        """
+        Un job en cola se cancela directamente; uno en curso se marca y el
+        worker lo detiene antes del siguiente destinatario.
+        """
+        # FOR UPDATE: no se cruza con el líder que toma el job en ese momento
+        job = db.get(SendJob, job_id, with_for_update=True)
+        if job is None or job.status in JOB_FINISHED:
+            return job
+        job.cancel_requested = True
+        if job.status == JOB_QUEUED:
+            job.status = JOB_CANCELLED
+            job.detail = "Cancelado antes de iniciar."
+            job.finished_at = _ahora()
+        db.commit()
+        db.refresh(job)
+        if job.status == JOB_CANCELLED:
+            bus_eventos.publicar(job_id, EVENTO_FIN, status=job.status, detail=job.detail)
+        return job
+
+    def iniciar(self) -> None:
+        """Arranca el hilo que se disputa el liderazgo y despacha la cola."""
+        if self._despachador is None:
+            self._despachador = threading.Thread(
+                target=self._despachar, name="send-queue", daemon=True
+            )
+            self._despachador.start()
+
+    def es_lider(self) -> bool:
+        """True si este proceso corre los envíos (tiene el lease de la cola)."""
+        return self._lease is not None
+
+    def recuperar_pendientes(self) -> None:
+        """
+        Al tomar el liderazgo: marca como fallidos los jobs que estaban
+        corriendo cuando se cayó el líder anterior (o este proceso). Los que
+        quedaron en cola los toma el despachador. No toca los jobs del token
+        actual ni los que siguen en los workers de este proceso.
+        """
+        with self._lock:
+            locales = list(self._locales)
+        db = SessionLocal()
+        try:
+            query = db.query(SendJob).filter(
+                SendJob.status == JOB_RUNNING,
+                or_(SendJob.owner.is_(None), SendJob.owner != self._token),
+            )
+            if locales:
+                query = query.filter(SendJob.id.notin_(locales))
+            for job in query:
+                job.status = JOB_FAILED
+                job.detail = "Interrumpido por reinicio de la API (se puede reanudar)."
+                job.finished_at = _ahora()
+            db.commit()
+        finally:
+            db.close()
+
+    def cerrar(self, espera: float = SEND_SHUTDOWN_TIMEOUT_SECONDS) -> None:
+        """
+        Deja de despachar y detiene los jobs locales antes del próximo
+        destinatario (quedan cancelados, reanudables). El lease se suelta
+        recién cuando terminaron (o pasaron `espera` segundos): antes, otro
+        proceso podría tomar la cola y reanudar un job que este sigue enviando.
+        """
+        self._detener.set()
+        self._despertar.set()
+        if self._despachador is not None:
+            self._despachador.join(timeout=5)
+        with self._lock:
+            self._detenidos |= self._locales
+        # Los que no arrancaron todavía terminan al instante (ver _ejecutar)
+        self._executor.shutdown(wait=False)
+        limite = time.monotonic() + espera
+        while True:
+            with self._lock:
+                pendientes = sorted(self._locales)
+            if not pendientes or time.monotonic() >= limite:
+                break
+            time.sleep(0.05)
+        if pendientes:
+            print(f"[JOB] Los jobs {pendientes} no se detuvieron en {espera:.0f} s; se suelta la cola igual.")
+        if self._lease is not None:
+            self._lease.liberar()
+            self._lease = None
+
+    # ---------- Despachador (líder) ----------
+    def _despachar(self) -> None:
+        while not self._detener.is_set():
+            self._despertar.clear()
+            try:
+                if self._lease is not None and not self._lease.vigente():
+                    self._perder_lease()
+                elif self._lease is None:
+                    lease = intentar_lease(LEASE_COLA_ENVIOS)
+                    if lease is not None:
+                        self._token = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+                        self._lease = lease
+                        print(f"[JOB] Proceso {os.getpid()}: líder de la cola de envíos.")
+                        self.recuperar_pendientes()
+                if self._lease is not None:
+                    self._tomar_jobs()
+            except Exception as e:
+                # BD caída o similar: se reintenta en el próximo ciclo
+                print(f"[JOB] Error en el despachador de envíos: {e}")
+            self._despertar.wait(self.intervalo)
+
+    def _perder_lease(self) -> None:
+        """
+        Se cortó la conexión del lease: otro proceso puede ser líder ya. Se
+        deja de despachar y se detienen los jobs locales antes del próximo
+        destinatario; el lease se vuelve a pedir recién en el ciclo siguiente.
+        """
+        with self._lock:
+            self._detenidos |= self._locales
+            detenidos = sorted(self._locales)
+        print(
+            "[JOB] Se perdió el lease de la cola de envíos; se deja de despachar"
+            + (f" y se detienen los jobs {detenidos}." if detenidos else ".")
+        )
+        self._lease.liberar()
+        self._lease = None
+        self._token = None
+
+    def _tomar_jobs(self) -> None:
+        """Pasa a running los próximos jobs en cola, hasta llenar los workers, y los ejecuta."""
+        with self._lock:
+            libres = self.workers - self._en_curso
+        if libres <= 0:
+            return
+        token = self._token
+        db = SessionLocal()
+        try:
+            jobs = list(
+                db.scalars(
+                    select(SendJob)
+                    .where(SendJob.status == JOB_QUEUED)
+                    .order_by(SendJob.id)
+                    .limit(libres)
+                    .with_for_update(skip_locked=True)
+                )
+            )
+            for job in jobs:
+                job.status = JOB_RUNNING
+                job.owner = token
+                job.started_at = _ahora()
+            db.commit()
+            ids = [job.id for job in jobs]
+        finally:
+            db.close()
+        for job_id in ids:
+            with self._lock:
+                self._en_curso += 1
+                self._locales.add(job_id)
+            self._executor.submit(self._ejecutar, job_id, token)
+
+    # ---------- Worker ----------
+    def _ejecutar(self, job_id: int, token: str) -> None:
+        # Selenium se carga recién cuando corre el primer envío
+        from app.core.instagram_bot import enviar_mensajes
+
+        db = SessionLocal()
+        try:
+            # _tomar_jobs() ya lo pasó a running
+            job = db.get(SendJob, job_id)
+            if job is None or job.status != JOB_RUNNING or job.owner != token:
+                return
+
+            payload = job.payload
+            destinatarios = payload.get("recipients") or []
+            if payload.get("recipient_set_id") is not None:
+                destinatarios = destinatarios_de_set(db, payload["recipient_set_id"])
+            # Al reanudar: posiciones que ya tienen resultado (y la última fila,
+            # desde donde siguen los ids de los eventos)
+            filas = db.execute(
+                select(SendJobRecipient.id, SendJobRecipient.position).where(
+                    SendJobRecipient.job_id == job_id
+                )
+            ).all()
+            procesados = {posicion for _, posicion in filas}
+            bus_eventos.publicar(
+                job_id,
+                EVENTO_INICIO,
+                fila=max((fila_id for fila_id, _ in filas), default=0),
+                recipients=len(destinatarios),
+                pending=len(destinatarios) - len(procesados),
+            )
+
+            def on_evento(tipo: str, **datos) -> None:
+                fila = None
+                if tipo in (EVENTO_LISTO, EVENTO_FALLO) and "position" in datos:
+                    fila = _registrar_resultado(db, job_id, tipo, datos)
+                bus_eventos.publicar(job_id, tipo, fila=fila, **datos)
+
+            try:
+                if job_id in self._detenidos:
+                    # Tomado justo antes de detenerse: ni siquiera pide sesión
+                    raise EnvioCancelado("Envío detenido antes de iniciar")
+                with get_session_pool().sesion() as sesion:
+                    enviar_mensajes(
+                        db=db,
+                        driver=sesion.driver,
+                        cuentas_destinatarias=destinatarios,
+                        mensajes=payload["messages"],
+                        archivos=payload.get("attachments") or [],
+                        cancelado=lambda: job_id in self._detenidos or self._cancelado(db, job_id),
+                        on_evento=on_evento,
+                        omitir=procesados,
+                    )
+                # Totales de todas las corridas del job (incluye las anteriores a reanudar)
+                ok, fallidos = self.resumen_destinatarios(db, [job_id]).get(job_id, (0, 0))
+                if fallidos:
+                    detail = (
+                        f"Enviado a {ok} destinatarios; {fallidos} fallaron "
+                        f"(ver /api/jobs/{job_id}/recipients?status=failed)."
+                    )
+                else:
+                    detail = "Mensajes enviados correctamente."
+                status = JOB_DONE
+            except EnvioCancelado as e:
+                status, detail = JOB_CANCELLED, str(e)
+                if job_id in self._detenidos:
+                    detail = (
+                        "Detenido por cierre de la API (se puede reanudar)."
+                        if self._detener.is_set()
+                        else "Detenido: este proceso perdió el liderazgo de la cola (se puede reanudar)."
+                    )
+            except InstagramBotError as e:
+                status, detail = JOB_FAILED, str(e)
+            except Exception as e:
+                status, detail = JOB_FAILED, f"Error interno: {e}"
+
+            db.rollback()
+            # Solo si sigue siendo de este token: si otro líder ya lo dio por
+            # caído (o lo reanudó), su estado manda
+            escrito = db.execute(
+                update(SendJob)
+                .where(SendJob.id == job_id, SendJob.status == JOB_RUNNING, SendJob.owner == token)
+                .values(status=status, detail=detail, finished_at=_ahora())
+            ).rowcount
+            db.commit()
+            if not escrito:
+                print(f"[JOB] Job {job_id} ya no es de este proceso; no se pisa su estado ({status}).")
+                return
+            bus_eventos.publicar(job_id, EVENTO_FIN, status=status, detail=detail)
+            print(f"[JOB] Job {job_id} terminado: {status} ({detail})")
+        finally:
+            db.close()
+            with self._lock:
+                self._en_curso -= 1
+                self._locales.discard(job_id)
+                self._detenidos.discard(job_id)
+            self._despertar.set()
+
+    @staticmethod
+    def _cancelado(db: Session, job_id: int) -> bool:
+        return bool(
+            db.query(SendJob.cancel_requested)
+            .filter(SendJob.id == job_id)
+            .scalar()
+        )
+
+
+def _registrar_resultado(db: Session, job_id: int, tipo: str, datos: dict) -> int:
+    """Guarda (y commitea) el resultado de un destinatario apenas termina; devuelve el id de la fila."""
+    if not db.is_active:
+        # El fallo dejó la transacción abortada (p. ej. error de BD)
+        db.rollback()
+    fila = SendJobRecipient(
+        job_id=job_id,
+        position=datos["position"],
+        recipient=datos.get("recipient", ""),
+        status=RECIPIENT_DONE if tipo == EVENTO_LISTO else RECIPIENT_FAILED,
+        thread_id=datos.get("thread_id"),
+        messages_sent=datos.get("messages", 0),
+        attachments_sent=datos.get("attachments", 0),
+        detail=datos.get("detail"),
+    )
+    db.add(fila)
+    db.flush()
+    fila_id = fila.id
+    db.commit()
+    return fila_id
+
+
+# ===============================
+# Manager global del proceso
+# ===============================
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Devuelve el JobManager del proceso, creándolo la primera vez."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
+
+
+def cerrar_job_manager() -> None:
+    global _manager
+    with _manager_lock:
+        if _manager is not None:
+            _manager.cerrar()
+            _manager = None
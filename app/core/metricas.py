@@ -0,0 +1,162 @@
+# app/core/metricas.py
+"""
+Métricas Prometheus del proceso (expuestas en GET /metrics).
+
+- igbot_bot_phase_seconds{phase}: duración de cada fase de login_ig y
+  enviar_mensajes (launch_browser, login, prepare_attachments, resolve_thread, open_chat, close_popup,
+  type_message, upload_attachment, flush_counters, recipient).
+- igbot_wait_seconds{step} / igbot_wait_timeouts_total{step}: esperas
+  del bot por paso (ver app.core.waits).
+- igbot_recipients_total{result}: destinatarios por resultado (direct,
+  cached, resolved, failed).
+- igbot_browser_sessions{state}: sesiones del pool de navegadores.
+- igbot_browser_rss_bytes{profile, slot}: memoria de cada Chrome del pool
+  (perfil de BROWSER_PROFILES; requiere psutil).
+- igbot_pacing_wait_seconds{action}: espera por un permiso del pacing
+  (open_chat, send_text, upload; ver app.core.pacing).
+- igbot_composer_writes_total{mode}: mensajes escritos en el composer por
+  estrategia (insert, keys, fallback; ver app.core.composer).
+- igbot_db_query_seconds{route, operation}: cada query SQL, etiquetada con
+  la ruta de la API que la originó ("background" fuera de un request).
+- igbot_webdriver_command_seconds{command} /
+  igbot_webdriver_commands_per_recipient: traza opcional de comandos
+  WebDriver (ver app.core.webdriver_trace).
+"""
+import time
+from contextvars import ContextVar
+from typing import ContextManager, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Buckets pensados para pasos de navegador (decenas de ms a minutos)
+_BUCKETS_BOT = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+# Buckets para queries (sub-milisegundo a segundos)
+_BUCKETS_DB = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+BOT_FASES = Histogram(
+    "igbot_bot_phase_seconds",
+    "Duración de cada fase del bot (login y envío).",
+    ["phase"],
+    buckets=_BUCKETS_BOT,
+)
+
+ESPERAS = Histogram(
+    "igbot_wait_seconds",
+    "Tiempo real esperado por cada paso de WAIT_BUDGETS.",
+    ["step"],
+    buckets=_BUCKETS_BOT,
+)
+
+ESPERAS_TIMEOUT = Counter(
+    "igbot_wait_timeouts_total",
+    "Esperas que agotaron el máximo del paso.",
+    ["step"],
+)
+
+DESTINATARIOS = Counter(
+    "igbot_recipients_total",
+    "Destinatarios procesados por resultado (direct, cached, resolved, failed).",
+    ["result"],
+)
+
+SESIONES_NAVEGADOR = Gauge(
+    "igbot_browser_sessions",
+    "Sesiones de Chrome del pool por estado (idle, in_use).",
+    ["state"],
+)
+
+MEMORIA_NAVEGADOR = Gauge(
+    "igbot_browser_rss_bytes",
+    "Memoria residente de cada Chrome del pool, con sus procesos hijos (requiere psutil).",
+    ["profile", "slot"],
+)
+
+ESCRITURAS_COMPOSER = Counter(
+    "igbot_composer_writes_total",
+    "Mensajes escritos en el composer por estrategia (insert, keys, fallback).",
+    ["mode"],
+)
+
+ESPERAS_PACING = Histogram(
+    "igbot_pacing_wait_seconds",
+    "Espera por un permiso del token bucket de la cuenta, por acción.",
+    ["action"],
+    buckets=(0.01,) + _BUCKETS_BOT + (300, 900, 3600),
+)
+
+QUERIES_DB = Histogram(
+    "igbot_db_query_seconds",
+    "Duración de cada query SQL por ruta de la API y tipo de sentencia.",
+    ["route", "operation"],
+    buckets=_BUCKETS_DB,
+)
+
+COMANDOS_WEBDRIVER = Histogram(
+    "igbot_webdriver_command_seconds",
+    "Round-trip de cada comando WebDriver a chromedriver (solo con WEBDRIVER_TRACE=1).",
+    ["command"],
+    buckets=_BUCKETS_DB,
+)
+
+COMANDOS_POR_DESTINATARIO = Histogram(
+    "igbot_webdriver_commands_per_recipient",
+    "Comandos WebDriver emitidos por destinatario (solo con WEBDRIVER_TRACE=1).",
+    buckets=(5, 10, 20, 30, 50, 75, 100, 150, 250, 500),
+)
+
+# Ruta de la API del request en curso (la setea etiquetar_ruta en routes.py)
+ruta_actual: ContextVar[str] = ContextVar("ruta_actual", default="background")
+
+
+def medir_fase(fase: str) -> ContextManager:
+    """
+    Observa la duración de un bloque (`with medir_fase("open_chat"): ...`)
+    o de cada llamada a una función (`@medir_fase("login")`).
+    """
+    return BOT_FASES.labels(fase).time()
+
+
+def promedio_fase(fase: str) -> Optional[float]:
+    """Duración media observada de una fase (None si todavía no hubo ninguna)."""
+    total = cantidad = 0.0
+    for metrica in BOT_FASES.collect():
+        for muestra in metrica.samples:
+            if muestra.labels.get("phase") != fase:
+                continue
+            if muestra.name.endswith("_sum"):
+                total = muestra.value
+            elif muestra.name.endswith("_count"):
+                cantidad = muestra.value
+    return total / cantidad if cantidad else None
+
+
+def exportar() -> tuple:
+    """(cuerpo, content-type) en formato de texto de Prometheus."""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+# ===============================
+# Hooks de SQLAlchemy
+# ===============================
+
+def _antes_de_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("metricas_inicio", []).append(time.perf_counter())
+
+
+def _despues_de_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    inicios = conn.info.get("metricas_inicio")
+    if not inicios:
+        return
+    duracion = time.perf_counter() - inicios.pop()
+    operacion = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    QUERIES_DB.labels(ruta_actual.get(), operacion).observe(duracion)
+
+
+def instrumentar_engine(engine: Engine) -> None:
+    """Registra los hooks de timing en un engine sync (o en async_engine.sync_engine)."""
+    if event.contains(engine, "before_cursor_execute", _antes_de_query):
+        return
+    event.listen(engine, "before_cursor_execute", _antes_de_query)
+    event.listen(engine, "after_cursor_execute", _despues_de_query)
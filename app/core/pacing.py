@@ -0,0 +1,242 @@
+# app/core/pacing.py
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from app.config import (
+    IG_USERNAME,
+    PACING_ENABLED,
+    PACING_LIMITS,
+    PACING_QUIET_HOURS,
+    PACING_TIMEZONE,
+)
+from app.core.excepciones import EnvioCancelado
+from app.core.metricas import ESPERAS_PACING
+from app.db import SessionLocal, insert_sin_duplicados
+from app.models import PacingBucket
+
+# Acciones que consumen permisos
+ACCION_ABRIR_CHAT = "open_chat"
+ACCION_TEXTO = "send_text"
+ACCION_ADJUNTO = "upload"
+
+# Tope de cada siesta mientras se espera un permiso (para ver cancelaciones)
+_SIESTA_MAX = 1.0
+
+
+def _parse_silencio(raw: str) -> Optional[Tuple[int, int]]:
+    """"23:00-08:00" -> (minuto de inicio, minuto de fin) del día; None si vacío."""
+    raw = raw.strip()
+    if not raw:
+        return None
+    try:
+        inicio, _, fin = raw.partition("-")
+        minutos = []
+        for hhmm in (inicio, fin):
+            h, _, m = hhmm.strip().partition(":")
+            minutos.append(int(h) * 60 + int(m or 0))
+    except ValueError:
+        raise ValueError(f"PACING_QUIET_HOURS inválido: '{raw}' (formato HH:MM-HH:MM)")
+    return minutos[0], minutos[1]
+
+
+class Pacer:
+    """
+    Permisos de envío por cuenta de Instagram con un token bucket por acción
+    (open_chat, send_text, upload):
+
+    - cada acción se repone a `por_hora` tokens/hora hasta `ráfaga`; sin
+      token disponible, adquirir() espera exactamente lo que falta (no hay
+      pausas fijas: con tokens se sigue al instante);
+    - el estado se guarda en pacing_buckets en cada permiso (SELECT ... FOR
+      UPDATE en Postgres), así los límites valen entre reinicios y entre
+      workers;
+    - en la franja PACING_QUIET_HOURS no se entregan permisos.
+    """
+
+    def __init__(
+        self,
+        limites: Dict[str, Tuple[float, float]] = PACING_LIMITS,
+        silencio: str = PACING_QUIET_HOURS,
+        zona: str = PACING_TIMEZONE,
+        cuenta: Optional[str] = None,
+        habilitado: bool = PACING_ENABLED,
+    ) -> None:
+        self.limites = dict(limites)
+        self.silencio = _parse_silencio(silencio)
+        self.zona = ZoneInfo(zona)
+        self.cuenta = cuenta or IG_USERNAME or "default"
+        self.habilitado = habilitado
+        self._lock = threading.Lock()
+
+    # ---------- Franja de silencio ----------
+    def _fin_silencio(self, momento: datetime) -> Optional[datetime]:
+        """Si `momento` cae en la franja de silencio, cuándo termina; si no, None."""
+        if self.silencio is None:
+            return None
+        local = momento.astimezone(self.zona)
+        inicio, fin = self.silencio
+        minuto = local.hour * 60 + local.minute
+        medianoche = local.replace(hour=0, minute=0, second=0, microsecond=0)
+        if inicio <= fin:
+            if inicio <= minuto < fin:
+                return medianoche + timedelta(minutes=fin)
+            return None
+        # Franja que cruza la medianoche (p. ej. 23:00-08:00)
+        if minuto >= inicio:
+            return medianoche + timedelta(days=1, minutes=fin)
+        if minuto < fin:
+            return medianoche + timedelta(minutes=fin)
+        return None
+
+    def _proximo_silencio(self, momento: datetime) -> Optional[datetime]:
+        if self.silencio is None:
+            return None
+        local = momento.astimezone(self.zona)
+        candidato = local.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(
+            minutes=self.silencio[0]
+        )
+        return candidato if candidato > local else candidato + timedelta(days=1)
+
+    def _sumar_tiempo_activo(self, desde: datetime, segundos: float) -> datetime:
+        """Momento en que se completan `segundos` de trabajo salteando las franjas de silencio."""
+        momento, restante = desde, segundos
+        for _ in range(1000):
+            fin = self._fin_silencio(momento)
+            if fin is not None:
+                momento = fin
+                continue
+            proximo = self._proximo_silencio(momento)
+            if proximo is None or momento + timedelta(seconds=restante) <= proximo:
+                return momento + timedelta(seconds=restante)
+            restante -= (proximo - momento).total_seconds()
+            momento = proximo
+        return momento + timedelta(seconds=restante)
+
+    # ---------- Buckets ----------
+    def _reponer(self, fila: PacingBucket, accion: str, ahora: datetime) -> None:
+        por_hora, rafaga = self.limites[accion]
+        actualizado = fila.updated_at
+        if actualizado.tzinfo is None:
+            actualizado = actualizado.replace(tzinfo=timezone.utc)  # SQLite no guarda la zona
+        transcurrido = max(0.0, (ahora - actualizado).total_seconds())
+        fila.tokens = min(rafaga, fila.tokens + transcurrido * por_hora / 3600)
+        fila.updated_at = ahora
+
+    def _intentar(self, accion: str) -> float:
+        """Toma un token si hay (devuelve 0) o devuelve los segundos que faltan."""
+        por_hora, rafaga = self.limites[accion]
+        ahora = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            fila = db.get(PacingBucket, (self.cuenta, accion), with_for_update=True)
+            if fila is None:
+                # Primer permiso de la acción: si otro worker crea la fila a
+                # la vez, ON CONFLICT DO NOTHING y se usa la suya (ya con lock)
+                db.execute(
+                    insert_sin_duplicados(PacingBucket, db.get_bind().dialect.name).values(
+                        account=self.cuenta, action=accion, tokens=rafaga, updated_at=ahora
+                    )
+                )
+                fila = db.get(PacingBucket, (self.cuenta, accion), with_for_update=True)
+            self._reponer(fila, accion, ahora)
+            if fila.tokens >= 1:
+                fila.tokens -= 1
+                espera = 0.0
+            else:
+                espera = (1 - fila.tokens) * 3600 / por_hora
+            db.commit()
+            return espera
+        finally:
+            db.close()
+
+    def adquirir(self, accion: str, cancelado: Optional[Callable[[], bool]] = None) -> float:
+        """
+        Bloquea hasta obtener un permiso para `accion` y devuelve los
+        segundos esperados. Lanza EnvioCancelado si `cancelado()` se vuelve
+        True mientras espera.
+        """
+        if not self.habilitado or self.limites.get(accion, (0, 0))[0] <= 0:
+            return 0.0
+        inicio = time.monotonic()
+        while True:
+            fin_silencio = self._fin_silencio(datetime.now(timezone.utc))
+            if fin_silencio is not None:
+                espera = (fin_silencio - datetime.now(timezone.utc)).total_seconds()
+            else:
+                with self._lock:
+                    espera = self._intentar(accion)
+                if espera <= 0:
+                    esperado = time.monotonic() - inicio
+                    ESPERAS_PACING.labels(accion).observe(esperado)
+                    return esperado
+            if cancelado and cancelado():
+                raise EnvioCancelado(f"Envío cancelado esperando permiso de {accion}")
+            time.sleep(min(max(espera, 0.01), _SIESTA_MAX))
+
+    def tokens(self, accion: str) -> float:
+        """Tokens disponibles ahora (sin consumir)."""
+        por_hora, rafaga = self.limites[accion]
+        db = SessionLocal()
+        try:
+            fila = db.get(PacingBucket, (self.cuenta, accion))
+            if fila is None:
+                return rafaga
+            self._reponer(fila, accion, datetime.now(timezone.utc))
+            db.expunge(fila)
+            return fila.tokens
+        finally:
+            db.close()
+
+    # ---------- Estimaciones ----------
+    def estimar_segundos(self, trabajo: Dict[str, int], minimo: float = 0.0) -> float:
+        """
+        Segundos hasta completar `trabajo` ({acción: permisos}) sin pasarse
+        de los límites, contando los tokens ya disponibles y la franja de
+        silencio. `minimo` es la duración sin límites (ritmo del navegador).
+        """
+        necesario = minimo
+        if self.habilitado:
+            for accion, cantidad in trabajo.items():
+                por_hora = self.limites.get(accion, (0, 0))[0]
+                if cantidad <= 0 or por_hora <= 0:
+                    continue
+                faltan = cantidad - self.tokens(accion)
+                necesario = max(necesario, max(0.0, faltan) * 3600 / por_hora)
+        ahora = datetime.now(timezone.utc)
+        if not self.habilitado:
+            return necesario
+        return (self._sumar_tiempo_activo(ahora, necesario) - ahora).total_seconds()
+
+    def estado(self) -> List[dict]:
+        silencio_hasta = self._fin_silencio(datetime.now(timezone.utc)) if self.habilitado else None
+        return [
+            {
+                "account": self.cuenta,
+                "action": accion,
+                "per_hour": por_hora,
+                "burst": rafaga,
+                "tokens": self.tokens(accion) if por_hora > 0 else None,
+                "quiet_until": silencio_hasta,
+            }
+            for accion, (por_hora, rafaga) in self.limites.items()
+        ]
+
+
+# ===============================
+# Pacer global del proceso
+# ===============================
+
+_pacer: Optional[Pacer] = None
+_pacer_lock = threading.Lock()
+
+
+def get_pacer() -> Pacer:
+    """Devuelve el Pacer del proceso (cuenta IG_USERNAME), creándolo la primera vez."""
+    global _pacer
+    with _pacer_lock:
+        if _pacer is None:
+            _pacer = Pacer()
+        return _pacer
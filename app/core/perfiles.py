@@ -0,0 +1,131 @@
+# app/core/perfiles.py
+import os
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from app.config import BROWSER_DATA_DIR, BROWSER_PROFILE, BROWSER_PROFILES
+
+if TYPE_CHECKING:
+    from selenium import webdriver
+
+# Patrones para Network.setBlockedURLs por categoría (el bot no mira
+# imágenes, videos ni tipografías: solo el DOM del composer)
+PATRONES_BLOQUEO = {
+    "image": ("*.jpg*", "*.jpeg*", "*.png*", "*.gif*", "*.webp*", "*.heic*", "*.avif*"),
+    "media": ("*.mp4*", "*.webm*", "*.m4a*", "*.m4v*", "*.mp3*", "*.m3u8*", "*.mpd*"),
+    "font": ("*.woff*", "*.ttf*", "*.otf*", "*.eot*"),
+}
+
+# Sin ventana no hay maximize_window(): tamaño fijo de escritorio para que
+# Instagram sirva el layout de desktop (el de los XPaths del bot)
+_TAMANIO_HEADLESS = "1280,900"
+
+_psutil_avisado = False
+
+
+@dataclass(frozen=True)
+class PerfilNavegador:
+    nombre: str
+    headless: bool
+    incognito: bool
+    block: Tuple[str, ...]
+    persistent: bool
+    js_heap_mb: int
+    disk_cache_mb: int
+    single_renderer: bool
+
+    def directorio(self, slot: int) -> Optional[str]:
+        """user-data-dir propio del slot: Chrome no comparte un perfil entre instancias."""
+        if not self.persistent:
+            return None
+        return os.path.join(BROWSER_DATA_DIR, f"{self.nombre}-{slot}")
+
+    def argumentos(self, slot: int) -> List[str]:
+        args = ["--no-sandbox", "--disable-dev-shm-usage"]
+        if self.incognito:
+            args.append("--incognito")
+        if self.headless:
+            args += ["--headless=new", f"--window-size={_TAMANIO_HEADLESS}"]
+        directorio = self.directorio(slot)
+        if directorio:
+            args.append(f"--user-data-dir={directorio}")
+        if self.disk_cache_mb:
+            args.append(f"--disk-cache-size={self.disk_cache_mb * 1024 * 1024}")
+        if self.js_heap_mb:
+            args.append(f"--js-flags=--max-old-space-size={self.js_heap_mb}")
+        if self.single_renderer:
+            args.append("--renderer-process-limit=1")
+        if self.headless or self.block:
+            # Servicios de fondo que no aportan nada a un navegador automatizado
+            args += [
+                "--disable-extensions",
+                "--disable-background-networking",
+                "--disable-component-update",
+                "--disable-default-apps",
+                "--disable-sync",
+                "--mute-audio",
+                "--disable-features=Translate,MediaRouter,OptimizationHints",
+            ]
+        return args
+
+    def urls_bloqueadas(self) -> List[str]:
+        return [p for categoria in self.block for p in PATRONES_BLOQUEO[categoria]]
+
+
+def perfil_navegador(nombre: Optional[str] = None) -> PerfilNavegador:
+    """Perfil de BROWSER_PROFILES (por defecto BROWSER_PROFILE)."""
+    nombre = nombre or BROWSER_PROFILE
+    try:
+        datos = BROWSER_PROFILES[nombre]
+    except KeyError:
+        raise ValueError(
+            f"Perfil de navegador desconocido: {nombre} (opciones: {', '.join(BROWSER_PROFILES)})"
+        )
+    return PerfilNavegador(nombre=nombre, **{**datos, "block": tuple(datos["block"])})
+
+
+def bloquear_recursos(driver: "webdriver.Remote", perfil: PerfilNavegador) -> None:
+    """
+    Bloquea por CDP (Network.setBlockedURLs) las categorías del perfil. Vale
+    para la pestaña del driver en todas sus navegaciones; el driver tiene que
+    haberse creado con ChromiumRemoteConnection (comando executeCdpCommand).
+    """
+    urls = perfil.urls_bloqueadas()
+    if not urls:
+        return
+    driver.execute("executeCdpCommand", {"cmd": "Network.enable", "params": {}})
+    driver.execute(
+        "executeCdpCommand", {"cmd": "Network.setBlockedURLs", "params": {"urls": urls}}
+    )
+
+
+def rss_navegador(driver: "webdriver.Remote") -> Optional[int]:
+    """
+    Memoria residente (bytes) de Chrome y todos sus procesos hijos.
+
+    Busca el proceso por el user-data-dir que informa chromedriver en las
+    capabilities, así que solo funciona con chromedriver en la misma
+    máquina. Necesita psutil (opcional); sin él devuelve None.
+    """
+    global _psutil_avisado
+    try:
+        import psutil
+    except ImportError:
+        if not _psutil_avisado:
+            print("[PERFIL] psutil no está instalado; no se mide la memoria de Chrome.")
+            _psutil_avisado = True
+        return None
+
+    directorio = ((getattr(driver, "caps", None) or {}).get("chrome") or {}).get("userDataDir")
+    if not directorio:
+        return None
+    marca = f"--user-data-dir={directorio}"
+    for proc in psutil.process_iter(["cmdline"]):
+        cmdline = proc.info.get("cmdline") or []
+        if marca in cmdline and not any(a.startswith("--type=") for a in cmdline):
+            try:
+                procesos = [proc, *proc.children(recursive=True)]
+                return sum(p.memory_info().rss for p in procesos if p.is_running())
+            except psutil.Error:
+                return None
+    return None
@@ -0,0 +1,271 @@
+# app/core/session_pool.py
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional
+
+from app.config import BROWSER_PROFILE, IG_USERNAME, SESSION_POOL_SIZE, SESSION_POOL_TIMEOUT
+from app.core.coordinacion import Lease, esperar_lease, nombre_lease_navegador
+from app.core.excepciones import InstagramBotError
+from app.core.metricas import MEMORIA_NAVEGADOR, SESIONES_NAVEGADOR
+from app.core.perfiles import rss_navegador
+
+# Selenium (y el bot) se importan recién al crear la primera sesión, para
+# que la API pueda consultar el estado del pool sin cargar el navegador
+if TYPE_CHECKING:
+    from selenium import webdriver
+
+
+@dataclass
+class SesionNavegador:
+    """Un Chrome ya logueado en Instagram, prestado por el pool."""
+    slot: int
+    driver: "webdriver.Remote"
+    creada_en: float
+    ultimo_login: float
+    usos: int = 0
+    # Lease del slot entre procesos (app.core.coordinacion)
+    lease: Optional[Lease] = None
+
+
+class SessionPool:
+    """
+    Mantiene hasta `size` sesiones de Chrome logueadas y las presta a los
+    envíos, en lugar de crear_driver() + login_ig() + quit() por request.
+
+    - Antes de prestar una sesión se hace un health-check (sesion_activa).
+    - Si el navegador murió se recrea; si solo expiró la sesión de IG,
+      se vuelve a hacer login sobre el mismo navegador.
+    - Las sesiones se crean a demanda hasta `size`.
+    - Cada slot toma antes el lease "browser:<cuenta>:<slot>": con varios
+      procesos de la API hay a lo sumo `size` Chrome logueados por cuenta.
+    """
+
+    def __init__(
+        self,
+        size: int = SESSION_POOL_SIZE,
+        crear: Optional[Callable[[int], "webdriver.Remote"]] = None,
+        login: Optional[Callable[["webdriver.Remote"], None]] = None,
+        chequear: Optional[Callable[["webdriver.Remote"], bool]] = None,
+    ) -> None:
+        if size < 1:
+            raise ValueError("El pool de sesiones necesita al menos 1 sesión")
+        self.size = size
+        self._crear = crear
+        self._login = login
+        self._chequear = chequear
+        self._cond = threading.Condition()
+        self._libres: List[SesionNavegador] = []
+        self._en_uso: Dict[int, SesionNavegador] = {}
+        self._slots_libres: List[int] = list(range(size))
+        self._cerrado = False
+
+    # ---------- Ciclo de vida de una sesión ----------
+    def _cargar_bot(self) -> None:
+        """Importa el bot (y Selenium) la primera vez que hace falta un navegador."""
+        if self._crear and self._login and self._chequear:
+            return
+        from app.core.instagram_bot import crear_driver, login_ig, sesion_activa
+
+        self._crear = self._crear or crear_driver
+        self._login = self._login or login_ig
+        self._chequear = self._chequear or sesion_activa
+
+    def _nueva_sesion(self, slot: int) -> SesionNavegador:
+        self._cargar_bot()
+        lease = esperar_lease(
+            nombre_lease_navegador(IG_USERNAME or "default", slot), timeout=SESSION_POOL_TIMEOUT
+        )
+        if lease is None:
+            raise InstagramBotError(
+                f"La sesión de navegador del slot {slot} la tiene otro proceso de la API"
+            )
+        print(f"[POOL] Creando sesión de navegador (slot {slot})...")
+        try:
+            # El slot elige el user-data-dir cuando el perfil es persistente
+            driver = self._crear(slot)
+            try:
+                self._login(driver)
+            except Exception:
+                _cerrar_driver(driver)
+                raise
+        except BaseException:
+            lease.liberar()
+            raise
+        ahora = time.monotonic()
+        return SesionNavegador(
+            slot=slot, driver=driver, creada_en=ahora, ultimo_login=ahora, lease=lease
+        )
+
+    def _preparar(self, sesion: SesionNavegador) -> SesionNavegador:
+        """Health-check; re-login o recreación solo si hace falta."""
+        from selenium.common.exceptions import WebDriverException
+
+        self._cargar_bot()
+        try:
+            if self._chequear(sesion.driver):
+                return sesion
+            print(f"[POOL] Sesión expirada en slot {sesion.slot}, re-login...")
+            self._login(sesion.driver)
+            sesion.ultimo_login = time.monotonic()
+            return sesion
+        except WebDriverException as e:
+            print(f"[POOL] Navegador del slot {sesion.slot} no responde ({e}), recreando...")
+            _cerrar_sesion(sesion)
+            return self._nueva_sesion(sesion.slot)
+
+    # ---------- API pública ----------
+    def prestar(self, timeout: Optional[float] = SESSION_POOL_TIMEOUT) -> SesionNavegador:
+        """Devuelve una sesión sana y logueada; bloquea si están todas en uso."""
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._cerrado:
+                    raise InstagramBotError("El pool de sesiones está cerrado")
+                if self._libres:
+                    sesion, slot = self._libres.pop(), None
+                    break
+                if self._slots_libres:
+                    sesion, slot = None, self._slots_libres.pop(0)
+                    break
+                restante = None if limite is None else limite - time.monotonic()
+                if restante is not None and restante <= 0:
+                    raise InstagramBotError(
+                        "No hay sesiones de navegador disponibles (timeout del pool)"
+                    )
+                self._cond.wait(restante)
+            # Se reserva el slot antes de soltar el lock
+            reservado = sesion.slot if sesion else slot
+            self._en_uso[reservado] = sesion
+
+        # Creación / health-check fuera del lock: puede tardar segundos
+        try:
+            sesion = self._preparar(sesion) if sesion else self._nueva_sesion(slot)
+        except Exception:
+            if sesion:
+                _cerrar_sesion(sesion)
+            with self._cond:
+                self._en_uso.pop(reservado, None)
+                self._slots_libres.append(reservado)
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            sesion.usos += 1
+            self._en_uso[sesion.slot] = sesion
+        return sesion
+
+    def devolver(self, sesion: SesionNavegador, descartar: bool = False) -> None:
+        """Devuelve una sesión al pool. Con descartar=True se cierra el navegador."""
+        with self._cond:
+            self._en_uso.pop(sesion.slot, None)
+            if descartar or self._cerrado:
+                self._slots_libres.append(sesion.slot)
+            else:
+                self._libres.append(sesion)
+            self._cond.notify()
+        if descartar or self._cerrado:
+            MEMORIA_NAVEGADOR.labels(BROWSER_PROFILE, str(sesion.slot)).set(0)
+            _cerrar_sesion(sesion)
+        else:
+            _medir_memoria(sesion)
+
+    @contextmanager
+    def sesion(self, timeout: Optional[float] = SESSION_POOL_TIMEOUT) -> Iterator[SesionNavegador]:
+        """
+        Uso:
+            with pool.sesion() as s:
+                enviar_mensajes(db, s.driver, ...)
+
+        Si el bloque lanza un error de WebDriver el navegador se descarta,
+        porque su estado ya no es confiable.
+        """
+        from selenium.common.exceptions import WebDriverException
+
+        sesion = self.prestar(timeout=timeout)
+        descartar = False
+        try:
+            yield sesion
+        except WebDriverException:
+            descartar = True
+            raise
+        finally:
+            self.devolver(sesion, descartar=descartar)
+
+    def estado(self) -> dict:
+        with self._cond:
+            return {
+                "profile": BROWSER_PROFILE,
+                "size": self.size,
+                "idle": len(self._libres),
+                "in_use": len(self._en_uso),
+            }
+
+    def cerrar(self) -> None:
+        """Cierra todos los navegadores libres; los prestados se cierran al devolverse."""
+        with self._cond:
+            self._cerrado = True
+            libres, self._libres = self._libres, []
+            self._slots_libres.extend(s.slot for s in libres)
+            self._cond.notify_all()
+        for s in libres:
+            _cerrar_sesion(s)
+
+
+def _medir_memoria(sesion: SesionNavegador) -> None:
+    rss = rss_navegador(sesion.driver)
+    if rss is not None:
+        MEMORIA_NAVEGADOR.labels(BROWSER_PROFILE, str(sesion.slot)).set(rss)
+
+
+def _cerrar_driver(driver: "webdriver.Remote") -> None:
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+def _cerrar_sesion(sesion: SesionNavegador) -> None:
+    """Cierra el navegador y recién después suelta el lease del slot."""
+    _cerrar_driver(sesion.driver)
+    if sesion.lease is not None:
+        sesion.lease.liberar()
+        sesion.lease = None
+
+
+# ===============================
+# Pool global del proceso
+# ===============================
+
+_pool: Optional[SessionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_session_pool() -> SessionPool:
+    """Devuelve el pool del proceso, creándolo la primera vez."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SessionPool()
+        return _pool
+
+
+def cerrar_session_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.cerrar()
+            _pool = None
+
+
+def _sesiones_en_estado(estado: str) -> int:
+    # Se lee en cada scrape de /metrics; sin pool creado todavía => 0
+    pool = _pool
+    return pool.estado()[estado] if pool is not None else 0
+
+
+for _estado in ("idle", "in_use"):
+    SESIONES_NAVEGADOR.labels(_estado).set_function(
+        lambda estado=_estado: _sesiones_en_estado(estado)
+    )
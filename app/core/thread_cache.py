@@ -0,0 +1,98 @@
+# app/core/thread_cache.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import THREAD_CACHE_SIZE, THREAD_CACHE_TTL
+from app.models import Thread
+
+# Máximo de usernames por cada IN (...) contra la BD
+_CHUNK_IN = 1000
+
+
+class CacheThreads:
+    """
+    Cache en memoria username normalizado -> thread_id, acotada (LRU) y
+    con expiración (TTL). Es segura para usar desde varios workers.
+    """
+
+    def __init__(self, max_items: int = THREAD_CACHE_SIZE, ttl: float = THREAD_CACHE_TTL) -> None:
+        self.max_items = max_items
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, username: str) -> Optional[str]:
+        with self._lock:
+            item = self._items.get(username)
+            if item is not None and item[1] < time.monotonic():
+                del self._items[username]
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(username)
+            self.hits += 1
+            return item[0]
+
+    def put(self, username: str, thread_id: str) -> None:
+        if self.max_items <= 0:
+            return
+        with self._lock:
+            self._items[username] = (thread_id, time.monotonic() + self.ttl)
+            self._items.move_to_end(username)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def estado(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._items),
+                "max_items": self.max_items,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+cache_threads = CacheThreads()
+
+
+def resolver_thread_ids(db: Session, usernames: Iterable[str]) -> Dict[str, str]:
+    """
+    Resuelve en bloque usernames YA normalizados (limpiar_username) a thread_id.
+
+    Primero consulta la cache; los que faltan se buscan con un único
+    SELECT ... WHERE username IN (...) por cada tanda de _CHUNK_IN.
+    Los usernames que no están en BD no aparecen en el resultado (hay que
+    resolverlos por ig.me).
+    """
+    resueltos: Dict[str, str] = {}
+    faltantes = []
+    for username in dict.fromkeys(usernames):
+        thread_id = cache_threads.get(username)
+        if thread_id is not None:
+            resueltos[username] = thread_id
+        else:
+            faltantes.append(username)
+
+    for i in range(0, len(faltantes), _CHUNK_IN):
+        tanda = faltantes[i:i + _CHUNK_IN]
+        filas = (
+            db.query(Thread.username, Thread.thread_id)
+            .filter(Thread.username.in_(tanda))
+            .all()
+        )
+        for username, thread_id in filas:
+            resueltos[username] = thread_id
+            cache_threads.put(username, thread_id)
+
+    return resueltos
@@ -0,0 +1,238 @@
+# app/core/waits.py
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.config import NAV_FALLBACK_POLL_SECONDS, WAIT_BUDGETS, WAIT_POLL_SECONDS
+from app.core.metricas import ESPERAS, ESPERAS_TIMEOUT
+
+
+class RegistroEsperas:
+    """
+    Acumula cuánto esperó realmente cada paso del bot, para ajustar los
+    presupuestos (WAIT_BUDGETS) con datos en lugar de sleeps a ojo.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pasos: Dict[str, dict] = {}
+
+    def registrar(self, paso: str, segundos: float, timeout: bool = False) -> None:
+        ESPERAS.labels(paso).observe(segundos)
+        if timeout:
+            ESPERAS_TIMEOUT.labels(paso).inc()
+        with self._lock:
+            st = self._pasos.setdefault(
+                paso,
+                {"count": 0, "timeouts": 0, "total": 0.0, "min": None, "max": 0.0, "last": 0.0},
+            )
+            st["count"] += 1
+            st["timeouts"] += int(timeout)
+            st["total"] += segundos
+            st["min"] = segundos if st["min"] is None else min(st["min"], segundos)
+            st["max"] = max(st["max"], segundos)
+            st["last"] = segundos
+
+    def resumen(self) -> List[dict]:
+        with self._lock:
+            return [
+                {
+                    "step": paso,
+                    "count": st["count"],
+                    "timeouts": st["timeouts"],
+                    "avg_seconds": st["total"] / st["count"],
+                    "min_seconds": st["min"] or 0.0,
+                    "max_seconds": st["max"],
+                    "last_seconds": st["last"],
+                    "budget_min": presupuesto(paso)[0],
+                    "budget_max": presupuesto(paso)[1],
+                }
+                for paso, st in sorted(self._pasos.items())
+            ]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._pasos.clear()
+
+
+registro_esperas = RegistroEsperas()
+
+
+def presupuesto(paso: str) -> Tuple[float, float]:
+    """(mínimo, máximo) en segundos configurado para el paso."""
+    try:
+        return WAIT_BUDGETS[paso]
+    except KeyError:
+        raise KeyError(f"Paso de espera desconocido: '{paso}' (ver WAIT_BUDGETS)")
+
+
+def esperar(
+    driver,
+    paso: str,
+    condicion: Callable[[Any], Any],
+    maximo: Optional[float] = None,
+) -> Any:
+    """
+    Espera a que `condicion(driver)` devuelva algo truthy y lo retorna.
+
+    - Falla con TimeoutException si pasa el máximo del paso (o `maximo`).
+    - Si la condición se cumple antes del mínimo del paso, completa el
+      mínimo (piso de pacing configurable; por defecto 0).
+    - Registra el tiempo real esperado en `registro_esperas`.
+    """
+    # Import local: el registro de esperas se consulta desde la API sin Selenium
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    minimo, maximo_cfg = presupuesto(paso)
+    maximo = maximo_cfg if maximo is None else maximo
+
+    inicio = time.monotonic()
+    try:
+        resultado = WebDriverWait(driver, maximo, poll_frequency=WAIT_POLL_SECONDS).until(condicion)
+    except TimeoutException:
+        registro_esperas.registrar(paso, time.monotonic() - inicio, timeout=True)
+        raise
+
+    transcurrido = time.monotonic() - inicio
+    if transcurrido < minimo:
+        time.sleep(minimo - transcurrido)
+    registro_esperas.registrar(paso, transcurrido)
+    return resultado
+
+
+# ===============================
+# Esperas de navegación por eventos (WebDriver BiDi)
+# ===============================
+
+# Eventos de browsingContext que indican una URL nueva (history_updated
+# cubre las navegaciones de SPA hechas con pushState)
+_EVENTOS_NAVEGACION = ("navigation_committed", "load", "history_updated")
+
+
+class OyenteNavegacion:
+    """
+    Suscripción BiDi a los eventos de navegación de un driver (una sola
+    vez por sesión). Cada evento incrementa `version` y guarda la URL.
+    """
+
+    def __init__(self, driver) -> None:
+        self._cond = threading.Condition()
+        self.version = 0
+        self.url: Optional[str] = None
+        contexto = driver.browsing_context
+        for evento in _EVENTOS_NAVEGACION:
+            contexto.add_event_handler(evento, self._al_navegar)
+
+    def _al_navegar(self, info) -> None:
+        url = getattr(info, "url", None)
+        if url is None and isinstance(info, dict):
+            url = info.get("url")
+        if not url:
+            return
+        with self._cond:
+            self.version += 1
+            self.url = url
+            self._cond.notify_all()
+
+    def esperar(self, predicado: Callable[[str], bool], desde: int, timeout: float) -> Optional[str]:
+        """URL de la primera navegación posterior a `desde` que cumpla el predicado."""
+        fin = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self.version > desde and self.url and predicado(self.url):
+                    return self.url
+                restante = fin - time.monotonic()
+                if restante <= 0:
+                    return None
+                self._cond.wait(restante)
+
+
+_oyentes: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def oyente_navegacion(driver) -> Optional[OyenteNavegacion]:
+    """El oyente BiDi del driver, o None si la sesión no tiene BiDi."""
+    try:
+        return _oyentes[driver]
+    except KeyError:
+        pass
+    oyente = None
+    caps = getattr(driver, "caps", None) or {}
+    if caps.get("webSocketUrl"):
+        try:
+            oyente = OyenteNavegacion(driver)
+        except Exception as e:
+            print(f"[BOT] No se pudo suscribir a eventos BiDi, se sondea current_url: {e}")
+    _oyentes[driver] = oyente
+    return oyente
+
+
+def marca_navegacion(driver) -> int:
+    """
+    Se toma ANTES de disparar la navegación (driver.get, ENTER en el login)
+    y se pasa a esperar_navegacion, para no confundir eventos anteriores.
+    """
+    oyente = oyente_navegacion(driver)
+    return oyente.version if oyente is not None else 0
+
+
+def esperar_navegacion(
+    driver,
+    paso: str,
+    predicado: Callable[[str], bool],
+    desde: int = 0,
+    maximo: Optional[float] = None,
+) -> str:
+    """
+    Espera a que el driver llegue a una URL que cumpla `predicado` y la
+    devuelve (sin un current_url extra).
+
+    - Con BiDi: se despierta con los eventos de navegación y solo consulta
+      current_url cada NAV_FALLBACK_POLL_SECONDS como red de seguridad.
+    - Sin BiDi: mismo sondeo de current_url que `esperar`.
+    """
+    oyente = oyente_navegacion(driver)
+    if oyente is None:
+        return esperar(driver, paso, _url_que_cumple(predicado), maximo=maximo)
+
+    from selenium.common.exceptions import TimeoutException
+
+    minimo, maximo_cfg = presupuesto(paso)
+    maximo = maximo_cfg if maximo is None else maximo
+
+    inicio = time.monotonic()
+    while True:
+        restante = maximo - (time.monotonic() - inicio)
+        url = oyente.esperar(predicado, desde, max(0.0, min(restante, NAV_FALLBACK_POLL_SECONDS)))
+        if url is None:
+            actual = driver.current_url
+            url = actual if predicado(actual) else None
+        if url is not None:
+            break
+        if restante <= 0:
+            registro_esperas.registrar(paso, time.monotonic() - inicio, timeout=True)
+            raise TimeoutException(f"Timeout en '{paso}' esperando navegación")
+
+    transcurrido = time.monotonic() - inicio
+    if transcurrido < minimo:
+        time.sleep(minimo - transcurrido)
+    registro_esperas.registrar(paso, transcurrido)
+    return url
+
+
+# ===============================
+# Condiciones reutilizables
+# ===============================
+
+def documento_listo(driver) -> bool:
+    return driver.execute_script("return document.readyState") == "complete"
+
+
+def _url_que_cumple(predicado: Callable[[str], bool]) -> Callable[[Any], Any]:
+    """Condición que devuelve la URL actual si cumple el predicado."""
+    def condicion(driver):
+        url = driver.current_url
+        return url if predicado(url) else False
+    return condicion
@@ -0,0 +1,83 @@
+# app/core/webdriver_trace.py
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from app.core.metricas import COMANDOS_POR_DESTINATARIO, COMANDOS_WEBDRIVER
+
+
+class TrazaWebDriver:
+    """
+    Envuelve `driver.command_executor.execute` para contar y cronometrar
+    cada comando que viaja a chromedriver (findElement, executeScript,
+    getCurrentUrl, ...).
+
+    - Todo comando se observa en igbot_webdriver_command_seconds{command}.
+    - Dentro de `segmento(nombre)` (un destinatario) además se acumula un
+      resumen por comando que se imprime al cerrar el segmento.
+    """
+
+    def __init__(self, driver) -> None:
+        self._lock = threading.Lock()
+        self._segmento: Optional[Dict[str, list]] = None
+        self._executor = driver.command_executor
+        self._execute_original = self._executor.execute
+        self._executor.execute = self._execute
+
+    def _execute(self, command, params=None):
+        inicio = time.perf_counter()
+        try:
+            return self._execute_original(command, params)
+        finally:
+            duracion = time.perf_counter() - inicio
+            COMANDOS_WEBDRIVER.labels(command).observe(duracion)
+            with self._lock:
+                if self._segmento is not None:
+                    st = self._segmento.setdefault(command, [0, 0.0])
+                    st[0] += 1
+                    st[1] += duracion
+
+    @contextmanager
+    def segmento(self, nombre: str) -> Iterator[Dict[str, list]]:
+        """Acumula los comandos del bloque; devuelve {comando: [cantidad, segundos]}."""
+        with self._lock:
+            self._segmento = {}
+            actual = self._segmento
+        try:
+            yield actual
+        finally:
+            with self._lock:
+                self._segmento = None
+            total = sum(n for n, _ in actual.values())
+            segundos = sum(s for _, s in actual.values())
+            COMANDOS_POR_DESTINATARIO.observe(total)
+            detalle = ", ".join(
+                f"{cmd}={n}"
+                for cmd, (n, _) in sorted(actual.items(), key=lambda kv: -kv[1][0])
+            )
+            print(
+                f"[TRACE] {nombre}: {total} comandos WebDriver, "
+                f"{segundos * 1000:.0f} ms en round-trips ({detalle})"
+            )
+
+    def quitar(self) -> None:
+        """Restaura el executor original del driver."""
+        self._executor.execute = self._execute_original
+
+
+_trazas: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def trazar(driver) -> TrazaWebDriver:
+    """Activa la traza en el driver (idempotente)."""
+    traza = _trazas.get(driver)
+    if traza is None:
+        traza = _trazas[driver] = TrazaWebDriver(driver)
+    return traza
+
+
+def traza_de(driver) -> Optional[TrazaWebDriver]:
+    """La traza activa del driver, o None si no se pidió (WEBDRIVER_TRACE=0)."""
+    return _trazas.get(driver)
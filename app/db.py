@@ -1,23 +1,121 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from typing import AsyncGenerator, Generator, Optional
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+
+from app.config import (
+    ASYNC_DATABASE_URL,
+    DATABASE_URL,
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+)
+from app.core.metricas import instrumentar_engine
+
+# Driver async equivalente a cada driver sync
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def _pool_kwargs(url: str) -> dict:
+    """Parámetros de pool desde config (SQLite no usa QueuePool configurable)."""
+    if make_url(url).get_backend_name() == "sqlite":
+        return {"pool_pre_ping": DB_POOL_PRE_PING}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def url_async(url: str) -> str:
+    """postgresql+psycopg2://... -> postgresql+asyncpg://... (idem SQLite/MySQL)."""
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No hay driver async conocido para {parsed.drivername}; definir ASYNC_DATABASE_URL")
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
 
-from app.config import DATABASE_URL
 
 # Para Postgres / MySQL / etc. no necesitamos connect_args especiales
 engine = create_engine(
     DATABASE_URL,
     future=True,
+    **_pool_kwargs(DATABASE_URL),
 )
+instrumentar_engine(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
 
-def get_db():
+def insert_sin_duplicados(modelo, dialecto: str, index_elements: Optional[list] = None):
+    """
+    INSERT que descarta en silencio las filas que violan una restricción
+    única (ON CONFLICT DO NOTHING en Postgres/SQLite, INSERT IGNORE en
+    MySQL). El rowcount del resultado dice cuántas filas entraron.
+    Sin `index_elements` vale para cualquier restricción única.
+    """
+    if dialecto == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as insert_pg
+
+        return insert_pg(modelo).on_conflict_do_nothing(index_elements=index_elements)
+    if dialecto == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as insert_sqlite
+
+        return insert_sqlite(modelo).on_conflict_do_nothing(index_elements=index_elements)
+    return insert(modelo).prefix_with("IGNORE")
+
+
+def get_db() -> Generator[Session, None, None]:
     """Dependencia para FastAPI: abre y cierra sesión de BD por request."""
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+# ===============================
+# Engine async (endpoints de lectura)
+# ===============================
+
+_async_engine: Optional[AsyncEngine] = None
+_AsyncSessionLocal: Optional[async_sessionmaker] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    """Engine async creado a demanda (solo lo usan los endpoints de lectura)."""
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        url = ASYNC_DATABASE_URL or url_async(DATABASE_URL)
+        _async_engine = create_async_engine(url, **_pool_kwargs(url))
+        instrumentar_engine(_async_engine.sync_engine)
+        _AsyncSessionLocal = async_sessionmaker(
+            _async_engine, expire_on_commit=False, autoflush=False
+        )
+    return _async_engine
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Dependencia async para FastAPI: sesión por request en el event loop."""
+    get_async_engine()
+    async with _AsyncSessionLocal() as db:
+        yield db
+
+
+async def cerrar_async_engine() -> None:
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = _AsyncSessionLocal = None
@@ -1,4 +1,7 @@
-from sqlalchemy import Column, Integer, String, DateTime, func
+from sqlalchemy import (
+    BigInteger, Boolean, Column, Float, ForeignKey, Index, Integer, JSON, String, Text,
+    DateTime, UniqueConstraint, func,
+)
 from app.db import Base
 
 
@@ -16,3 +19,145 @@ class Thread(Base):
     messages_sent = Column(Integer, nullable=False, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        # Orden + paginación keyset de GET /api/threads
+        Index("ix_threads_messages_sent_id", "messages_sent", "id"),
+    )
+
+
+class ThreadStats(Base):
+    """
+    Totales precalculados de la tabla threads (una sola fila, id=1).
+    Se actualiza en la misma transacción que los inserts de Thread y los
+    incrementos de messages_sent (ver app.core.estadisticas).
+    """
+    __tablename__ = "thread_stats"
+
+    id = Column(Integer, primary_key=True)
+    total_threads = Column(BigInteger, nullable=False, default=0)
+    total_messages_sent = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class PacingBucket(Base):
+    """
+    Estado de un token bucket de app.core.pacing (cuenta, acción). Se
+    guarda en cada permiso para que los límites sobrevivan a reinicios.
+    """
+    __tablename__ = "pacing_buckets"
+
+    account = Column(String(255), primary_key=True)
+    # open_chat | send_text | upload
+    action = Column(String(50), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class SendJob(Base):
+    """
+    Trabajo de envío encolado por POST /api/send.
+    Lo ejecutan los workers de app.core.jobs en segundo plano.
+    """
+    __tablename__ = "send_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # queued | running | done | failed | cancelled
+    status = Column(String(20), nullable=False, default="queued", index=True)
+    payload = Column(JSON, nullable=False)
+    detail = Column(Text, nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    # Token del lease del líder que lo pasó a running (JobManager._token)
+    owner = Column(String(64), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class SendIdempotencyKey(Base):
+    """
+    Idempotency-Key de POST /api/send -> job creado. Un reintento con la
+    misma clave (y el mismo cuerpo) devuelve ese job en lugar de encolar
+    otro; el estado y el resultado final son los del job.
+    """
+    __tablename__ = "send_idempotency_keys"
+
+    key = Column(String(255), primary_key=True)
+    # sha256 del cuerpo normalizado: la misma clave con otro cuerpo es un error
+    request_hash = Column(String(64), nullable=False)
+    job_id = Column(Integer, ForeignKey("send_jobs.id", ondelete="CASCADE"), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class SendJobRecipient(Base):
+    """
+    Resultado de un destinatario de un SendJob, guardado apenas termina.
+    POST /api/jobs/{id}/resume continúa desde los que no tienen fila.
+    """
+    __tablename__ = "send_job_recipients"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    job_id = Column(Integer, ForeignKey("send_jobs.id", ondelete="CASCADE"), nullable=False)
+    # Índice del destinatario en la lista del job (admite repetidos)
+    position = Column(Integer, nullable=False)
+    recipient = Column(String(255), nullable=False)
+    # done | failed
+    status = Column(String(20), nullable=False)
+    thread_id = Column(String(255), nullable=True)
+    messages_sent = Column(Integer, nullable=False, default=0)
+    attachments_sent = Column(Integer, nullable=False, default=0)
+    detail = Column(Text, nullable=True)
+    finished_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("job_id", "position", name="uq_send_job_recipients_job_position"),
+    )
+
+
+class RecipientSet(Base):
+    """
+    Lista de destinatarios importada por POST /api/recipient-sets.
+    Un envío la referencia por id (recipient_set_id) en lugar de mandar
+    la lista completa. Los lotes se guardan a medida que llegan: la lista
+    solo se puede usar cuando completed es True (importación terminada).
+    """
+    __tablename__ = "recipient_sets"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(255), nullable=True)
+    # Resumen de la importación
+    total_lines = Column(Integer, nullable=False, default=0)
+    recipients = Column(Integer, nullable=False, default=0)
+    usernames = Column(Integer, nullable=False, default=0)
+    thread_ids = Column(Integer, nullable=False, default=0)
+    known_threads = Column(Integer, nullable=False, default=0)
+    duplicates = Column(Integer, nullable=False, default=0)
+    invalid = Column(Integer, nullable=False, default=0)
+    completed = Column(Boolean, nullable=False, default=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class RecipientSetItem(Base):
+    """
+    Un destinatario normalizado de un RecipientSet. La unicidad (set_id,
+    value) deduplica en la BD, sin tener la lista entera en memoria.
+    """
+    __tablename__ = "recipient_set_items"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    set_id = Column(Integer, ForeignKey("recipient_sets.id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)
+    # Username normalizado (limpiar_username) o thread_id numérico
+    value = Column(String(255), nullable=False)
+    # "username" | "thread_id"
+    kind = Column(String(20), nullable=False)
+    # thread_id ya conocido en threads al importar (pre-join)
+    thread_id = Column(String(255), nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("set_id", "value", name="uq_recipient_set_items_set_value"),
+        Index("ix_recipient_set_items_set_position", "set_id", "position"),
+    )
+
@@ -0,0 +1,72 @@
+# app/schema.py
+"""
+Creación explícita del esquema (tablas, índices, fila de thread_stats):
+    python -m app.schema
+
+La API ya no lo hace al importarse; se puede pedir al arrancar con
+DB_CREATE_SCHEMA_ON_STARTUP=1.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.db import Base, SessionLocal
+from app import models
+from app.core.estadisticas import STATS_ID, reconstruir_estadisticas
+
+# Índice GIN trigram para el filtro por substring de username (?q=)
+_SQL_TRGM_EXTENSION = "CREATE EXTENSION IF NOT EXISTS pg_trgm"
+_SQL_TRGM_INDEX = (
+    "CREATE INDEX IF NOT EXISTS ix_threads_username_trgm "
+    "ON threads USING gin (username gin_trgm_ops)"
+)
+
+
+def crear_esquema(engine: Engine) -> None:
+    """
+    Crea tablas e índices que falten.
+
+    create_all() no agrega índices nuevos a tablas que ya existen, así que
+    los índices de cada tabla se revisan aparte (checkfirst).
+    """
+    Base.metadata.create_all(bind=engine)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    crear_indice_trigram(engine)
+    _inicializar_estadisticas()
+
+
+def _inicializar_estadisticas() -> None:
+    """Crea la fila de thread_stats la primera vez, calculada desde threads."""
+    db = SessionLocal()
+    try:
+        if db.get(models.ThreadStats, STATS_ID) is None:
+            reconstruir_estadisticas(db)
+    finally:
+        db.close()
+
+
+def crear_indice_trigram(engine: Engine) -> bool:
+    """
+    Intenta crear la extensión pg_trgm y el índice trigram de username.
+    Si la BD no es Postgres o no se tienen permisos, el filtro ?q= sigue
+    funcionando sin índice (recorrido filtrado). Devuelve True si quedó creado.
+    """
+    if engine.dialect.name != "postgresql":
+        return False
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(_SQL_TRGM_EXTENSION))
+            conn.execute(text(_SQL_TRGM_INDEX))
+        return True
+    except SQLAlchemyError as e:
+        print(f"[DB] pg_trgm no disponible, búsqueda por username sin índice: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    from app.db import engine
+
+    crear_esquema(engine)
+    print("[DB] Esquema creado/actualizado.")
@@ -0,0 +1,41 @@
+# bench/_comun.py
+import os
+import tempfile
+from typing import Dict, List, Sequence
+
+
+def configurar_entorno(**extra: str) -> str:
+    """
+    Prepara variables de entorno ANTES de importar app.*: BD SQLite temporal
+    (o BENCH_DATABASE_URL), credenciales de prueba y lo que se pase en `extra`.
+    Devuelve la DATABASE_URL usada.
+    """
+    url = os.environ.get("BENCH_DATABASE_URL")
+    if not url:
+        carpeta = tempfile.mkdtemp(prefix="igbot-bench-")
+        url = f"sqlite:///{os.path.join(carpeta, 'bench.db')}"
+    os.environ["DATABASE_URL"] = url
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ.setdefault("IG_USERNAME", "bench_user")
+    os.environ.setdefault("IG_PASSWORD", "bench_password")
+    os.environ.update(extra)
+    return url
+
+
+def percentil(valores: Sequence[float], p: float) -> float:
+    """Percentil por rango más cercano (p en 0-100)."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[k]
+
+
+def resumen_latencias(valores: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(valores),
+        "p50_ms": percentil(valores, 50) * 1000,
+        "p90_ms": percentil(valores, 90) * 1000,
+        "p99_ms": percentil(valores, 99) * 1000,
+        "max_ms": (max(valores) if valores else 0.0) * 1000,
+    }
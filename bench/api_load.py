@@ -0,0 +1,147 @@
+# bench/api_load.py
+"""
+Prueba de carga offline de los endpoints de lectura (/api/threads y
+/api/stats) contra una BD sembrada, con la app corriendo en proceso
+(httpx + ASGITransport, sin red).
+
+Por defecto usa SQLite temporal (requiere aiosqlite); con
+BENCH_DATABASE_URL=postgresql+psycopg2://... se mide contra Postgres.
+
+Uso:
+    python -m bench.api_load --rows 100000 --requests 500 --concurrency 20
+    python -m bench.api_load --max-p99-ms 50       # exit 1 si se supera
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+from bench._comun import configurar_entorno, resumen_latencias
+
+# Escenarios: (nombre, path, params)
+_ESCENARIOS = [
+    ("threads_first_page", "/api/threads", {"limit": 50}),
+    ("threads_search", "/api/threads", {"q": "user_12", "limit": 50}),
+    ("threads_deep_cursor", "/api/threads", None),  # cursor calculado al sembrar
+    ("stats", "/api/stats", {}),
+]
+
+
+def sembrar(rows: int) -> None:
+    from sqlalchemy import insert
+
+    from app.core.estadisticas import reconstruir_estadisticas
+    from app.db import SessionLocal, engine
+    from app.models import Thread
+    from app.schema import crear_esquema
+
+    crear_esquema(engine)
+    db = SessionLocal()
+    try:
+        existentes = db.query(Thread.id).count()
+        lote = []
+        for i in range(existentes, rows):
+            lote.append({
+                "username": f"user_{i}",
+                "thread_id": str(10**14 + i),
+                "messages_sent": random.randint(0, 500),
+            })
+            if len(lote) == 5000:
+                db.execute(insert(Thread), lote)
+                lote = []
+        if lote:
+            db.execute(insert(Thread), lote)
+        db.commit()
+        reconstruir_estadisticas(db)
+    finally:
+        db.close()
+
+
+async def _cursor_profundo(client, paginas: int) -> str:
+    """Recorre `paginas` páginas para obtener un cursor 'profundo'."""
+    cursor = None
+    for _ in range(paginas):
+        params = {"limit": 500}
+        if cursor:
+            params["cursor"] = cursor
+        r = await client.get("/api/threads", params=params)
+        cursor = r.json().get("next_cursor") or cursor
+    return cursor
+
+
+async def cargar(requests: int, concurrency: int, paginas_profundas: int) -> dict:
+    import httpx
+
+    from app.api.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        cursor = await _cursor_profundo(client, paginas_profundas)
+        resultados = {}
+        for nombre, path, params in _ESCENARIOS:
+            if params is None:
+                params = {"limit": 50, "cursor": cursor} if cursor else {"limit": 50}
+            latencias = []
+            errores = 0
+            sem = asyncio.Semaphore(concurrency)
+
+            async def una():
+                nonlocal errores
+                async with sem:
+                    t0 = time.perf_counter()
+                    r = await client.get(path, params=params)
+                    latencias.append(time.perf_counter() - t0)
+                    if r.status_code != 200:
+                        errores += 1
+
+            inicio = time.perf_counter()
+            await asyncio.gather(*(una() for _ in range(requests)))
+            total = time.perf_counter() - inicio
+            resultados[nombre] = {
+                **resumen_latencias(latencias),
+                "errors": errores,
+                "req_per_s": requests / total if total else 0.0,
+            }
+    return resultados
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Carga offline de /api/threads y /api/stats")
+    parser.add_argument("--rows", type=int, default=20000, help="threads a sembrar")
+    parser.add_argument("--requests", type=int, default=300, help="requests por escenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--deep-pages", type=int, default=20,
+                        help="páginas de 500 a recorrer para el escenario de cursor profundo")
+    parser.add_argument("--max-p99-ms", type=float, default=None,
+                        help="falla si algún escenario supera este p99")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    configurar_entorno(API_READ_ONLY="1")
+    sembrar(args.rows)
+    resultados = asyncio.run(cargar(args.requests, args.concurrency, args.deep_pages))
+
+    if args.json:
+        print(json.dumps(resultados, indent=2))
+    else:
+        print(f"rows={args.rows} requests={args.requests} concurrency={args.concurrency}")
+        for nombre, r in resultados.items():
+            print(
+                f"{nombre:20} p50={r['p50_ms']:7.1f} ms  p90={r['p90_ms']:7.1f} ms  "
+                f"p99={r['p99_ms']:7.1f} ms  {r['req_per_s']:8.1f} req/s  errors={r['errors']}"
+            )
+
+    fallas = [
+        n for n, r in resultados.items()
+        if r["errors"] or (args.max_p99_ms is not None and r["p99_ms"] > args.max_p99_ms)
+    ]
+    if fallas:
+        print(f"FALLA: {', '.join(fallas)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+# bench/browser_profiles.py
+"""
+Compara los perfiles de lanzamiento de Chrome (BROWSER_PROFILES) con un
+Chrome real (ChromeDriver en 127.0.0.1:9515) contra bench.fake_instagram.
+
+Por perfil corre dos pasadas con el mismo slot:
+
+- cold: user-data-dir vacío (cache de disco vacía, hay que loguearse);
+- warm: se vuelve a crear el navegador; los perfiles persistentes reusan
+  la cache de disco y la sesión de Instagram.
+
+Reporta tiempo de arranque y login, carga de cada chat (p50/p90), KB de
+recursos estáticos que llegaron al servidor (lo que no se bloqueó ni vino
+de cache) y memoria residente de Chrome con sus procesos hijos (psutil).
+
+Uso:
+    python -m bench.browser_profiles --chats 20
+    python -m bench.browser_profiles --profiles full,minimal --json
+"""
+import argparse
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import time
+
+from bench._comun import configurar_entorno, resumen_latencias
+from bench.fake_instagram import servidor_fake, thread_id_para
+
+
+def _pasada(server, perfil: str, chats: int) -> dict:
+    from app.core.instagram_bot import crear_driver, login_ig
+    from app.core.perfiles import rss_navegador
+
+    servidos_previos = server.estaticos_servidos
+    t0 = time.perf_counter()
+    driver = crear_driver(perfil, slot=0)
+    t_arranque = time.perf_counter() - t0
+    try:
+        t0 = time.perf_counter()
+        login_ig(driver)
+        t_login = time.perf_counter() - t0
+
+        cargas = []
+        for i in range(chats):
+            url = f"{server.base_url}/direct/t/{thread_id_para(f'bench_user_{i}')}/"
+            t0 = time.perf_counter()
+            driver.get(url)
+            cargas.append(time.perf_counter() - t0)
+        rss = rss_navegador(driver)
+    finally:
+        driver.quit()
+
+    return {
+        "launch_ms": t_arranque * 1000,
+        "login_ms": t_login * 1000,
+        "page_load": resumen_latencias(cargas),
+        "static_kb": (server.estaticos_servidos - servidos_previos) / 1024,
+        "rss_mb": rss / (1024 * 1024) if rss is not None else None,
+    }
+
+
+def correr(args) -> dict:
+    salida = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with salida, servidor_fake() as server, tempfile.TemporaryDirectory() as datos:
+        configurar_entorno(
+            IG_BASE_URL=server.base_url,
+            IG_ME_BASE_URL=server.base_url,
+            BROWSER_DATA_DIR=datos,
+        )
+        from app.config import BROWSER_PROFILES
+
+        perfiles = args.profiles.split(",") if args.profiles else list(BROWSER_PROFILES)
+        return {
+            perfil: {pasada: _pasada(server, perfil, args.chats) for pasada in ("cold", "warm")}
+            for perfil in perfiles
+        }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Perfiles de lanzamiento de Chrome")
+    parser.add_argument("--profiles", default=None, help="lista separada por comas (default: todos)")
+    parser.add_argument("--chats", type=int, default=20, help="chats a abrir por pasada")
+    parser.add_argument("--json", action="store_true", help="salida JSON")
+    parser.add_argument("--verbose", action="store_true", help="mostrar los logs del bot")
+    args = parser.parse_args()
+
+    r = correr(args)
+    if args.json:
+        print(json.dumps(r, indent=2))
+        return 0
+
+    print(f"chats por pasada: {args.chats}")
+    for perfil, pasadas in r.items():
+        for nombre, v in pasadas.items():
+            rss = f"{v['rss_mb']:7.1f} MB" if v["rss_mb"] is not None else "    n/d   "
+            print(
+                f"{perfil:8} {nombre:4}  arranque={v['launch_ms']:7.0f} ms  "
+                f"login={v['login_ms']:6.0f} ms  "
+                f"carga p50={v['page_load']['p50_ms']:6.1f} ms p90={v['page_load']['p90_ms']:6.1f} ms  "
+                f"estáticos={v['static_kb']:8.0f} KB  rss={rss}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+# bench/composer.py
+"""
+Compara las estrategias de escritura del composer (app.core.composer) por
+largo de mensaje: "keys" (send_keys, un evento por carácter) contra
+"insert" (todo el texto en un executeScript).
+
+Por cada largo y estrategia escribe y envía `--repeat` mensajes en un chat
+ya abierto y mide escribir + ENTER + composer vacío. También verifica que
+lo entregado sea exactamente el texto (los mensajes "multiline" tienen
+saltos de línea: con ENTER en lugar de Shift+ENTER se partirían).
+
+- --driver fake   (default) bench.fake_driver con `--key-ms` por carácter.
+- --driver chrome Chrome real vía ChromeDriver en 127.0.0.1:9515 contra
+                  bench.fake_instagram (composer contenteditable real).
+
+Uso:
+    python -m bench.composer
+    python -m bench.composer --lengths 100,1000,4000 --repeat 5
+    python -m bench.composer --driver chrome --json
+"""
+import argparse
+import contextlib
+import io
+import json
+import sys
+import time
+
+from bench._comun import configurar_entorno, resumen_latencias
+from bench.fake_instagram import servidor_fake, thread_id_para
+
+
+def _texto(largo: int, multilinea: bool) -> str:
+    base = "Hola! Este es un mensaje de prueba con acentos (áéíóú ñ) y signos ¿? ¡! "
+    texto = (base * (largo // len(base) + 1))[:largo].strip()
+    if not multilinea:
+        return texto
+    # Una línea cada ~60 caracteres, con una línea en blanco en el medio
+    lineas = [texto[i:i + 60].strip() for i in range(0, len(texto), 60)]
+    if len(lineas) > 2:
+        lineas.insert(len(lineas) // 2, "")
+    return "\n".join(lineas)
+
+
+def _entregados(server, driver) -> list:
+    if hasattr(driver, "mensajes"):
+        return [texto for _, texto in driver.mensajes]
+    time.sleep(0.2)  # los fetch("/_sent") del navegador son asíncronos
+    with server.lock:
+        return [e["text"] for e in server.enviados if "text" in e]
+
+
+def _pasada(server, driver, modo: str, texto: str, repeticiones: int) -> dict:
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.common.keys import Keys
+    from selenium.webdriver.support import expected_conditions as EC
+
+    from app.core.composer import escribir
+    from app.core.instagram_bot import XPATH_TEXTBOX, _composer_vacio
+    from app.core.waits import esperar
+
+    previos = len(_entregados(server, driver))
+    tiempos, usados = [], []
+    for _ in range(repeticiones):
+        entrada = esperar(driver, "chat_textbox", EC.presence_of_element_located((By.XPATH, XPATH_TEXTBOX)))
+        entrada.click()
+        t0 = time.perf_counter()
+        usados.append(escribir(driver, entrada, texto, modo))
+        entrada.send_keys(Keys.ENTER)
+        try:
+            esperar(driver, "message_sent", _composer_vacio)
+        except TimeoutException:
+            pass
+        tiempos.append(time.perf_counter() - t0)
+
+    entregados = _entregados(server, driver)[previos:]
+    return {
+        **resumen_latencias(tiempos),
+        "chars_per_s": len(texto) * len(tiempos) / sum(tiempos) if tiempos else 0.0,
+        "modes": sorted(set(usados)),
+        "delivered": len(entregados),
+        "exact": sum(1 for e in entregados if e.replace("\xa0", " ") == texto),
+    }
+
+
+def correr(args) -> dict:
+    salida = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with salida, servidor_fake() as server:
+        configurar_entorno(IG_BASE_URL=server.base_url, IG_ME_BASE_URL=server.base_url)
+        from app.core.instagram_bot import cerrar_popup_notificaciones, login_ig
+
+        if args.driver == "fake":
+            from bench.fake_driver import FakeDriver
+
+            driver = FakeDriver(
+                server.base_url,
+                server.base_url,
+                latencia=args.latency_ms / 1000,
+                latencia_tecla=args.key_ms / 1000,
+            )
+        else:
+            from app.core.instagram_bot import crear_driver
+
+            driver = crear_driver()
+
+        resultados = {}
+        try:
+            login_ig(driver)
+            driver.get(f"{server.base_url}/direct/t/{thread_id_para('bench_composer')}/")
+            cerrar_popup_notificaciones(driver)
+            for largo in [int(x) for x in args.lengths.split(",")]:
+                for multilinea in (False, True):
+                    texto = _texto(largo, multilinea)
+                    caso = f"{largo}{'-multiline' if multilinea else ''}"
+                    resultados[caso] = {
+                        modo: _pasada(server, driver, modo, texto, args.repeat)
+                        for modo in ("keys", "insert")
+                    }
+        finally:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        return resultados
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Estrategias de escritura del composer")
+    parser.add_argument("--driver", choices=("fake", "chrome"), default="fake")
+    parser.add_argument("--lengths", default="20,200,1000,4000", help="largos de mensaje, separados por comas")
+    parser.add_argument("--repeat", type=int, default=3, help="mensajes por largo y estrategia")
+    parser.add_argument("--latency-ms", type=float, default=2.0,
+                        help="round-trip simulado por comando (solo --driver fake)")
+    parser.add_argument("--key-ms", type=float, default=1.0,
+                        help="costo simulado por carácter de send_keys (solo --driver fake)")
+    parser.add_argument("--json", action="store_true", help="salida JSON")
+    parser.add_argument("--verbose", action="store_true", help="mostrar los logs del bot")
+    args = parser.parse_args()
+
+    r = correr(args)
+    if args.json:
+        print(json.dumps(r, indent=2))
+        return 0
+
+    print(f"driver={args.driver} repeticiones={args.repeat}")
+    for caso, modos in r.items():
+        for modo, v in modos.items():
+            print(
+                f"{caso:>15} {modo:6}  p50={v['p50_ms']:8.1f} ms  max={v['max_ms']:8.1f} ms  "
+                f"{v['chars_per_s']:9.0f} chars/s  exactos={v['exact']}/{v['delivered']}  "
+                f"({', '.join(v['modes'])})"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
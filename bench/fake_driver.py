@@ -0,0 +1,288 @@
+# bench/fake_driver.py
+"""
+WebDriver "de mentira" que reproduce, sin navegador, el mismo flujo de
+páginas que bench.fake_instagram: login, redirección de ig.me, popup de
+notificaciones, composer y adjuntos.
+
+Cada comando pasa por `command_executor.execute` (como en un
+webdriver.Remote, así la traza de app.core.webdriver_trace lo ve) y simula
+el round-trip HTTP a chromedriver (`latencia`); cada navegación simula una
+carga de página (`latencia_carga`). Con `bidi=True` además emite los
+eventos de navegación de browsingContext que escucha esperar_navegacion.
+
+El composer simula las dos estrategias de app.core.composer: send_keys
+cuesta además `latencia_tecla` por carácter (chromedriver despacha un
+evento de teclado por carácter) y la inserción en bloque por executeScript
+se puede rechazar con `insercion=False` (editor que ignora execCommand).
+"""
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.remote.webelement import WebElement
+
+from app.core.instagram_bot import (
+    XPATH_BOTON_ENVIAR_ARCHIVO,
+    XPATH_INPUT_ARCHIVO,
+    XPATHS_POPUP_NOTIFICACIONES,
+    XPATH_TEXTBOX,
+)
+from bench.fake_instagram import COOKIE_SESION, thread_id_para
+
+
+class _EjecutorFalso:
+    """Equivalente a RemoteConnection: un execute() por comando WebDriver."""
+
+    def __init__(self, driver: "FakeDriver") -> None:
+        self._driver = driver
+
+    def execute(self, command: str, params: Optional[dict] = None) -> None:
+        self._driver.comandos += 1
+        time.sleep(self._driver.latencia_carga if command == "get" else self._driver.latencia)
+
+
+class _BrowsingContextFalso:
+    """Subconjunto de selenium BrowsingContext: handlers de eventos."""
+
+    def __init__(self) -> None:
+        self._handlers: Dict[str, List[Callable]] = {}
+
+    def add_event_handler(self, event: str, callback: Callable, contexts=None) -> int:
+        self._handlers.setdefault(event, []).append(callback)
+        return len(self._handlers[event])
+
+    def emitir(self, event: str, url: str) -> None:
+        for callback in self._handlers.get(event, []):
+            callback(SimpleNamespace(url=url))
+
+
+class FakeElement(WebElement):
+    """Elemento simulado; subclase de WebElement para que EC lo acepte."""
+
+    def __init__(self, driver: "FakeDriver", nombre: str) -> None:
+        self._parent = driver
+        self._id = nombre
+        self.nombre = nombre
+
+    @property
+    def text(self) -> str:
+        self._parent._comando("getElementText")
+        if self.nombre == "textbox":
+            return self._parent.texto_composer
+        if self.nombre == "popup":
+            return "Not Now"
+        return ""
+
+    def is_displayed(self) -> bool:
+        self._parent._comando("isElementDisplayed")
+        return self._parent._visible(self.nombre)
+
+    def is_enabled(self) -> bool:
+        self._parent._comando("isElementEnabled")
+        return True
+
+    def clear(self) -> None:
+        self._parent._comando("clearElement")
+        self._parent.campos[self.nombre] = ""
+
+    def click(self) -> None:
+        self._parent._comando("clickElement")
+        self._parent._click(self.nombre)
+
+    def send_keys(self, *valores) -> None:
+        self._parent._comando("sendKeysToElement")
+        texto = "".join(valores)
+        time.sleep(self._parent.latencia_tecla * len(texto))
+        self._parent._teclas(self.nombre, texto)
+
+
+class FakeDriver:
+    def __init__(
+        self,
+        ig_base_url: str,
+        ig_me_base_url: str,
+        latencia: float = 0.002,
+        latencia_carga: float = 0.05,
+        popup: bool = True,
+        bidi: bool = False,
+        latencia_tecla: float = 0.0,
+        insercion: bool = True,
+    ) -> None:
+        self.ig_base_url = ig_base_url.rstrip("/")
+        self.ig_me_base_url = ig_me_base_url.rstrip("/")
+        self.latencia = latencia
+        self.latencia_carga = latencia_carga
+        self.popup_habilitado = popup
+        self.latencia_tecla = latencia_tecla
+        self.insercion = insercion
+        self.command_executor = _EjecutorFalso(self)
+        # Como webdriver.Remote: webSocketUrl solo si la sesión tiene BiDi
+        self.caps = {"webSocketUrl": "ws://fake-bidi"} if bidi else {}
+        self.browsing_context = _BrowsingContextFalso()
+
+        self.url = "about:blank"
+        self.pagina = "blank"
+        self.cookies: Dict[str, str] = {}
+        self.campos: Dict[str, str] = {}
+        self.popup_visible = False
+        self.foco: Optional[str] = None
+        self.texto_composer = ""
+        self.archivo_pendiente = False
+        self.thread_actual: Optional[str] = None
+
+        # Lo que "salió" hacia Instagram
+        self.mensajes: List[tuple] = []
+        self.archivos: List[tuple] = []
+        self.comandos = 0
+
+    # ---------- Simulación de round-trips ----------
+    def _comando(self, nombre: str) -> None:
+        self.command_executor.execute(nombre, {})
+
+    # ---------- API WebDriver usada por el bot ----------
+    @property
+    def current_url(self) -> str:
+        self._comando("getCurrentUrl")
+        return self.url
+
+    def get(self, url: str) -> None:
+        self._comando("get")
+        parsed = urlparse(url)
+        partes = [p for p in parsed.path.split("/") if p]
+        base = f"{parsed.scheme}://{parsed.netloc}"
+
+        if base == self.ig_me_base_url and len(partes) == 2 and partes[0] == "m":
+            # ig.me redirige al hilo
+            url = f"{self.ig_base_url}/direct/t/{thread_id_para(partes[1].lower())}/"
+            partes = ["direct", "t", thread_id_para(partes[1].lower())]
+
+        self.url = url
+        self.foco = None
+        self.texto_composer = ""
+        self.archivo_pendiente = False
+        if partes[:2] == ["accounts", "login"]:
+            self.pagina = "login"
+        elif partes[:2] == ["direct", "t"] and len(partes) >= 3:
+            if COOKIE_SESION not in self.cookies:
+                self.url, self.pagina = f"{self.ig_base_url}/accounts/login/", "login"
+            else:
+                self.pagina = "chat"
+                self.thread_actual = partes[2]
+                self.popup_visible = self.popup_habilitado and "popup_seen" not in self.cookies
+        else:
+            self.pagina = "home"
+        self._navegado("navigation_committed", "load")
+
+    def _navegado(self, *eventos: str) -> None:
+        for evento in eventos:
+            self.browsing_context.emitir(evento, self.url)
+
+    def find_element(self, by: str = By.ID, value: Optional[str] = None) -> FakeElement:
+        self._comando("findElement")
+        nombre = self._resolver(by, value)
+        if nombre is None:
+            raise NoSuchElementException(f"{by}={value}")
+        return FakeElement(self, nombre)
+
+    def find_elements(self, by: str = By.ID, value: Optional[str] = None) -> List[FakeElement]:
+        self._comando("findElements")
+        nombre = self._resolver(by, value)
+        return [FakeElement(self, nombre)] if nombre else []
+
+    def execute_script(self, script: str, *args):
+        self._comando("executeScript")
+        if "document.readyState" in script:
+            return "complete"
+        if "document.evaluate" in script:
+            # Búsqueda combinada del popup (ver _JS_BUSCAR_POPUP)
+            return [0, FakeElement(self, "popup")] if self.popup_visible else None
+        if "document.activeElement" in script:
+            return args[0].nombre == self.foco
+        if "insertText" in script:
+            # Inserción en bloque del composer (ver app.core.composer)
+            if not self.insercion:
+                return None
+            self.texto_composer += "\n".join(args[1])
+            return self.texto_composer
+        if "selectAll" in script:
+            self.texto_composer = ""
+            return None
+        if "arguments[0].click()" in script:
+            self._click(args[0].nombre)
+            return None
+        return None
+
+    def get_cookie(self, nombre: str) -> Optional[dict]:
+        self._comando("getCookie")
+        if nombre in self.cookies:
+            return {"name": nombre, "value": self.cookies[nombre]}
+        return None
+
+    def quit(self) -> None:
+        self._comando("quit")
+
+    # ---------- Estado de la página ----------
+    def _resolver(self, by: str, value: str) -> Optional[str]:
+        if self.pagina == "login" and by == By.NAME and value in ("username", "password"):
+            return value
+        if self.pagina != "chat":
+            return None
+        if value == XPATH_TEXTBOX:
+            return "textbox"
+        if value == XPATH_INPUT_ARCHIVO:
+            return "file"
+        if value == XPATH_BOTON_ENVIAR_ARCHIVO and self.archivo_pendiente:
+            return "enviar"
+        if value in XPATHS_POPUP_NOTIFICACIONES and self.popup_visible:
+            return "popup"
+        return None
+
+    def _visible(self, nombre: str) -> bool:
+        if nombre == "popup":
+            return self.popup_visible
+        if nombre == "enviar":
+            return self.archivo_pendiente
+        return True
+
+    def _click(self, nombre: str) -> None:
+        if nombre == "popup" and self.popup_visible:
+            self.popup_visible = False
+            self.cookies["popup_seen"] = "1"
+        elif nombre == "enviar" and self.archivo_pendiente:
+            self.archivo_pendiente = False
+            self.archivos.append((self.thread_actual, True))
+        self.foco = nombre
+
+    def _teclas(self, nombre: str, texto: str) -> None:
+        if nombre in ("username", "password"):
+            if Keys.ENTER in texto:
+                if self.campos.get("username") and self.campos.get("password"):
+                    self.cookies[COOKIE_SESION] = "fake"
+                    self.url, self.pagina = f"{self.ig_base_url}/", "home"
+                    self._navegado("history_updated")
+                return
+            self.campos[nombre] = self.campos.get(nombre, "") + texto
+        elif nombre == "textbox":
+            # Cada ENTER envía lo escrito hasta ese momento (igual que IG;
+            # chromedriver teclea "\n" como ENTER); Shift+ENTER es un salto
+            # de línea (Keys.NULL suelta Shift)
+            shift = False
+            for tecla in texto:
+                if tecla == Keys.SHIFT:
+                    shift = True
+                elif tecla == Keys.NULL:
+                    shift = False
+                elif tecla in (Keys.ENTER, "\n") and shift:
+                    self.texto_composer += "\n"
+                elif tecla in (Keys.ENTER, "\n"):
+                    if self.texto_composer.strip():
+                        self.mensajes.append((self.thread_actual, self.texto_composer))
+                    self.texto_composer = ""
+                else:
+                    self.texto_composer += tecla
+        elif nombre == "file":
+            self.archivo_pendiente = True
@@ -0,0 +1,206 @@
+# bench/fake_instagram.py
+"""
+Servidor HTTP local que imita las páginas de Instagram que usa el bot:
+
+- /accounts/login/      formulario con inputs name=username / name=password
+- /m/<username>         (ig.me) redirige a /direct/t/<thread_id>/
+- /direct/t/<id>/       composer role='textbox', input type=file, botón
+                        "Enviar" de adjuntos y popup "Turn on Notifications"
+- /static/*             imagen, video y tipografía cacheables que carga el
+                        chat (para medir bloqueo de recursos y cache en disco)
+
+Sirve para correr el bot contra un Chrome real sin salir a internet
+(apuntando IG_BASE_URL / IG_ME_BASE_URL a este servidor). También expone
+las reglas (thread_id por username, popup una vez por sesión) que replica
+bench.fake_driver.
+"""
+import hashlib
+import json
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List
+from urllib.parse import parse_qs
+
+COOKIE_SESION = "sessionid"
+COOKIE_POPUP = "popup_seen"
+
+
+def thread_id_para(username: str) -> str:
+    """thread_id determinístico para un username (igual en server y fake driver)."""
+    return str(int(hashlib.sha1(username.encode()).hexdigest()[:12], 16))
+
+
+_LOGIN_HTML = """<!doctype html><html><body>
+<form method="post" action="/accounts/login/">
+  <input name="username" type="text">
+  <input name="password" type="password">
+  <button type="submit">Log in</button>
+</form></body></html>"""
+
+_HOME_HTML = "<!doctype html><html><body><h1>Home</h1></body></html>"
+
+# Recursos estáticos del chat: (content-type, tamaño en bytes)
+_ESTATICOS = {
+    "/static/avatar.jpg": ("image/jpeg", 150 * 1024),
+    "/static/clip.mp4": ("video/mp4", 1024 * 1024),
+    "/static/ui.woff2": ("font/woff2", 80 * 1024),
+}
+
+_CHAT_HTML = """<!doctype html><html><head>
+<style>
+@font-face { font-family: ig; src: url(/static/ui.woff2) format("woff2"); }
+body { font-family: ig, sans-serif; }
+</style></head><body>
+<img src="/static/avatar.jpg" width="32" height="32">
+<video src="/static/clip.mp4" preload="auto" muted width="64"></video>
+<div id="popup" role="dialog" style="display:%(popup)s">
+  <button id="not-now">Not Now</button>
+</div>
+<div role="textbox" contenteditable="true" style="min-height:20px"></div>
+<input type="file" id="file">
+<div id="enviar" role="button" style="display:none">Enviar</div>
+<script>
+const thread = %(thread)s;
+document.getElementById("not-now").onclick = () => {
+  document.cookie = "%(cookie_popup)s=1; path=/";
+  document.getElementById("popup").remove();
+};
+const box = document.querySelector("[role=textbox]");
+box.addEventListener("keydown", (ev) => {
+  if (ev.key === "Enter" && !ev.shiftKey) {
+    ev.preventDefault();
+    const text = box.innerText.trim();
+    if (text) {
+      fetch("/_sent", {method: "POST", body: JSON.stringify({thread, text})});
+    }
+    box.innerHTML = "";
+  }
+});
+const enviar = document.getElementById("enviar");
+document.getElementById("file").onchange = () => { enviar.style.display = "block"; };
+enviar.onclick = () => {
+  fetch("/_sent", {method: "POST", body: JSON.stringify({thread, file: true})});
+  enviar.style.display = "none";
+};
+</script></body></html>"""
+
+
+class FakeInstagram(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0)) -> None:
+        super().__init__(address, _Handler)
+        self.lock = threading.Lock()
+        self.enviados: List[dict] = []
+        # Bytes de /static/* servidos (lo que no vino de la cache del navegador)
+        self.estaticos_servidos = 0
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeInstagram
+
+    def log_message(self, *args) -> None:  # silencio
+        pass
+
+    def _cookies(self) -> dict:
+        raw = self.headers.get("Cookie", "")
+        return dict(
+            p.strip().split("=", 1) for p in raw.split(";") if "=" in p
+        )
+
+    def _responder(self, status: int, body: str = "", headers: dict = None) -> None:
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _estatico(self, path: str) -> None:
+        tipo, tamanio = _ESTATICOS[path]
+        with self.server.lock:
+            self.server.estaticos_servidos += tamanio
+        self.send_response(200)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(tamanio))
+        self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+        self.end_headers()
+        self.wfile.write(b"\0" * tamanio)
+
+    def do_GET(self) -> None:
+        path = self.path.split("?", 1)[0]
+        partes = [p for p in path.split("/") if p]
+
+        if path in _ESTATICOS:
+            return self._estatico(path)
+
+        if path.startswith("/accounts/login"):
+            return self._responder(200, _LOGIN_HTML)
+        if len(partes) == 2 and partes[0] == "m":
+            destino = f"/direct/t/{thread_id_para(partes[1].lower())}/"
+            return self._responder(302, headers={"Location": destino})
+        if len(partes) >= 3 and partes[:2] == ["direct", "t"]:
+            if COOKIE_SESION not in self._cookies():
+                return self._responder(302, headers={"Location": "/accounts/login/"})
+            popup = "none" if COOKIE_POPUP in self._cookies() else "block"
+            html = _CHAT_HTML % {
+                "popup": popup,
+                "thread": json.dumps(partes[2]),
+                "cookie_popup": COOKIE_POPUP,
+            }
+            return self._responder(200, html)
+        if path == "/_sent":
+            with self.server.lock:
+                return self._responder(200, json.dumps(self.server.enviados))
+        return self._responder(200, _HOME_HTML)
+
+    def do_POST(self) -> None:
+        largo = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(largo).decode()
+        if self.path.startswith("/accounts/login"):
+            datos = parse_qs(body)
+            if datos.get("username") and datos.get("password"):
+                return self._responder(
+                    302,
+                    headers={
+                        "Location": "/",
+                        # Persistente como la real: sobrevive a un user-data-dir reutilizado
+                        "Set-Cookie": f"{COOKIE_SESION}=fake; Path=/; Max-Age=31536000",
+                    },
+                )
+            return self._responder(200, _LOGIN_HTML)
+        if self.path == "/_sent":
+            with self.server.lock:
+                self.server.enviados.append(json.loads(body))
+            return self._responder(204)
+        return self._responder(404)
+
+
+@contextmanager
+def servidor_fake() -> Iterator[FakeInstagram]:
+    """Levanta el servidor en un puerto libre mientras dura el bloque."""
+    server = FakeInstagram()
+    hilo = threading.Thread(target=server.serve_forever, daemon=True)
+    hilo.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    with servidor_fake() as server:
+        print(f"Fake Instagram en {server.base_url} (Ctrl+C para salir)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
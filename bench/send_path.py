@@ -0,0 +1,210 @@
+# bench/send_path.py
+"""
+Benchmark offline del camino de envío: login_ig + obtener_o_crear_thread_id
++ enviar_mensajes contra un Instagram local.
+
+Modos:
+- --driver fake   (default) WebDriver simulado (bench.fake_driver), sin
+                  navegador: apto para CI.
+- --driver chrome Chrome real vía ChromeDriver en 127.0.0.1:9515 contra
+                  bench.fake_instagram.
+
+Reporta latencia por destinatario (p50/p90/p99), destinatarios por minuto y
+comandos WebDriver por destinatario. Con --no-bidi las esperas de navegación
+sondean current_url; con --trace se imprime el detalle de comandos de cada
+destinatario (WEBDRIVER_TRACE).
+
+Uso:
+    python -m bench.send_path --recipients 50 --messages 3
+    python -m bench.send_path --driver chrome --recipients 10
+    python -m bench.send_path --min-rpm 300      # exit 1 si rinde menos
+    python -m bench.send_path --no-bidi          # comparar contra sondeo
+    python -m bench.send_path --attachments 2    # con adjuntos (etapa por job)
+    python -m bench.send_path --pacing "open_chat=1800:5,send_text=3600:10"
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+from bench._comun import configurar_entorno, resumen_latencias
+from bench.fake_instagram import servidor_fake
+
+
+def correr(args) -> dict:
+    # Los print("[BOT] ...") del bot se silencian salvo con --verbose
+    salida = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with salida:
+        return _correr(args)
+
+
+def _correr(args) -> dict:
+    with servidor_fake() as server, tempfile.TemporaryDirectory() as tmp:
+        configurar_entorno(
+            IG_BASE_URL=server.base_url,
+            IG_ME_BASE_URL=server.base_url,
+            WEBDRIVER_BIDI="1" if args.bidi else "0",
+            WEBDRIVER_TRACE="1" if args.trace else "0",
+            ATTACHMENT_STAGING_DIR=os.path.join(tmp, "staging"),
+            # Sin --pacing se mide el camino sin límites de cuenta; con
+            # --pacing solo se limitan las acciones indicadas
+            PACING_ENABLED="1" if args.pacing else "0",
+            PACING_LIMITS="open_chat=0:0,send_text=0:0,upload=0:0," + (args.pacing or ""),
+        )
+
+        # Recién ahora se importa app.*: toma la config de arriba
+        from app.core.instagram_bot import enviar_mensajes, login_ig
+        from app.core.thread_cache import cache_threads
+        from app.core.waits import registro_esperas
+        from app.core.webdriver_trace import trazar
+        from app.db import SessionLocal, engine
+        from app.schema import crear_esquema
+
+        crear_esquema(engine)
+
+        if args.driver == "fake":
+            from bench.fake_driver import FakeDriver
+
+            driver = FakeDriver(
+                server.base_url,
+                server.base_url,
+                latencia=args.latency_ms / 1000,
+                latencia_carga=args.page_load_ms / 1000,
+                bidi=args.bidi,
+            )
+            if args.trace:
+                trazar(driver)
+        else:
+            from app.core.instagram_bot import crear_driver
+
+            driver = crear_driver()
+
+        # Dos vueltas: en la primera todos pasan por ig.me, en la segunda
+        # ya están en BD/cache (camino habitual de una campaña repetida)
+        destinatarios = [f"@bench_user_{i}" for i in range(args.recipients)]
+        mensajes = [f"Mensaje de prueba {j}" for j in range(args.messages)]
+        archivos = []
+        for k in range(args.attachments):
+            archivos.append(os.path.join(tmp, f"adjunto_{k}.bin"))
+            with open(archivos[-1], "wb") as f:
+                f.write(os.urandom(args.attachment_kb * 1024))
+
+        db = SessionLocal()
+        try:
+            t0 = time.perf_counter()
+            login_ig(driver)
+            t_login = time.perf_counter() - t0
+
+            resultados = {}
+            for vuelta in ("first_run", "cached_run"):
+                # El callback de cancelación se consulta antes de cada
+                # destinatario: sus marcas de tiempo delimitan cada uno
+                marcas = []
+                comandos_previos = getattr(driver, "comandos", 0)
+                inicio = time.perf_counter()
+                enviar_mensajes(
+                    db=db,
+                    driver=driver,
+                    cuentas_destinatarias=destinatarios,
+                    mensajes=mensajes,
+                    archivos=archivos,
+                    cancelado=lambda: marcas.append(time.perf_counter()) and False,
+                )
+                fin = time.perf_counter()
+                marcas.append(fin)
+                latencias = [b - a for a, b in zip(marcas, marcas[1:])]
+                total = fin - inicio
+                resultados[vuelta] = {
+                    **resumen_latencias(latencias),
+                    "total_s": total,
+                    "recipients_per_min": len(latencias) / total * 60 if total else 0.0,
+                    "commands_per_recipient": (
+                        (driver.comandos - comandos_previos) / len(latencias)
+                        if hasattr(driver, "comandos") and latencias else None
+                    ),
+                }
+        finally:
+            db.close()
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+        return {
+            "driver": args.driver,
+            "bidi": args.bidi,
+            "recipients": args.recipients,
+            "messages": args.messages,
+            "attachments": args.attachments,
+            "login_s": t_login,
+            **resultados,
+            "commands": getattr(driver, "comandos", None),
+            "delivered_messages": len(driver.mensajes) if hasattr(driver, "mensajes") else None,
+            "delivered_attachments": len(driver.archivos) if hasattr(driver, "archivos") else None,
+            "thread_cache": cache_threads.estado(),
+            "waits": registro_esperas.resumen(),
+        }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark offline del envío")
+    parser.add_argument("--driver", choices=("fake", "chrome"), default="fake")
+    parser.add_argument("--recipients", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=2)
+    parser.add_argument("--attachments", type=int, default=0, help="adjuntos por destinatario")
+    parser.add_argument("--attachment-kb", type=int, default=512, help="tamaño de cada adjunto")
+    parser.add_argument("--pacing", default=None,
+                        help='límites de cuenta (PACING_LIMITS), p. ej. "send_text=3600:10"; '
+                             'las acciones que no se nombran quedan sin límite')
+    parser.add_argument("--latency-ms", type=float, default=2.0,
+                        help="round-trip simulado por comando (solo --driver fake)")
+    parser.add_argument("--page-load-ms", type=float, default=50.0,
+                        help="carga de página simulada (solo --driver fake)")
+    parser.add_argument("--min-rpm", type=float, default=None,
+                        help="falla si la vuelta cacheada rinde menos destinatarios/min")
+    parser.add_argument("--no-bidi", dest="bidi", action="store_false",
+                        help="esperas de navegación por sondeo de current_url")
+    parser.add_argument("--trace", action="store_true",
+                        help="traza de comandos WebDriver por destinatario (implica --verbose)")
+    parser.add_argument("--json", action="store_true", help="salida JSON")
+    parser.add_argument("--verbose", action="store_true", help="mostrar los logs del bot")
+    args = parser.parse_args()
+    args.verbose = args.verbose or args.trace
+
+    r = correr(args)
+    if args.json:
+        print(json.dumps(r, indent=2))
+    else:
+        print(
+            f"driver={r['driver']} bidi={r['bidi']} "
+            f"recipients={r['recipients']} messages={r['messages']} attachments={r['attachments']}"
+        )
+        print(f"login: {r['login_s']*1000:.1f} ms")
+        for vuelta in ("first_run", "cached_run"):
+            v = r[vuelta]
+            print(
+                f"{vuelta:10}  p50={v['p50_ms']:7.1f} ms  p90={v['p90_ms']:7.1f} ms  "
+                f"p99={v['p99_ms']:7.1f} ms  {v['recipients_per_min']:8.1f} recipients/min"
+                + (
+                    f"  {v['commands_per_recipient']:5.1f} cmds/recipient"
+                    if v["commands_per_recipient"] is not None else ""
+                )
+            )
+        if r["commands"] is not None:
+            print(f"comandos WebDriver: {r['commands']}")
+            print(f"mensajes entregados: {r['delivered_messages']}")
+            print(f"adjuntos entregados: {r['delivered_attachments']}")
+        print(f"thread cache: {r['thread_cache']}")
+
+    if args.min_rpm is not None and r["cached_run"]["recipients_per_min"] < args.min_rpm:
+        print(f"FALLA: {r['cached_run']['recipients_per_min']:.1f} < {args.min_rpm} recipients/min")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# bench/startup.py
+"""
+Benchmark de arranque en frío de la API.
+
+Cada corrida es un proceso nuevo (sin módulos en cache) que mide:
+- import de app.api.main
+- startup del lifespan (lo que paga cada worker de uvicorn antes de atender)
+y verifica que Selenium NO se haya cargado.
+
+Uso:
+    python -m bench.startup            # 5 corridas
+    python -m bench.startup --runs 10
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+from app.config import BASE_DIR
+
+_SCRIPT = r"""
+import asyncio, json, sys, time
+t0 = time.perf_counter()
+import app.api.main as m
+t1 = time.perf_counter()
+
+async def _startup():
+    async with m.app.router.lifespan_context(m.app):
+        return time.perf_counter()
+
+t2 = asyncio.run(_startup())
+print(json.dumps({
+    "import_s": t1 - t0,
+    "startup_s": t2 - t1,
+    "total_s": t2 - t0,
+    "selenium_loaded": "selenium" in sys.modules,
+}))
+"""
+
+
+def medir(runs: int) -> dict:
+    muestras = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", _SCRIPT],
+            cwd=BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        muestras.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    resumen = {"runs": runs}
+    for clave in ("import_s", "startup_s", "total_s"):
+        valores = [m[clave] for m in muestras]
+        resumen[clave] = {
+            "min": min(valores),
+            "median": statistics.median(valores),
+            "max": max(valores),
+        }
+    resumen["selenium_loaded"] = any(m["selenium_loaded"] for m in muestras)
+    return resumen
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    resumen = medir(args.runs)
+    for clave in ("import_s", "startup_s", "total_s"):
+        r = resumen[clave]
+        print(f"{clave:10} min={r['min']*1000:8.1f} ms  median={r['median']*1000:8.1f} ms  max={r['max']*1000:8.1f} ms")
+    print(f"selenium cargado al arrancar: {resumen['selenium_loaded']}")
+    # Falla (exit 1) si el arranque vuelve a arrastrar Selenium
+    return 1 if resumen["selenium_loaded"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+# bench/threads_serialization.py
+"""
+Compara, sobre la misma BD sembrada, dos formas de armar la respuesta de
+GET /api/threads:
+
+- orm:       select(Thread) -> objetos ORM -> ThreadsResponse (from_attributes
+             + field_serializer por fila) -> JSONResponse (json estándar).
+             Es el camino anterior del endpoint.
+- projected: select de columnas como tuplas -> fechas formateadas en bloque
+             (o en SQL en Postgres) -> RespuestaJSONRapida (orjson).
+             Es el camino actual.
+
+Verifica además que ambos produzcan el mismo JSON.
+
+Uso:
+    python -m bench.threads_serialization --rows 20000 --limit 500
+    python -m bench.threads_serialization --min-speedup 2   # exit 1 si no se alcanza
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from bench._comun import configurar_entorno, resumen_latencias
+
+
+async def medir(limit: int, iteraciones: int) -> dict:
+    from fastapi.responses import JSONResponse
+    from sqlalchemy import select
+
+    from app.api.models import ThreadsResponse
+    from app.api.paginacion import filtrar_threads, ordenar_threads, siguiente_cursor
+    from app.api.serializacion import RespuestaJSONRapida, filas_a_dicts, select_threads_proyectado
+    from app.db import cerrar_async_engine, get_async_db
+    from app.models import Thread
+
+    async def camino_orm(db) -> bytes:
+        query = ordenar_threads(filtrar_threads(select(Thread), None), "desc")
+        items = (await db.execute(query.limit(limit))).scalars().all()
+        respuesta = ThreadsResponse(items=items, next_cursor=siguiente_cursor(items, limit))
+        return JSONResponse(respuesta.model_dump(mode="json")).body
+
+    async def camino_proyectado(db) -> bytes:
+        dialecto = db.bind.dialect.name
+        query = ordenar_threads(filtrar_threads(select_threads_proyectado(dialecto), None), "desc")
+        filas = (await db.execute(query.limit(limit))).all()
+        return RespuestaJSONRapida({
+            "items": filas_a_dicts(filas),
+            "next_cursor": siguiente_cursor(filas, limit),
+        }).body
+
+    resultados = {}
+    cuerpos = {}
+    async for db in get_async_db():
+        for nombre, camino in (("orm", camino_orm), ("projected", camino_proyectado)):
+            await camino(db)  # calentamiento
+            db.expunge_all()
+            latencias = []
+            for _ in range(iteraciones):
+                t0 = time.perf_counter()
+                cuerpos[nombre] = await camino(db)
+                latencias.append(time.perf_counter() - t0)
+                # Sin identity map caliente: cada request abre su propia sesión
+                db.expunge_all()
+            resultados[nombre] = {**resumen_latencias(latencias), "bytes": len(cuerpos[nombre])}
+    await cerrar_async_engine()
+
+    resultados["same_json"] = json.loads(cuerpos["orm"]) == json.loads(cuerpos["projected"])
+    resultados["speedup_p50"] = (
+        resultados["orm"]["p50_ms"] / resultados["projected"]["p50_ms"]
+        if resultados["projected"]["p50_ms"] else 0.0
+    )
+    return resultados
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="ORM vs proyección de columnas en /api/threads")
+    parser.add_argument("--rows", type=int, default=20000, help="threads a sembrar")
+    parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--min-speedup", type=float, default=None,
+                        help="falla si projected no es al menos N veces más rápido (p50)")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    configurar_entorno(API_READ_ONLY="1")
+    from bench.api_load import sembrar
+
+    sembrar(args.rows)
+    r = asyncio.run(medir(args.limit, args.iterations))
+
+    if args.json:
+        print(json.dumps(r, indent=2))
+    else:
+        print(f"rows={args.rows} limit={args.limit} iterations={args.iterations}")
+        for nombre in ("orm", "projected"):
+            v = r[nombre]
+            print(
+                f"{nombre:10} p50={v['p50_ms']:7.2f} ms  p90={v['p90_ms']:7.2f} ms  "
+                f"p99={v['p99_ms']:7.2f} ms  {v['bytes']} bytes"
+            )
+        print(f"speedup p50: {r['speedup_p50']:.2f}x  mismo JSON: {r['same_json']}")
+
+    if not r["same_json"]:
+        print("FALLA: las respuestas difieren")
+        return 1
+    if args.min_speedup is not None and r["speedup_p50"] < args.min_speedup:
+        print(f"FALLA: speedup {r['speedup_p50']:.2f}x < {args.min_speedup}x")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,19 @@
 # main.py (en /home/adriel/Documentos/ADRIEL/Python-FastAPI)
 
 from app.api.main import app  # aquí está tu instancia de FastAPI
+from app.config import API_WORKERS
 
 
 if __name__ == "__main__":
     import uvicorn
 
-    # "main:app" = módulo main.py (este archivo) y variable app
+    # "main:app" = módulo main.py (este archivo) y variable app.
+    # Con API_WORKERS > 1 (requiere Postgres) las lecturas se reparten entre
+    # procesos y los envíos los corre solo el líder; reload no admite workers
     uvicorn.run(
         "main:app",
         host="127.0.0.1",
         port=8000,
-        reload=True,
+        reload=API_WORKERS == 1,
+        workers=API_WORKERS,
     )
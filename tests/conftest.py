@@ -0,0 +1,117 @@
+# tests/conftest.py
+"""
+Tests de la API contra SQLite y el Instagram falso de bench/ (sin Chrome ni
+red): bench.fake_instagram como servidor y bench.fake_driver como WebDriver.
+
+La configuración de app.config se lee al importar, así que el servidor y
+el entorno se preparan en pytest_configure, antes de importar app.*.
+Correr desde la raíz del repo:  python -m pytest -q
+"""
+import time
+
+import pytest
+
+from bench._comun import configurar_entorno
+from bench.fake_instagram import servidor_fake
+
+# Script manual contra Chrome real (abre el navegador al importarse)
+collect_ignore = ["test_driver.py"]
+
+_servidor = None
+
+
+def pytest_configure(config):
+    global _servidor
+    _servidor = servidor_fake()
+    server = _servidor.__enter__()
+    configurar_entorno(
+        IG_BASE_URL=server.base_url,
+        IG_ME_BASE_URL=server.base_url,
+        PACING_ENABLED="0",
+        COORDINATION_POLL_SECONDS="0.1",
+        SEND_SHUTDOWN_TIMEOUT_SECONDS="10",
+    )
+    config.instagram = server
+
+    from app.db import engine
+    from app.schema import crear_esquema
+
+    crear_esquema(engine)
+
+
+def pytest_unconfigure(config):
+    if _servidor is not None:
+        _servidor.__exit__(None, None, None)
+
+
+@pytest.fixture
+def instagram(request):
+    return request.config.instagram
+
+
+@pytest.fixture
+def nuevo_cliente(instagram):
+    """
+    Fábrica de TestClient (sin abrir): al entrar corre el lifespan de la API
+    con un pool de una sesión FakeDriver; al salir, el apagado.
+    """
+    from fastapi.testclient import TestClient
+
+    import app.core.session_pool as session_pool
+    from app.api.main import app
+    from app.core.instagram_bot import login_ig, sesion_activa
+    from bench.fake_driver import FakeDriver
+
+    def crear() -> TestClient:
+        session_pool._pool = session_pool.SessionPool(
+            size=1,
+            crear=lambda slot: FakeDriver(
+                instagram.base_url, instagram.base_url, latencia=0.001, latencia_carga=0.005
+            ),
+            login=login_ig,
+            chequear=sesion_activa,
+        )
+        return TestClient(app)
+
+    return crear
+
+
+@pytest.fixture
+def cliente(nuevo_cliente):
+    with nuevo_cliente() as c:
+        yield c
+
+
+@pytest.fixture
+def envio_lento(monkeypatch):
+    """Cada destinatario tarda al menos 50 ms (para cancelar o apagar a mitad)."""
+    import app.core.instagram_bot as bot
+
+    original = bot._enviar_a_destinatario
+
+    def lento(*args, **kwargs):
+        time.sleep(0.05)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(bot, "_enviar_a_destinatario", lento)
+
+
+def esperar(condicion, timeout: float = 30.0):
+    """Reintenta `condicion()` hasta que devuelva algo verdadero (o falla el test)."""
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        valor = condicion()
+        if valor:
+            return valor
+        time.sleep(0.05)
+    pytest.fail(f"No se cumplió la condición en {timeout} s")
+
+
+def esperar_job(cliente, job_id: int, timeout: float = 30.0) -> dict:
+    """Detalle del job cuando terminó (done, failed o cancelled)."""
+
+    def terminado():
+        job = cliente.get(f"/api/jobs/{job_id}").json()
+        return job if job["status"] not in ("queued", "running") else None
+
+    return esperar(terminado, timeout)
@@ -0,0 +1,110 @@
+# tests/test_jobs.py
+import time
+
+from conftest import esperar, esperar_job
+
+
+def _destinatarios(prefijo: str, n: int) -> list:
+    return [f"@{prefijo}{i}" for i in range(n)]
+
+
+def test_envio_completo(cliente):
+    res = cliente.post("/api/send", json={"recipients": _destinatarios("ok", 3), "messages": ["hola"]})
+    assert res.status_code == 202
+    job = esperar_job(cliente, res.json()["job_id"])
+    assert job["status"] == "done"
+    assert (job["recipients_done"], job["recipients_failed"]) == (3, 0)
+
+
+def test_validaciones_de_envio(cliente, tmp_path):
+    assert cliente.post("/api/send", json={"messages": ["hola"]}).status_code == 422
+    res = cliente.post("/api/send", json={"recipients": ["@a"], "messages": ["  ", ""]})
+    assert res.status_code == 422
+
+    vacio = tmp_path / "vacio.png"
+    vacio.touch()
+    res = cliente.post(
+        "/api/send",
+        json={"recipients": ["@a"], "messages": ["hola"], "attachments": [str(vacio), "/no/existe.png"]},
+    )
+    assert res.status_code == 422
+    assert "vacio.png: está vacío" in res.json()["detail"]
+    assert "/no/existe.png: no existe" in res.json()["detail"]
+
+
+def test_idempotency_key_repetida_devuelve_el_mismo_job(cliente):
+    cuerpo = {"recipients": _destinatarios("idem", 2), "messages": ["hola"]}
+    headers = {"Idempotency-Key": "test-idem-1"}
+
+    primero = cliente.post("/api/send", json=cuerpo, headers=headers)
+    segundo = cliente.post("/api/send", json=cuerpo, headers=headers)
+
+    assert primero.status_code == 202
+    assert segundo.status_code == 200
+    assert segundo.headers["Idempotent-Replayed"] == "true"
+    assert segundo.json()["job_id"] == primero.json()["job_id"]
+    esperar_job(cliente, primero.json()["job_id"])
+
+
+def test_idempotency_key_con_otro_cuerpo_es_422(cliente):
+    headers = {"Idempotency-Key": "test-idem-2"}
+    res = cliente.post("/api/send", json={"recipients": ["@idem_a"], "messages": ["hola"]}, headers=headers)
+    assert res.status_code == 202
+
+    otro = cliente.post("/api/send", json={"recipients": ["@idem_b"], "messages": ["hola"]}, headers=headers)
+    assert otro.status_code == 422
+    esperar_job(cliente, res.json()["job_id"])
+
+
+def test_cancelar_y_reanudar(cliente, envio_lento):
+    destinatarios = _destinatarios("canc", 10)
+    job_id = cliente.post("/api/send", json={"recipients": destinatarios, "messages": ["hola"]}).json()["job_id"]
+    esperar(lambda: cliente.get(f"/api/jobs/{job_id}").json()["recipients_done"] >= 2)
+
+    assert cliente.post(f"/api/jobs/{job_id}/cancel").status_code == 200
+    job = esperar_job(cliente, job_id)
+    assert job["status"] == "cancelled"
+    hechos = job["recipients_done"]
+    assert 2 <= hechos < len(destinatarios)
+
+    res = cliente.post(f"/api/jobs/{job_id}/resume")
+    assert res.status_code == 202
+    job = esperar_job(cliente, job_id)
+    assert job["status"] == "done"
+    assert job["recipients_done"] == len(destinatarios)
+
+    # Cada destinatario una sola vez, aunque el job corrió en dos tandas
+    items = cliente.get(f"/api/jobs/{job_id}/recipients?limit=100").json()["items"]
+    assert [it["position"] for it in items] == list(range(len(destinatarios)))
+
+    # Un job terminado sin fallidos no se reanuda
+    assert cliente.post(f"/api/jobs/{job_id}/resume").status_code == 409
+
+
+def test_apagar_la_api_detiene_el_job_en_curso(nuevo_cliente, envio_lento):
+    from app.db import SessionLocal
+    from app.models import SendJob, SendJobRecipient
+
+    # Al salir del bloque corre el apagado (cerrar_job_manager) con el job a mitad
+    with nuevo_cliente() as cliente:
+        job_id = cliente.post(
+            "/api/send", json={"recipients": _destinatarios("apagado", 60), "messages": ["hola"]}
+        ).json()["job_id"]
+        esperar(lambda: cliente.get(f"/api/jobs/{job_id}").json()["recipients_done"] >= 3)
+
+    db = SessionLocal()
+    try:
+        def filas() -> int:
+            return db.query(SendJobRecipient).filter(SendJobRecipient.job_id == job_id).count()
+
+        antes = filas()
+        job = db.get(SendJob, job_id)
+        assert job.status == "cancelled"
+        assert "cierre de la API" in job.detail
+        assert antes < 60
+
+        time.sleep(0.5)
+        assert filas() == antes
+    finally:
+        db.close()
+
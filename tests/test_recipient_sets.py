@@ -0,0 +1,88 @@
+# tests/test_recipient_sets.py
+from conftest import esperar_job
+
+
+def _importar(cliente, contenido: str, nombre: str = "lista"):
+    # Generador: el cuerpo llega en varios bloques, como una subida real
+    datos = contenido.encode()
+
+    def bloques():
+        for i in range(0, len(datos), 7):
+            yield datos[i:i + 7]
+
+    return cliente.post(
+        "/api/recipient-sets",
+        params={"name": nombre},
+        content=bloques(),
+        headers={"Content-Type": "text/csv"},
+    )
+
+
+def test_importar_lista_cuenta_duplicados_e_invalidos(cliente):
+    from app.db import SessionLocal
+    from app.models import Thread
+
+    db = SessionLocal()
+    db.add(Thread(username="set_conocido", thread_id="7001"))
+    db.commit()
+    db.close()
+
+    contenido = (
+        "﻿username,notas\n"
+        "@Set_Conocido,1\n"
+        "set_ana\n"
+        "set_ana\n"     # duplicado
+        "12345\n"       # thread_id
+        "\n"            # línea en blanco: no cuenta
+        "!!malo!!\n"    # inválido
+        ",set_otra\n"   # primera columna vacía: inválido (no se usa otra columna)
+        + "".join(f"set_u{i}\r\n" for i in range(30))
+    )
+    res = _importar(cliente, contenido)
+    assert res.status_code == 201
+    lista = res.json()
+    assert lista["completed"] is True
+    assert lista["recipients"] == 33
+    assert (lista["usernames"], lista["thread_ids"]) == (32, 1)
+    assert lista["duplicates"] == 1
+    assert lista["invalid"] == 2
+    # set_conocido ya estaba en threads; 12345 es un thread_id directo
+    assert lista["known_threads"] == 2
+
+    res = cliente.get(f"/api/recipient-sets/{lista['id']}")
+    assert res.status_code == 200
+    assert res.json()["recipients"] == 33
+    assert cliente.get("/api/recipient-sets/999999").status_code == 404
+
+
+def test_envio_por_lista(cliente):
+    lista = _importar(cliente, "setenv_a\nsetenv_b\n").json()
+    res = cliente.post("/api/send", json={"recipient_set_id": lista["id"], "messages": ["hola"]})
+    assert res.status_code == 202
+    job = esperar_job(cliente, res.json()["job_id"])
+    assert (job["status"], job["recipients_done"]) == ("done", 2)
+
+    res = cliente.post("/api/send", json={"recipient_set_id": 999999, "messages": ["hola"]})
+    assert res.status_code == 404
+
+
+def test_lista_sin_terminar_no_se_envia(cliente):
+    from app.core.destinatarios import ImportadorDestinatarios
+    from app.db import SessionLocal
+    from app.models import RecipientSet, RecipientSetItem
+
+    db = SessionLocal()
+    try:
+        importador = ImportadorDestinatarios(db, "a medias", lote=2)
+        for linea in ("setinc_a", "setinc_b", "setinc_c"):
+            importador.agregar_linea(linea)
+        set_id = importador.set.id
+
+        res = cliente.post("/api/send", json={"recipient_set_id": set_id, "messages": ["hola"]})
+        assert res.status_code == 409
+
+        importador.descartar()
+        assert db.get(RecipientSet, set_id) is None
+        assert db.query(RecipientSetItem).filter(RecipientSetItem.set_id == set_id).count() == 0
+    finally:
+        db.close()
@@ -0,0 +1,79 @@
+# tests/test_threads.py
+import csv
+import io
+import json
+
+import pytest
+
+# messages_sent repetidos a propósito: el cursor desempata por id
+_MENSAJES = [5, 3, 3, 9, 0, 3, 7]
+
+
+@pytest.fixture(scope="module")
+def historial():
+    """Threads "hist_*" (el prefijo aísla este módulo del resto de los tests)."""
+    from app.db import SessionLocal
+    from app.models import Thread
+
+    db = SessionLocal()
+    try:
+        for i, n in enumerate(_MENSAJES):
+            db.add(Thread(username=f"hist_{i}", thread_id=f"900{i}", messages_sent=n))
+        db.commit()
+    finally:
+        db.close()
+    return {f"hist_{i}": n for i, n in enumerate(_MENSAJES)}
+
+
+def _paginas(cliente, order: str, limit: int) -> list:
+    paginas, cursor = [], None
+    while True:
+        params = {"q": "hist_", "order": order, "limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        res = cliente.get("/api/threads", params=params)
+        assert res.status_code == 200
+        cuerpo = res.json()
+        paginas.append([it["username"] for it in cuerpo["items"]])
+        cursor = cuerpo["next_cursor"]
+        if not cursor:
+            return paginas
+
+
+@pytest.mark.parametrize("order", ["desc", "asc"])
+def test_paginacion_por_cursor(cliente, historial, order):
+    paginas = _paginas(cliente, order, limit=3)
+    usernames = [u for pagina in paginas for u in pagina]
+
+    # Sin repetidos ni faltantes, y en el mismo orden que una sola página grande
+    assert sorted(usernames) == sorted(historial)
+    completa = cliente.get("/api/threads", params={"q": "hist_", "order": order, "limit": 100}).json()
+    assert usernames == [it["username"] for it in completa["items"]]
+    conteos = [historial[u] for u in usernames]
+    assert conteos == sorted(conteos, reverse=order == "desc")
+    assert [len(p) for p in paginas] == [3, 3, 1]
+
+
+def test_cursor_invalido_es_400(cliente):
+    res = cliente.get("/api/threads", params={"cursor": "no-es-un-cursor"})
+    assert res.status_code == 400
+
+
+def test_export_ndjson(cliente, historial):
+    res = cliente.get("/api/threads/export", params={"q": "hist_", "format": "ndjson"})
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("application/x-ndjson")
+    filas = [json.loads(linea) for linea in res.text.splitlines() if linea]
+    assert {f["username"]: f["messages_sent"] for f in filas} == historial
+
+
+def test_export_csv(cliente, historial):
+    res = cliente.get("/api/threads/export", params={"q": "hist_", "format": "csv", "order": "asc"})
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/csv")
+    filas = list(csv.DictReader(io.StringIO(res.text)))
+    assert list(filas[0]) == ["id", "username", "thread_id", "messages_sent", "created_at", "updated_at"]
+    assert [f["username"] for f in filas] == [
+        it["username"]
+        for it in cliente.get("/api/threads", params={"q": "hist_", "order": "asc", "limit": 100}).json()["items"]
+    ]
@@ -1,6 +1,8 @@
 # ui_flet.py
+import asyncio
 import os
 import json
+import uuid
 import flet as ft
 import httpx
 
@@ -8,6 +10,87 @@ API_BASE = os.getenv("API_BASE", "http://127.0.0.1:8000")
 SEND_ENDPOINT = f"{API_BASE}/api/send"
 THREADS_ENDPOINT = f"{API_BASE}/api/threads"
 STATS_ENDPOINT = f"{API_BASE}/api/stats"
+JOBS_ENDPOINT = f"{API_BASE}/api/jobs"
+
+PAGE_SIZE = 100                 # filas por página del historial
+SEARCH_DEBOUNCE_SECONDS = 0.3   # espera tras la última tecla antes de buscar
+SCROLL_PRELOAD_PX = 300         # pedir la página siguiente antes de llegar al final
+SEND_RETRIES = 3                # reintentos de POST /api/send (misma Idempotency-Key)
+SSE_RETRIES = 5                 # reconexiones seguidas del progreso en vivo (Last-Event-ID)
+
+
+async def leer_eventos_sse(client: httpx.AsyncClient, url: str, al_reconectar=None):
+    """
+    Itera los eventos (dict) de un endpoint Server-Sent Events hasta el
+    evento `finished`. Si la conexión se corta, reconecta con backoff
+    mandando Last-Event-ID (la API reenvía solo lo que faltó);
+    `al_reconectar(intento)` se llama antes de cada reintento.
+    """
+    ultimo_id = None
+    intento = 0
+    while True:
+        cabeceras = {"Last-Event-ID": ultimo_id} if ultimo_id else {}
+        try:
+            # Sin timeout de lectura: el job puede tardar entre eventos
+            async with client.stream(
+                "GET", url, headers=cabeceras, timeout=httpx.Timeout(30.0, read=None)
+            ) as res:
+                if res.status_code < 500:
+                    res.raise_for_status()
+                else:
+                    raise httpx.TransportError(f"HTTP {res.status_code}")
+                datos, id_evento = [], None
+                async for linea in res.aiter_lines():
+                    if linea.startswith("data:"):
+                        datos.append(linea[5:].strip())
+                    elif linea.startswith("id:"):
+                        id_evento = linea[3:].strip()
+                    elif not linea and datos:
+                        ev = json.loads("\n".join(datos))
+                        datos = []
+                        if id_evento:
+                            ultimo_id = id_evento
+                        intento = 0
+                        yield ev
+                        if ev.get("type") == "finished":
+                            return
+        except httpx.TransportError:
+            pass
+        # Se cortó (error de red o el stream terminó sin `finished`)
+        if intento == SSE_RETRIES:
+            raise httpx.TransportError(f"Se perdió la conexión con {url}")
+        intento += 1
+        if al_reconectar:
+            al_reconectar(intento)
+        await asyncio.sleep(min(2 ** (intento - 1), 30))
+
+
+def describir_evento(ev: dict) -> str:
+    """Texto de una línea para el log de progreso del envío."""
+    tipo = ev.get("type")
+    quien = ev.get("recipient", "")
+    if tipo == "started":
+        total, pendientes = ev.get("recipients", 0), ev.get("pending")
+        if pendientes is not None and pendientes != total:
+            return f"Reanudado: {pendientes} de {total} destinatarios pendientes"
+        return f"Iniciado: {total} destinatarios"
+    if tipo == "resolved":
+        return f"{quien}: thread {ev.get('thread_id')}"
+    if tipo == "opened":
+        return f"{quien}: chat abierto"
+    if tipo == "message":
+        return f"{quien}: mensaje {ev.get('index')}/{ev.get('total')} enviado"
+    if tipo == "attachments":
+        fallidos = ev.get("failed") or []
+        extra = f" ({len(fallidos)} fallidos)" if fallidos else ""
+        return f"{quien}: {ev.get('sent', 0)} adjuntos enviados{extra}"
+    if tipo == "done":
+        return f"{quien}: listo"
+    if tipo == "failed":
+        return f"{quien}: ERROR {ev.get('detail', '')} (se saltea)"
+    if tipo == "finished":
+        return f"Fin: {ev.get('status')} — {ev.get('detail', '')}"
+    return json.dumps(ev, ensure_ascii=False)
 
 
 def main(page: ft.Page):
@@ -16,6 +99,26 @@ def main(page: ft.Page):
     page.window_height = 720
     page.scroll = "auto"
 
+    # ------------- Cliente HTTP compartido -------------
+    # Un único AsyncClient por página: reutiliza conexiones (keep-alive)
+    # entre refrescos, scroll y envíos
+    http: dict = {"client": None}
+
+    def cliente_http() -> httpx.AsyncClient:
+        if http["client"] is None:
+            http["client"] = httpx.AsyncClient(
+                timeout=30.0,
+                limits=httpx.Limits(max_keepalive_connections=10),
+            )
+        return http["client"]
+
+    async def cerrar_cliente(e=None):
+        if http["client"] is not None:
+            await http["client"].aclose()
+            http["client"] = None
+
+    page.on_disconnect = cerrar_cliente
+
     # ------------- Estado -------------
     adjuntos: list[str] = []
     seleccion_archivos = ft.Text("Sin archivos adjuntos", selectable=True)
@@ -51,6 +154,7 @@ def main(page: ft.Page):
     )
 
     info_send = ft.Text("", selectable=True)
+    log_envio = ft.ListView(height=260, spacing=2, auto_scroll=True)
 
     def limpiar(e=None):
         tf_recipientes.value = ""
@@ -58,9 +162,10 @@ def main(page: ft.Page):
         adjuntos.clear()
         seleccion_archivos.value = "Sin archivos adjuntos"
         info_send.value = ""
+        log_envio.controls.clear()
         page.update()
 
-    def iniciar_automatizacion(e):
+    async def iniciar_automatizacion(e):
         rec = [r.strip() for r in (tf_recipientes.value or "").splitlines() if r.strip()]
         msgs = [m.strip() for m in (tf_mensajes.value or "").splitlines() if m.strip()]
         body = {"recipients": rec, "messages": msgs, "attachments": adjuntos}
@@ -70,20 +175,64 @@ def main(page: ft.Page):
             page.update()
             return
 
+        btn_enviar.disabled = True
+        log_envio.controls.clear()
+        page.update()
         try:
-            with httpx.Client(timeout=120.0) as client:
-                res = client.post(SEND_ENDPOINT, json=body)
-            if res.status_code == 200:
-                info_send.value = json.dumps(res.json(), ensure_ascii=False, indent=2)
-                page.snack_bar = ft.SnackBar(ft.Text("Envío iniciado"), open=True)
-                cargar_historial()  # refresca tabla tras enviar
-            else:
+            # La API solo encola el envío (job); el progreso llega por SSE
+            # sin bloquear la UI
+            client = cliente_http()
+            # Una clave por click: si el POST se corta y se reintenta, la API
+            # devuelve el mismo job en lugar de lanzar un segundo envío
+            cabeceras = {"Idempotency-Key": str(uuid.uuid4())}
+            for intento in range(SEND_RETRIES + 1):
+                try:
+                    res = await client.post(SEND_ENDPOINT, json=body, headers=cabeceras)
+                    break
+                except httpx.TransportError:
+                    if intento == SEND_RETRIES:
+                        raise
+                    info_send.value = f"Sin respuesta de la API, reintentando ({intento + 1})..."
+                    page.update()
+                    await asyncio.sleep(2 ** intento)
+            if res.status_code not in (200, 202):
                 info_send.value = f"Error {res.status_code}: {res.text}"
                 page.snack_bar = ft.SnackBar(ft.Text("Error al enviar"), open=True)
+                return
+
+            job_id = res.json().get("job_id")
+            info_send.value = f"Job #{job_id} encolado"
+            page.snack_bar = ft.SnackBar(ft.Text(f"Envío encolado (job #{job_id})"), open=True)
+            page.update()
+
+            hechos = 0
+
+            def reconectando(intento: int) -> None:
+                info_send.value = f"Job #{job_id} · conexión perdida, reconectando ({intento})..."
+                page.update()
+
+            async for ev in leer_eventos_sse(
+                client, f"{JOBS_ENDPOINT}/{job_id}/events", al_reconectar=reconectando
+            ):
+                if ev.get("type") == "opened":
+                    hechos += 1
+                log_envio.controls.append(ft.Text(describir_evento(ev), size=12, selectable=True))
+                info_send.value = f"Job #{job_id} · {hechos}/{len(rec)} chats abiertos"
+                if ev.get("type") == "finished":
+                    info_send.value = f"Job #{job_id} {ev.get('status')}: {ev.get('detail', '')}"
+                page.update()
         except Exception as ex:
             info_send.value = f"Excepción: {ex}"
             page.snack_bar = ft.SnackBar(ft.Text("Excepción en la solicitud"), open=True)
-        page.update()
+        finally:
+            btn_enviar.disabled = False
+            page.update()
+
+    btn_enviar = ft.FilledButton(
+        "Iniciar Automatización",
+        icon=ft.Icons.SEND,
+        on_click=iniciar_automatizacion,
+    )
 
     enviar_layout = ft.Column(
         [
@@ -100,41 +249,57 @@ def main(page: ft.Page):
                         ),
                     ),
                     ft.TextButton("Limpiar", on_click=limpiar),
-                    ft.FilledButton(
-                        "Iniciar Automatización",
-                        icon=ft.Icons.SEND,
-                        on_click=iniciar_automatizacion,
-                    ),
+                    btn_enviar,
                 ],
                 alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
             ),
             ft.Text("Adjuntos:"),
             ft.Container(seleccion_archivos, padding=10, bgcolor=ft.Colors.ON_SURFACE_VARIANT),
-            ft.Text("Respuesta:", size=16, weight=ft.FontWeight.BOLD),
+            ft.Text("Progreso:", size=16, weight=ft.FontWeight.BOLD),
             ft.Container(info_send, padding=10, bgcolor=ft.Colors.SURFACE),
+            ft.Container(log_envio, padding=10, bgcolor=ft.Colors.SURFACE, border_radius=8),
         ],
         spacing=12,
         expand=True,
     )
 
     # ------------- Controles pestaña "Historial" -------------
+    # Estado del listado: se pagina por cursor (keyset) a medida que se
+    # hace scroll, y las filas se reutilizan por id en lugar de reconstruirse
+    historial = {
+        "cursor": None,       # next_cursor de la última página cargada
+        "cargando": False,
+        "consulta": 0,        # se incrementa con cada búsqueda/orden nuevo
+        "filas": {},          # id -> ft.DataRow
+        "busqueda": None,     # tarea de debounce pendiente
+    }
+
     tf_buscar = ft.TextField(
         label="Buscar por username (substring, sin @)",
         prefix_icon=ft.Icons.SEARCH,
-        on_submit=lambda e: cargar_historial(),
+        on_change=lambda e: programar_busqueda(),
+        on_submit=lambda e: page.run_task(cargar_historial),
     )
     dd_orden = ft.Dropdown(
         label="Orden por enviados",
         value="desc",
         options=[ft.dropdown.Option("desc"), ft.dropdown.Option("asc")],
-        on_change=lambda e: cargar_historial(),
+        on_change=lambda e: page.run_task(cargar_historial),
         width=180,
     )
     btn_refrescar = ft.IconButton(
-        icon=ft.Icons.REFRESH, tooltip="Refrescar", on_click=lambda e: cargar_historial()
+        icon=ft.Icons.REFRESH,
+        tooltip="Refrescar",
+        on_click=lambda e: page.run_task(cargar_historial),
     )
 
     txt_stats = ft.Text("—", size=14)
+    txt_cargados = ft.Text("", size=12)
+    btn_mas = ft.TextButton(
+        "Cargar más",
+        visible=False,
+        on_click=lambda e: page.run_task(cargar_pagina),
+    )
     tabla = ft.DataTable(
         columns=[
             ft.DataColumn(ft.Text("Usuario")),
@@ -150,43 +315,71 @@ def main(page: ft.Page):
         divider_thickness=0,
     )
 
-    def set_rows(items):
-        tabla.rows = []
-        for it in items:
-            tabla.rows.append(
-                ft.DataRow(
-                    cells=[
-                        ft.DataCell(ft.Text(it.get("username", ""))),
-                        ft.DataCell(
-                            ft.Text(
-                                it.get("thread_id", ""),
-                                selectable=True,
-                            )
-                        ),
-                        ft.DataCell(ft.Text(str(it.get("messages_sent", 0)))),
-                        ft.DataCell(ft.Text(it.get("created_at", ""))),
-                        ft.DataCell(ft.Text(it.get("updated_at", ""))),
-                    ]
-                )
+    def _valores_fila(it) -> list[str]:
+        return [
+            it.get("username", ""),
+            it.get("thread_id", ""),
+            str(it.get("messages_sent", 0)),
+            it.get("created_at", ""),
+            it.get("updated_at", ""),
+        ]
+
+    def _fila(it) -> ft.DataRow:
+        """Reutiliza la fila del id si ya existe; solo cambia las celdas distintas."""
+        valores = _valores_fila(it)
+        fila = historial["filas"].get(it["id"])
+        if fila is None:
+            fila = ft.DataRow(
+                cells=[ft.DataCell(ft.Text(v, selectable=(i == 1))) for i, v in enumerate(valores)]
             )
+            historial["filas"][it["id"]] = fila
+        else:
+            for celda, v in zip(fila.cells, valores):
+                if celda.content.value != v:
+                    celda.content.value = v
+        return fila
 
-    def cargar_historial():
-        params = {}
+    def set_rows(items, agregar: bool = False):
+        nuevas = [_fila(it) for it in items]
+        if agregar:
+            tabla.rows.extend(nuevas)
+        else:
+            # Primera página de una consulta: olvidar filas que ya no se ven
+            vigentes = {it["id"] for it in items}
+            historial["filas"] = {k: v for k, v in historial["filas"].items() if k in vigentes}
+            tabla.rows = nuevas
+        txt_cargados.value = f"{len(tabla.rows)} cargados"
+        btn_mas.visible = historial["cursor"] is not None
+
+    def _params(cursor=None) -> dict:
+        params = {"order": dd_orden.value or "desc", "limit": PAGE_SIZE}
         if tf_buscar.value and tf_buscar.value.strip():
             params["q"] = tf_buscar.value.strip().lstrip("@")
-        params["order"] = dd_orden.value or "desc"
+        if cursor:
+            params["cursor"] = cursor
+        return params
 
+    async def cargar_historial():
+        """Primera página + stats, en paralelo sobre el cliente compartido."""
+        historial["consulta"] += 1
+        consulta = historial["consulta"]
+        historial["cargando"] = True
         try:
-            with httpx.Client(timeout=30.0) as client:
-                r_threads = client.get(THREADS_ENDPOINT, params=params)
-                r_stats = client.get(STATS_ENDPOINT)
+            client = cliente_http()
+            r_threads, r_stats = await asyncio.gather(
+                client.get(THREADS_ENDPOINT, params=_params()),
+                client.get(STATS_ENDPOINT),
+            )
+            if consulta != historial["consulta"]:
+                return  # llegó una búsqueda más nueva mientras tanto
 
             if r_threads.status_code == 200:
                 data = r_threads.json()
-                items = data.get("items", [])
-                set_rows(items)
+                historial["cursor"] = data.get("next_cursor")
+                set_rows(data.get("items", []))
             else:
-                tabla.rows = []
+                historial["cursor"] = None
+                set_rows([])
                 page.snack_bar = ft.SnackBar(
                     ft.Text(f"Error cargando threads: {r_threads.status_code}"), open=True
                 )
@@ -198,11 +391,54 @@ def main(page: ft.Page):
                 txt_stats.value = "—"
 
         except Exception as ex:
-            tabla.rows = []
+            historial["cursor"] = None
+            set_rows([])
             txt_stats.value = f"Error: {ex}"
+        finally:
+            if consulta == historial["consulta"]:
+                historial["cargando"] = False
+        page.update()
 
+    async def cargar_pagina():
+        """Siguiente página por cursor (scroll infinito)."""
+        if historial["cargando"] or historial["cursor"] is None:
+            return
+        consulta = historial["consulta"]
+        historial["cargando"] = True
+        try:
+            r = await cliente_http().get(THREADS_ENDPOINT, params=_params(historial["cursor"]))
+            if consulta != historial["consulta"]:
+                return
+            if r.status_code == 200:
+                data = r.json()
+                historial["cursor"] = data.get("next_cursor")
+                set_rows(data.get("items", []), agregar=True)
+            else:
+                page.snack_bar = ft.SnackBar(
+                    ft.Text(f"Error cargando más threads: {r.status_code}"), open=True
+                )
+        except Exception as ex:
+            page.snack_bar = ft.SnackBar(ft.Text(f"Error: {ex}"), open=True)
+        finally:
+            if consulta == historial["consulta"]:
+                historial["cargando"] = False
         page.update()
 
+    async def _buscar_con_demora():
+        await asyncio.sleep(SEARCH_DEBOUNCE_SECONDS)
+        await cargar_historial()
+
+    def programar_busqueda():
+        """Debounce: solo se consulta cuando se deja de tipear."""
+        pendiente = historial["busqueda"]
+        if pendiente is not None and not pendiente.done():
+            pendiente.cancel()
+        historial["busqueda"] = page.run_task(_buscar_con_demora)
+
+    def on_scroll_tabla(e: ft.OnScrollEvent):
+        if e.max_scroll_extent and e.pixels >= e.max_scroll_extent - SCROLL_PRELOAD_PX:
+            page.run_task(cargar_pagina)
+
     historial_layout = ft.Column(
         [
             ft.Text("Historial de envíos", size=20, weight=ft.FontWeight.BOLD),
@@ -211,13 +447,22 @@ def main(page: ft.Page):
                 alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
             ),
             ft.Container(
-                content=ft.Column([tabla], expand=True),
+                content=ft.Column(
+                    [tabla],
+                    height=460,
+                    scroll=ft.ScrollMode.AUTO,
+                    on_scroll=on_scroll_tabla,
+                    on_scroll_interval=100,
+                ),
                 expand=True,
                 bgcolor=ft.Colors.SURFACE,
                 padding=10,
                 border_radius=8,
             ),
-            ft.Row([txt_stats]),
+            ft.Row(
+                [txt_stats, ft.Row([txt_cargados, btn_mas])],
+                alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+            ),
         ],
         spacing=12,
         expand=True,
@@ -235,7 +480,7 @@ def main(page: ft.Page):
     )
 
     page.add(tabs)
-    cargar_historial()
+    page.run_task(cargar_historial)
 
 
 if __name__ == "__main__":